@@ -1,21 +1,22 @@
 @echo off
 REM Rebuild DB + generate data + features + train + run pricing + summary
 
-python src\db_init.py
-python src\db_seed.py
-python src\generate_dim_sku.py
+python -m src.db_init
+python -m src.db_seed
+python -m src.generate_dim_sku
 
-python src\generate_fact_inventory.py
-python src\generate_fact_traffic.py
-python src\generate_fact_prices_shown.py
-python src\generate_fact_sales.py
+python -m src.generate_fact_inventory
+python -m src.generate_fact_traffic
+python -m src.generate_fact_prices_shown
+python -m src.generate_fact_sales
 
-python src\validate_data.py
+python -m src.validate_data
 
-python src\build_features.py
-python src\validate_features.py
+python -m src.build_features
+python -m src.validate_features
+python -m src.check_query_plan
 
-python src\train_units_model.py
+python -m src.train_units_model
 
 python -m src.run_pricing_job
 python -m src.build_run_summary
@@ -0,0 +1,11 @@
+-- sql/indexes.sql
+-- Secondary indexes for date-scoped reads (pricing runs read one date at a time).
+-- Primary keys lead with sku_id, so without these `WHERE date = ?` scans the table.
+
+-- feature rows for a run date, already in (sku_id, segment_id) order
+CREATE INDEX IF NOT EXISTS idx_feature_sku_segment_day_date
+  ON feature_sku_segment_day (date, sku_id, segment_id);
+
+-- covering index for logged context: today's competitor/promo and yesterday's price
+CREATE INDEX IF NOT EXISTS idx_fact_prices_shown_date
+  ON fact_prices_shown (date, sku_id, segment_id, price_shown, competitor_price, promo_active);
@@ -0,0 +1,19 @@
+-- sql/pipeline_metrics_schema.sql
+CREATE TABLE IF NOT EXISTS pipeline_stage_metrics (
+  run_date TEXT NOT NULL, -- data date the run processed
+  pipeline TEXT NOT NULL, -- script, e.g. run_pricing_job, build_features
+  stage TEXT NOT NULL,    -- e.g. load_policy, fetch, guardrails, predict, write
+
+  -- times exclude nested stages, so a run's stages add up to its total
+  wall_secs REAL NOT NULL,
+  cpu_secs REAL NOT NULL,
+  n_rows INTEGER NOT NULL,
+  n_calls INTEGER NOT NULL, -- times the stage was entered (e.g. once per chunk)
+
+  peak_traced_mb REAL, -- tracemalloc high-water mark while the stage ran
+  peak_rss_mb REAL,    -- process RSS high-water mark when the stage ended (NULL where unavailable)
+
+  recorded_at TEXT NOT NULL, -- UTC
+
+  PRIMARY KEY (run_date, pipeline, stage)
+);
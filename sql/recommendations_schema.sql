@@ -8,9 +8,36 @@ CREATE TABLE IF NOT EXISTS pricing_recommendations (
   expected_units REAL NOT NULL,
   expected_profit REAL NOT NULL,
 
-  reasons TEXT, -- comma-separated reason codes
+  reasons TEXT, -- comma-separated reason codes (derived from reason_mask, kept for readers of the string)
+  n_model_evals INTEGER, -- units-model evaluations spent by the price search
+  input_fingerprint TEXT, -- hash of the row's pricing inputs + model/policy (incremental runs)
+  reason_mask INTEGER, -- bit i = REASON_CODES[i] (src/pricing/reasons.py)
+  planned_price REAL, -- today's price from the multi-day inventory plan (NULL: no plan / no stock)
   model_name TEXT NOT NULL,
   policy_version TEXT NOT NULL,
 
   PRIMARY KEY (run_date, sku_id, segment_id)
 );
+
+-- chunks of an in-progress run; swapped into pricing_recommendations in one
+-- transaction when the run completes, and resumed from after a crash
+CREATE TABLE IF NOT EXISTS pricing_recommendations_staging (
+  run_date TEXT NOT NULL,
+  sku_id TEXT NOT NULL,
+  segment_id TEXT NOT NULL,
+
+  recommended_price REAL NOT NULL,
+  expected_units REAL NOT NULL,
+  expected_profit REAL NOT NULL,
+
+  reasons TEXT,
+  n_model_evals INTEGER,
+  model_name TEXT NOT NULL,
+  policy_version TEXT NOT NULL,
+  input_fingerprint TEXT,
+  reason_mask INTEGER,
+  planned_price REAL,
+  run_salt TEXT NOT NULL, -- model + policy hash; a resume only continues a run with the same salt
+
+  PRIMARY KEY (run_date, sku_id, segment_id)
+);
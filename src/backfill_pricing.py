@@ -0,0 +1,102 @@
+# src/backfill_pricing.py
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+
+from src.db import connect
+from src.pricing.model_registry import UNITS_MODEL_NAME, get_or_train
+from src.pricing.parallel import pricing_pool, worker_state
+from src.pricing.policy import load_policy
+from src.pricing.price_history import PRICE_HISTORY_PATH, open_price_history
+from src.pricing.run_context import ensure_run_indexes, fetch_run_rows, previous_date
+from src.run_pricing_job import (
+    DB_PATH,
+    ensure_reco_table,
+    plan_rows,
+    price_rows,
+    write_recommendations,
+)
+
+
+def _price_day(run_date: str, history_path: Path) -> tuple[str, list[tuple], dict, float]:
+    state = worker_state()
+    t0 = time.perf_counter()
+    cols, rows = fetch_run_rows(state["conn"], run_date)
+    trust = state["policy"].trust
+    if trust.enabled:
+        # dates run out of order across workers: the job's saved window (read-only here) serves
+        # dates just after it, older dates take one bulk window query
+        history = open_price_history(state["conn"], previous_date(run_date), trust, history_path)
+        cols, rows = history.annotate(cols, rows)
+    results = price_rows(cols, rows, state["model"], state["feature_cols"], state["policy"])
+    planned = plan_rows(cols, rows, state["model"], state["feature_cols"], state["policy"])
+    return run_date, results, planned, time.perf_counter() - t0
+
+
+def fetch_run_dates(conn: sqlite3.Connection, start: str | None, end: str | None) -> list[str]:
+    cur = conn.execute(
+        """
+        SELECT DISTINCT date
+        FROM feature_sku_segment_day
+        WHERE (:start IS NULL OR date >= :start)
+          AND (:end IS NULL OR date <= :end)
+        ORDER BY date
+        """,
+        {"start": start, "end": end},
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-price a date range into pricing_recommendations")
+    parser.add_argument("--start", help="first run date (YYYY-MM-DD), default: first feature date")
+    parser.add_argument("--end", help="last run date (YYYY-MM-DD), default: last feature date")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    policy = load_policy()
+    registered, _ = get_or_train(UNITS_MODEL_NAME)
+    policy_version = policy.version
+
+    conn = connect(args.db)
+    try:
+        ensure_reco_table(conn)
+        ensure_run_indexes(conn)
+
+        dates = fetch_run_dates(conn, args.start, args.end)
+        if not dates:
+            raise ValueError(f"No feature dates between {args.start} and {args.end}")
+
+        workers = max(1, min(args.workers, len(dates)))
+        print(f"Backfilling {len(dates)} dates ({dates[0]} .. {dates[-1]}) with {workers} workers, model {registered.tag}")
+
+        t0 = time.perf_counter()
+        total_rows = 0
+
+        # the job keeps its trust window next to the database it prices
+        history_path = Path(args.db).with_name(PRICE_HISTORY_PATH.name)
+        with pricing_pool(workers, registered, policy, db_path=args.db) as pool:
+            futures = [pool.submit(_price_day, d, history_path) for d in dates]
+            for fut in as_completed(futures):
+                run_date, results, planned, secs = fut.result()
+
+                # the parent is the only writer: one transaction per day, replaces that day's rows
+                n = write_recommendations(conn, run_date, results, registered.tag, policy_version,
+                                          planned_prices=planned)
+                total_rows += n
+                print(f"  {run_date}: {n} rows in {secs:.2f}s ({n / secs if secs else 0:,.0f} rows/s)")
+
+        elapsed = time.perf_counter() - t0
+        print(f" Backfilled {total_rows} recommendations for {len(dates)} dates in {elapsed:.1f}s "
+              f"({total_rows / elapsed:,.0f} rows/s)")
+
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
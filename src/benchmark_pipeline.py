@@ -0,0 +1,294 @@
+# src/benchmark_pipeline.py
+import argparse
+import importlib
+import json
+import math
+import multiprocessing as mp
+import platform
+import shutil
+import subprocess
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from src import db_init, db_seed
+from src.db import connect, connect_readonly
+from src.instrumentation import StageRecorder
+
+BENCH_DATA_DIR = Path("data/benchmarks")
+RESULTS_DIR = Path("benchmarks/results")
+
+# SKU×segment rows per run date
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+# trust window (7 days) + the priced day
+DEFAULT_DAYS = 8
+
+# relative drop in rows/s (or growth in peak RSS) vs the baseline flagged as a regression
+DEFAULT_TOLERANCE = 0.15
+
+# step -> stage whose n_rows is the step's throughput count
+THROUGHPUT_STAGE = {
+    "generate_dim_sku": "simulate",
+    "generate_fact_inventory": "simulate",
+    "generate_fact_traffic": "simulate",
+    "generate_fact_prices_shown": "simulate",
+    "generate_fact_sales": "simulate",
+    "build_features": "features",
+    "guardrails_scalar": "guardrails",
+    "run_pricing_job": "fetch",
+    "build_run_summary": "aggregate",
+}
+
+
+def seed_bench_db(db_path: Path, n_segments: int, days: int) -> None:
+    db_init.main(db_path)
+    conn = connect(db_path)
+    try:
+        db_seed.seed_segments(conn, db_seed.make_segments(n_segments))
+        end = date.today()
+        db_seed.seed_calendar(conn, start=end - timedelta(days=days - 1), end=end)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_scalar_guardrails(db_path: str) -> None:
+    """
+    Scalar apply_guardrails (the per-call path used by the demo and single quotes)
+    over every run-date row, with the trust window filled from PriceHistory.
+    """
+    from src.pricing.policy import load_policy
+    from src.pricing.price_history import PriceHistory
+    from src.pricing.rules import Context, apply_guardrails
+    from src.pricing.run_context import fetch_run_rows, previous_date
+
+    stages = StageRecorder("guardrails_scalar")
+    policy = load_policy()
+    conn = connect(db_path)
+    try:
+        run_date = conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+        with stages.span("build_contexts") as span:
+            cols, rows = fetch_run_rows(conn, run_date)
+            history = PriceHistory.load(conn, previous_date(run_date), policy.trust) if policy.trust.enabled else None
+            contexts = []
+            for r in rows:
+                rec = dict(zip(cols, r))
+                if rec["msrp"] is None:
+                    continue
+                key = (rec["sku_id"], rec["segment_id"])
+                contexts.append(Context(
+                    sku=rec["sku_id"],
+                    segment=rec["segment_id"],
+                    unit_cost=rec["unit_cost"],
+                    msrp=rec["msrp"],
+                    map_price=rec["map_price"],
+                    yesterday_price=rec["yesterday_price"],
+                    competitor_price=rec["competitor_price"],
+                    is_kvi=bool(rec["is_kvi"]),
+                    promo_active=bool(rec["promo_active"]),
+                    promo_price=rec["price_shown"],
+                    days_of_cover=rec["days_of_cover"],
+                    recent_prices=history.recent_prices(key) if history is not None else None,
+                ))
+            span.rows = len(contexts)
+
+        with stages.span("guardrails", rows=len(contexts)):
+            for ctx in contexts:
+                apply_guardrails(float(ctx.msrp), ctx, policy)
+
+        stages.report()
+        stages.write(conn, run_date)
+    finally:
+        conn.close()
+
+
+def bench_steps(db_path: Path, n_skus: int) -> list[tuple]:
+    # (step, "module:function", kwargs); modules are imported in the step's own process
+    db = str(db_path)
+    return [
+        ("generate_dim_sku", "src.generate_dim_sku:main", {"db_path": db, "n_skus": n_skus}),
+        ("generate_fact_inventory", "src.generate_fact_inventory:main", {"db_path": db}),
+        ("generate_fact_traffic", "src.generate_fact_traffic:main", {"db_path": db}),
+        ("generate_fact_prices_shown", "src.generate_fact_prices_shown:main", {"db_path": db}),
+        ("generate_fact_sales", "src.generate_fact_sales:main", {"db_path": db}),
+        ("build_features", "src.build_features:main", {"db_path": db}),
+        ("guardrails_scalar", "src.benchmark_pipeline:bench_scalar_guardrails", {"db_path": db}),
+        ("run_pricing_job", "src.run_pricing_job:main", {"argv": ["--db", db]}),
+        ("build_run_summary", "src.build_run_summary:main", {"argv": ["--db", db]}),
+    ]
+
+
+def _call_entry(entry: str, kwargs: dict) -> None:
+    module, func = entry.split(":")
+    getattr(importlib.import_module(module), func)(**kwargs)
+
+
+def run_step(entry: str, kwargs: dict) -> float:
+    """
+    Run one pipeline entry point in a fresh interpreter, so its peak RSS (and
+    import footprint) is its own. Returns the process wall time, startup included.
+    """
+    t0 = time.perf_counter()
+    proc = mp.get_context("spawn").Process(target=_call_entry, args=(entry, kwargs))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"{entry} exited with code {proc.exitcode}")
+    return time.perf_counter() - t0
+
+
+def step_metrics(db_path: Path, step: str) -> dict:
+    # the stages the step's StageRecorder stored in the benchmark DB
+    conn = connect_readonly(db_path)
+    try:
+        cur = conn.execute(
+            """
+            SELECT stage, wall_secs, cpu_secs, n_rows, peak_rss_mb
+            FROM pipeline_stage_metrics
+            WHERE pipeline = ?
+            """,
+            (step,),
+        )
+        stages = {stage: {"wall_secs": wall, "cpu_secs": cpu, "rows": rows, "peak_rss_mb": rss}
+                  for stage, wall, cpu, rows, rss in cur.fetchall()}
+    finally:
+        conn.close()
+
+    wall = sum(s["wall_secs"] for s in stages.values())
+    rows = stages.get(THROUGHPUT_STAGE[step], {}).get("rows", 0)
+    peaks = [s["peak_rss_mb"] for s in stages.values() if s["peak_rss_mb"] is not None]
+    return {
+        "rows": rows,
+        "wall_secs": wall,
+        "rows_per_sec": rows / wall if wall else None,
+        "peak_rss_mb": max(peaks) if peaks else None,
+        "stages": stages,
+    }
+
+
+def run_scale(scale: str, n_segments: int, days: int, reuse_data: bool) -> dict:
+    n_rows = SCALES[scale]
+    n_skus = math.ceil(n_rows / n_segments)
+    db_path = BENCH_DATA_DIR / f"{scale}_{n_skus}x{n_segments}x{days}d" / "pricing.db"
+
+    reuse = reuse_data and db_path.exists()
+    if not reuse:
+        shutil.rmtree(db_path.parent, ignore_errors=True)
+        seed_bench_db(db_path, n_segments, days)
+
+    print(f"\n=== {scale}: {n_skus} SKUs × {n_segments} segments × {days} days ({db_path}) ===")
+    steps = {}
+    for step, entry, kwargs in bench_steps(db_path, n_skus):
+        if reuse and step.startswith("generate_"):
+            continue
+        process_secs = run_step(entry, kwargs)
+        steps[step] = {**step_metrics(db_path, step), "process_secs": process_secs}
+
+    return {
+        "n_skus": n_skus,
+        "n_segments": n_segments,
+        "days": days,
+        "rows_per_run": n_skus * n_segments,
+        "steps": steps,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_result(results_dir: Path) -> Optional[Path]:
+    files = sorted(results_dir.glob("*.json"))
+    return files[-1] if files else None
+
+
+def find_regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare steps of scales benchmarked with the same shape (SKUs, segments, days) in both runs.
+    """
+    out = []
+    for scale, cur in current["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if base is None or any(base[k] != cur[k] for k in ("n_skus", "n_segments", "days")):
+            continue
+        for step, m in cur["steps"].items():
+            b = base["steps"].get(step)
+            if b is None:
+                continue
+            if m["rows_per_sec"] and b["rows_per_sec"] and m["rows_per_sec"] < b["rows_per_sec"] * (1 - tolerance):
+                out.append(f"{scale} {step}: {m['rows_per_sec']:,.0f} rows/s vs {b['rows_per_sec']:,.0f} "
+                           f"({m['rows_per_sec'] / b['rows_per_sec'] - 1:+.1%})")
+            if m["peak_rss_mb"] and b["peak_rss_mb"] and m["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+                out.append(f"{scale} {step}: peak RSS {m['peak_rss_mb']:.0f} MB vs {b['peak_rss_mb']:.0f} MB "
+                           f"({m['peak_rss_mb'] / b['peak_rss_mb'] - 1:+.1%})")
+    return out
+
+
+def print_table(result: dict) -> None:
+    for scale, r in result["scales"].items():
+        print(f"\n{scale} ({r['rows_per_run']:,} rows per run date, {r['days']} days)")
+        print(f"  {'step':28s} {'rows':>11s} {'secs':>8s} {'rows/s':>12s} {'peak RSS MB':>12s}")
+        for step, m in r["steps"].items():
+            rps = f"{m['rows_per_sec']:12,.0f}" if m["rows_per_sec"] else f"{'-':>12s}"
+            rss = f"{m['peak_rss_mb']:12.0f}" if m["peak_rss_mb"] is not None else f"{'-':>12s}"
+            print(f"  {step:28s} {m['rows']:11,d} {m['wall_secs']:8.2f} {rps} {rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on scaled synthetic databases")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["10k", "100k"],
+                        help="SKU×segment rows per run date")
+    parser.add_argument("--segments", type=int, default=len(db_seed.SEGMENTS))
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="calendar days generated per scale")
+    parser.add_argument("--reuse-data", action="store_true",
+                        help="skip generation when the scale's benchmark DB already exists")
+    parser.add_argument("--out", type=Path, help="results JSON (default: benchmarks/results/<UTC time>.json)")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare against (default: latest in results dir)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.days < 2:
+        raise ValueError("--days must be >= 2 (the job prices the last day against the one before)")
+
+    baseline_path = args.baseline or latest_result(RESULTS_DIR)
+
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": mp.cpu_count(),
+        "scales": {},
+    }
+    for scale in args.scales:
+        result["scales"][scale] = run_scale(scale, args.segments, args.days, args.reuse_data)
+
+    out = args.out or RESULTS_DIR / f"{result['created_at'].replace(':', '').replace('+0000', 'Z')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    print_table(result)
+    print(f"\n✅ Wrote {out}")
+
+    if baseline_path is not None and baseline_path.exists():
+        regressions = find_regressions(result, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print(f"\n Regressions vs {baseline_path} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f" No regressions vs {baseline_path} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
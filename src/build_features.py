@@ -1,9 +1,14 @@
 # src/build_features.py
-import sqlite3
 from pathlib import Path
+from itertools import chain
+from typing import Iterator, Optional
 import yaml
 
-DB_PATH = "data/pricing.db"
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.storage import PARQUET_ROOT, READ_BATCH_ROWS, ParquetReader, default_backend, write_parquet
+
 FEATURE_SCHEMA_PATH = Path("sql/features_schema.sql")
 POLICY_PATH = Path("src/config/pricing_policy.yaml")
 
@@ -11,12 +16,52 @@ def load_policy():
     with open(POLICY_PATH, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
-def main():
-    policy = load_policy()
+# columns each fact contributes to the base rows (join keys first)
+PARQUET_FACT_COLUMNS = {
+    "fact_traffic": ["sku_id", "segment_id", "date", "sessions", "views", "add_to_cart"],
+    "fact_prices_shown": ["sku_id", "segment_id", "date", "price_shown", "discount_pct_vs_msrp", "competitor_price"],
+    "fact_inventory": ["sku_id", "date", "on_hand", "inbound", "stockout_flag", "days_of_cover"],
+    "fact_sales": ["sku_id", "segment_id", "date", "orders", "units_sold", "revenue", "profit"],
+}
+
+# base row layout the feature loop unpacks
+BASE_COLUMNS = [
+    "sku_id", "segment_id", "date",
+    "sessions", "views", "add_to_cart",
+    "price_shown", "discount_pct_vs_msrp", "competitor_price",
+    "on_hand", "inbound", "stockout_flag", "days_of_cover",
+    "orders", "units_sold", "revenue", "profit",
+]
+
+def fetch_rows_parquet(reader: ParquetReader) -> tuple[int, Iterator[tuple]]:
+    """
+    Base rows from the Parquet facts: only the needed columns are read, joined
+    in Arrow and sorted like the SQLite query (sku_id, segment_id, date).
+    Returns (row count, rows); rows convert to Python one record batch at a time.
+    """
+    t = None
+    for table, columns in PARQUET_FACT_COLUMNS.items():
+        part = reader.read_table(table, columns)
+        keys = [c for c in ("sku_id", "segment_id", "date") if c in columns]
+        t = part if t is None else t.join(part, keys=keys, join_type="inner")
+    t = t.select(BASE_COLUMNS).sort_by([("sku_id", "ascending"), ("segment_id", "ascending"), ("date", "ascending")])
+    batches = (zip(*(col.to_pylist() for col in batch.columns)) for batch in t.to_batches(READ_BATCH_ROWS))
+    return t.num_rows, chain.from_iterable(batches)
+
+def main(db_path: str = DB_PATH, backend: Optional[str] = None, parquet_root: Path = PARQUET_ROOT):
+    """
+    Rebuild feature_sku_segment_day in SQLite. With backend "parquet" (or
+    PRICING_STORAGE=parquet) the facts are read from the Parquet datasets and
+    the features are mirrored there too.
+    """
+    backend = backend or default_backend()
+    stages = StageRecorder("build_features")
+    with stages.span("load_policy"):
+        policy = load_policy()
     low_lt = float(policy["inventory_flags"]["low_stock_days_of_cover_lt"])
     over_gt = float(policy["inventory_flags"]["overstock_days_of_cover_gt"])
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(db_path)
     try:
         cur = conn.cursor()
 
@@ -25,116 +70,131 @@ def main():
         conn.executescript(schema_sql)
         conn.commit()
 
-        # Pulling base joined rows ordered for lag/rolling calcs
-        cur.execute("""
-            SELECT
-              t.sku_id, t.segment_id, t.date,
-              t.sessions, t.views, t.add_to_cart,
-              p.price_shown, p.discount_pct_vs_msrp, p.competitor_price,
-              i.on_hand, i.inbound, i.stockout_flag, i.days_of_cover,
-              s.orders, s.units_sold, s.revenue, s.profit
-            FROM fact_traffic t
-            JOIN fact_prices_shown p
-              ON t.sku_id=p.sku_id AND t.segment_id=p.segment_id AND t.date=p.date
-            JOIN fact_sales s
-              ON t.sku_id=s.sku_id AND t.segment_id=s.segment_id AND t.date=s.date
-            JOIN fact_inventory i
-              ON t.sku_id=i.sku_id AND t.date=i.date
-            ORDER BY t.sku_id, t.segment_id, t.date
-        """)
-        rows = cur.fetchall()
-
-        # Building features with lags/rolling windows per SKU×segment
-        out = []
-        last_price = None
-        last_sessions = None
-        rolling_prices = []  # last up to 7 prices
-        last_key = None
-
-        def reset_state():
-            nonlocal last_price, last_sessions, rolling_prices
+        with stages.span("fetch") as span:
+            if backend == "parquet":
+                n_rows, rows = fetch_rows_parquet(ParquetReader(parquet_root))
+            else:
+                # Pulling base joined rows ordered for lag/rolling calcs
+                cur.execute("""
+                    SELECT
+                      t.sku_id, t.segment_id, t.date,
+                      t.sessions, t.views, t.add_to_cart,
+                      p.price_shown, p.discount_pct_vs_msrp, p.competitor_price,
+                      i.on_hand, i.inbound, i.stockout_flag, i.days_of_cover,
+                      s.orders, s.units_sold, s.revenue, s.profit
+                    FROM fact_traffic t
+                    JOIN fact_prices_shown p
+                      ON t.sku_id=p.sku_id AND t.segment_id=p.segment_id AND t.date=p.date
+                    JOIN fact_sales s
+                      ON t.sku_id=s.sku_id AND t.segment_id=s.segment_id AND t.date=s.date
+                    JOIN fact_inventory i
+                      ON t.sku_id=i.sku_id AND t.date=i.date
+                    ORDER BY t.sku_id, t.segment_id, t.date
+                """)
+                rows = cur.fetchall()
+                n_rows = len(rows)
+            span.rows = n_rows
+
+        with stages.span("features", rows=n_rows):
+            # Building features with lags/rolling windows per SKU×segment
+            out = []
             last_price = None
             last_sessions = None
-            rolling_prices = []
-
-        for r in rows:
-            (
-                sku_id, segment_id, d,
-                sessions, views, add_to_cart,
-                price_shown, discount_pct_vs_msrp, competitor_price,
-                on_hand, inbound, stockout_flag, days_of_cover,
-                orders, units_sold, revenue, profit
-            ) = r
-
-            key = (sku_id, segment_id)
-            if key != last_key:
-                reset_state()
-                last_key = key
-
-            price_shown = float(price_shown)
-            comp = float(competitor_price) if competitor_price is not None else None
-
-            price_index_vs_comp = (price_shown / comp) if (comp and comp > 0) else None
-
-            # lag features
-            sessions_lag_1d = int(last_sessions) if last_sessions is not None else None
-
-            price_change_pct_1d = None
-            if last_price is not None and last_price > 0:
-                price_change_pct_1d = (price_shown - last_price) / last_price
-
-            # rolling avg price (7d)
-            rolling_prices.append(price_shown)
-            if len(rolling_prices) > 7:
-                rolling_prices.pop(0)
-            price_rolling_avg_7d = sum(rolling_prices) / len(rolling_prices)
-
-            # inventory flags
-            doc = float(days_of_cover) if days_of_cover is not None else None
-            low_stock_flag = 1 if (doc is not None and doc < low_lt) else 0
-            overstock_flag = 1 if (doc is not None and doc > over_gt) else 0
-
-            out.append((
-                sku_id, segment_id, d,
-                price_shown,
-                float(discount_pct_vs_msrp) if discount_pct_vs_msrp is not None else None,
-                float(price_index_vs_comp) if price_index_vs_comp is not None else None,
-                float(price_change_pct_1d) if price_change_pct_1d is not None else None,
-                float(price_rolling_avg_7d),
-
-                int(sessions), int(views), int(add_to_cart),
-                sessions_lag_1d,
-
-                int(on_hand), int(inbound), int(stockout_flag),
-                doc,
-                int(low_stock_flag), int(overstock_flag),
-
-                int(orders), int(units_sold),
-                float(revenue), float(profit)
-            ))
-
-            last_price = price_shown
-            last_sessions = sessions
-
-        # Writing to DB 
-        conn.execute("DELETE FROM feature_sku_segment_day;")
-        conn.executemany(
-            """
-            INSERT INTO feature_sku_segment_day (
-              sku_id, segment_id, date,
-              price_shown, discount_pct_vs_msrp, price_index_vs_comp,
-              price_change_pct_1d, price_rolling_avg_7d,
-              sessions, views, add_to_cart, sessions_lag_1d,
-              on_hand, inbound, stockout_flag, days_of_cover,
-              low_stock_flag, overstock_flag,
-              orders, units_sold, revenue, profit
+            rolling_prices = []  # last up to 7 prices
+            last_key = None
+
+            def reset_state():
+                nonlocal last_price, last_sessions, rolling_prices
+                last_price = None
+                last_sessions = None
+                rolling_prices = []
+
+            for r in rows:
+                (
+                    sku_id, segment_id, d,
+                    sessions, views, add_to_cart,
+                    price_shown, discount_pct_vs_msrp, competitor_price,
+                    on_hand, inbound, stockout_flag, days_of_cover,
+                    orders, units_sold, revenue, profit
+                ) = r
+
+                key = (sku_id, segment_id)
+                if key != last_key:
+                    reset_state()
+                    last_key = key
+
+                price_shown = float(price_shown)
+                comp = float(competitor_price) if competitor_price is not None else None
+
+                price_index_vs_comp = (price_shown / comp) if (comp and comp > 0) else None
+
+                # lag features
+                sessions_lag_1d = int(last_sessions) if last_sessions is not None else None
+
+                price_change_pct_1d = None
+                if last_price is not None and last_price > 0:
+                    price_change_pct_1d = (price_shown - last_price) / last_price
+
+                # rolling avg price (7d)
+                rolling_prices.append(price_shown)
+                if len(rolling_prices) > 7:
+                    rolling_prices.pop(0)
+                price_rolling_avg_7d = sum(rolling_prices) / len(rolling_prices)
+
+                # inventory flags
+                doc = float(days_of_cover) if days_of_cover is not None else None
+                low_stock_flag = 1 if (doc is not None and doc < low_lt) else 0
+                overstock_flag = 1 if (doc is not None and doc > over_gt) else 0
+
+                out.append((
+                    sku_id, segment_id, d,
+                    price_shown,
+                    float(discount_pct_vs_msrp) if discount_pct_vs_msrp is not None else None,
+                    float(price_index_vs_comp) if price_index_vs_comp is not None else None,
+                    float(price_change_pct_1d) if price_change_pct_1d is not None else None,
+                    float(price_rolling_avg_7d),
+
+                    int(sessions), int(views), int(add_to_cart),
+                    sessions_lag_1d,
+
+                    int(on_hand), int(inbound), int(stockout_flag),
+                    doc,
+                    int(low_stock_flag), int(overstock_flag),
+
+                    int(orders), int(units_sold),
+                    float(revenue), float(profit)
+                ))
+
+                last_price = price_shown
+                last_sessions = sessions
+
+        with stages.span("write", rows=len(out)), bulk_load(conn, ["feature_sku_segment_day"]) as load:
+            # Writing to DB 
+            conn.execute("DELETE FROM feature_sku_segment_day;")
+            load.insert(
+                """
+                INSERT INTO feature_sku_segment_day (
+                  sku_id, segment_id, date,
+                  price_shown, discount_pct_vs_msrp, price_index_vs_comp,
+                  price_change_pct_1d, price_rolling_avg_7d,
+                  sessions, views, add_to_cart, sessions_lag_1d,
+                  on_hand, inbound, stockout_flag, days_of_cover,
+                  low_stock_flag, overstock_flag,
+                  orders, units_sold, revenue, profit
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                out
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            out
-        )
-        conn.commit()
         print(f" Built feature_sku_segment_day with {len(out)} rows")
+
+        if backend == "parquet":
+            with stages.span("write_parquet") as span:
+                span.rows, n_parts = write_parquet(conn, "feature_sku_segment_day", parquet_root)
+            print(f" Mirrored features to {parquet_root / 'feature_sku_segment_day'} ({n_parts} date partitions)")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0])
     finally:
         conn.close()
 
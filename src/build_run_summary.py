@@ -1,8 +1,12 @@
 # src/build_run_summary.py
+import argparse
 import sqlite3
 from pathlib import Path
 
-DB_PATH = "data/pricing.db"
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.pricing.reasons import reason_count_sql
+
 SCHEMA_PATH = Path("sql/run_summary_schema.sql")
 
 REASONS = [
@@ -12,63 +16,59 @@ REASONS = [
     "MAP_FLOOR_APPLIED",
 ]
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-
-        # creating summary table
-        conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
-        conn.commit()
-
-        run_date = cur.execute("SELECT MAX(run_date) FROM pricing_recommendations").fetchone()[0]
-        if run_date is None:
-            raise ValueError("No pricing_recommendations found")
-
-        # base aggregates
-        cur.execute("""
-            SELECT
-              COUNT(*) AS n,
-              AVG(recommended_price) AS avg_price,
-              SUM(expected_units) AS total_units,
-              SUM(expected_profit) AS total_profit
-            FROM pricing_recommendations
-            WHERE run_date = ?
-        """, (run_date,))
-        n, avg_price, total_units, total_profit = cur.fetchone()
-
-        # reason counts
-        cur.execute("""
-            SELECT reasons
-            FROM pricing_recommendations
-            WHERE run_date = ?
-        """, (run_date,))
-
-        counts = {r: 0 for r in REASONS}
-        n_none = 0
-
-        for (reasons,) in cur.fetchall():
-            if reasons is None or reasons.strip() == "":
-                n_none += 1
-                continue
-            parts = [p.strip() for p in reasons.split(",") if p.strip()]
-            if not parts:
-                n_none += 1
-                continue
-            for p in parts:
-                if p in counts:
-                    counts[p] += 1
+def summary_sql(all_dates: bool) -> str:
+    # a single date gets a plain run_date = ? so SQLite searches the primary key;
+    # "? IS NULL OR run_date = ?" would scan the whole recommendation history
+    where = "" if all_dates else "WHERE run_date = ?"
+    return f"""
+        SELECT
+          run_date,
+          COUNT(*) AS n,
+          AVG(recommended_price) AS avg_price,
+          SUM(expected_units) AS total_units,
+          SUM(expected_profit) AS total_profit,
+          {reason_count_sql()}
+        FROM pricing_recommendations
+        {where}
+        GROUP BY run_date
+        ORDER BY run_date
+    """
+
+def explain_summary_query(conn: sqlite3.Connection, run_date: str) -> list[str]:
+    """
+    EXPLAIN QUERY PLAN details for the single-date summary query (one string per plan step).
+    """
+    cur = conn.execute("EXPLAIN QUERY PLAN " + summary_sql(all_dates=False), (run_date,))
+    return [r[3] for r in cur.fetchall()]
+
+def summary_rows(conn: sqlite3.Connection, run_date=None) -> list[tuple]:
+    """
+    pricing_run_summary rows for run_date (None = every run date), aggregated
+    in one SQL pass: reason counts come from reason_mask bits, not string splits.
+    """
+    if run_date is None:
+        cur = conn.execute(summary_sql(all_dates=True))
+    else:
+        cur = conn.execute(summary_sql(all_dates=False), (run_date,))
+    names = [d[0] for d in cur.description]
+
+    rows = []
+    for values in cur.fetchall():
+        agg = dict(zip(names, values))
+        n = agg["n"]
+        counts = {r: int(agg[f"n_{r}"] or 0) for r in REASONS}
+        n_none = int(agg["n_none"] or 0)
 
         # rates
-        def rate(x): 
+        def rate(x):
             return float(x) / float(n) if n else 0.0
 
-        row = (
-            run_date,
+        rows.append((
+            agg["run_date"],
             int(n),
-            float(avg_price or 0.0),
-            float(total_units or 0.0),
-            float(total_profit or 0.0),
+            float(agg["avg_price"] or 0.0),
+            float(agg["total_units"] or 0.0),
+            float(agg["total_profit"] or 0.0),
 
             int(n_none),
             int(counts["MAX_DAILY_CHANGE_CLAMPED"]),
@@ -81,24 +81,56 @@ def main():
             rate(counts["COMPETITOR_CAP_APPLIED"]),
             rate(counts["MARGIN_FLOOR_APPLIED"]),
             rate(counts["MAP_FLOOR_APPLIED"]),
-        )
-
-        cur.execute("""
-            INSERT OR REPLACE INTO pricing_run_summary (
-              run_date,
-              n_recommendations,
-              avg_recommended_price,
-              total_expected_units,
-              total_expected_profit,
-              n_none, n_max_daily_change, n_competitor_cap, n_margin_floor, n_map_floor,
-              r_none, r_max_daily_change, r_competitor_cap, r_margin_floor, r_map_floor
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, row)
+        ))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize pricing_recommendations into pricing_run_summary")
+    parser.add_argument("--all", action="store_true", help="rebuild the summary for every run date, not just the latest")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    stages = StageRecorder("build_run_summary")
+    conn = connect(args.db)
+    try:
+        cur = conn.cursor()
+
+        # creating summary table
+        conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
         conn.commit()
 
-        print(f" Built pricing_run_summary for {run_date}")
-        print(f"  n={n}, avg_price={avg_price:.2f}, total_exp_profit={total_profit:.2f}")
+        run_date = cur.execute("SELECT MAX(run_date) FROM pricing_recommendations").fetchone()[0]
+        if run_date is None:
+            raise ValueError("No pricing_recommendations found")
+
+        with stages.span("aggregate") as span:
+            rows = summary_rows(conn, None if args.all else run_date)
+            span.rows = sum(r[1] for r in rows)  # recommendations aggregated
+
+        with stages.span("write", rows=len(rows)):
+            cur.executemany("""
+                INSERT OR REPLACE INTO pricing_run_summary (
+                  run_date,
+                  n_recommendations,
+                  avg_recommended_price,
+                  total_expected_units,
+                  total_expected_profit,
+                  n_none, n_max_daily_change, n_competitor_cap, n_margin_floor, n_map_floor,
+                  r_none, r_max_daily_change, r_competitor_cap, r_margin_floor, r_map_floor
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+
+        if args.all:
+            print(f" Built pricing_run_summary for {len(rows)} run dates ({rows[0][0]} .. {rows[-1][0]})")
+        else:
+            print(f" Built pricing_run_summary for {run_date}")
+        latest = rows[-1]
+        print(f"  {latest[0]}: n={latest[1]}, avg_price={latest[2]:.2f}, total_exp_profit={latest[4]:.2f}")
+
+        stages.report()
+        stages.write(conn, run_date)
 
     finally:
         conn.close()
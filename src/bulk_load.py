@@ -0,0 +1,133 @@
+# src/bulk_load.py
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+# rows per transaction inside a bulk load (bounds the WAL / rollback size)
+BULK_COMMIT_ROWS = 250_000
+
+# WAL + synchronous=NORMAL only syncs at checkpoints and stays crash-safe; 64 MB page cache.
+# Sorts for index rebuilds spill to temp files: temp_store=MEMORY would hold a whole table's keys in RAM.
+BULK_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -65536,
+    "temp_store": "FILE",
+}
+
+
+def tune_for_bulk(conn: sqlite3.Connection) -> dict:
+    """
+    Switch the database to WAL and apply BULK_PRAGMAS to this connection.
+    Returns the previous connection-level values (journal_mode is persistent, not restored).
+    """
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in BULK_PRAGMAS}
+    conn.execute("PRAGMA journal_mode = WAL")
+    for name, value in BULK_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+
+def secondary_indexes(conn: sqlite3.Connection, tables: Sequence[str]) -> list[tuple[str, str]]:
+    # explicitly created indexes (sql is NULL for the primary-key autoindexes)
+    marks = ",".join("?" * len(tables))
+    cur = conn.execute(
+        f"""
+        SELECT name, sql
+        FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({marks})
+        ORDER BY name
+        """,
+        list(tables),
+    )
+    return cur.fetchall()
+
+
+class BulkLoader:
+    """
+    Inserts for one bulk load; commits every commit_rows rows and tracks time spent writing.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, commit_rows: int):
+        self.conn = conn
+        self.commit_rows = commit_rows
+        self.rows = 0
+        self.secs = 0.0
+        self._pending = 0
+
+    def insert(self, sql: str, rows: Sequence[tuple]) -> int:
+        with self.timed():
+            for start in range(0, len(rows), self.commit_rows):
+                batch = rows[start:start + self.commit_rows]
+                self.conn.executemany(sql, batch)
+                self._pending += len(batch)
+                if self._pending >= self.commit_rows:
+                    self.conn.commit()
+                    self._pending = 0
+            self.rows += len(rows)
+        return len(rows)
+
+    @contextmanager
+    def timed(self) -> Iterator[None]:
+        # count writes made outside insert() (e.g. INSERT ... SELECT) as load time; add their rows to .rows
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.secs += time.perf_counter() - t0
+
+
+@contextmanager
+def bulk_load(conn: sqlite3.Connection, tables: Sequence[str], commit_rows: int = BULK_COMMIT_ROWS,
+              defer_indexes: bool = True) -> Iterator[BulkLoader]:
+    """
+    Load tables fast: WAL and BULK_PRAGMAS, secondary indexes on `tables` dropped
+    and rebuilt once at the end, foreign keys off during the load and checked
+    once afterwards (PRAGMA foreign_key_check), commits every commit_rows rows.
+    Committed chunks stay if the load fails; violations raise sqlite3.IntegrityError
+    after the data is committed. Prints the load's rows/s (insert + index + check
+    time, not the time spent producing rows).
+    """
+    conn.commit()  # pragmas below are no-ops inside a transaction
+    check_fks = conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    previous = tune_for_bulk(conn)
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+    deferred = secondary_indexes(conn, tables) if defer_indexes else []
+    for name, _ in deferred:
+        conn.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+
+    load = BulkLoader(conn, commit_rows)
+    ok = False
+    try:
+        yield load
+        conn.commit()
+        ok = True
+    finally:
+        if not ok:
+            conn.rollback()
+        t0 = time.perf_counter()
+        for _, sql in deferred:
+            conn.execute(sql)
+        conn.commit()
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if check_fks:
+            conn.execute("PRAGMA foreign_keys = ON")
+        load.secs += time.perf_counter() - t0
+
+    if check_fks:
+        t0 = time.perf_counter()
+        for table in tables:
+            violations = conn.execute(f'PRAGMA foreign_key_check("{table}")').fetchall()
+            if violations:
+                _, rowid, parent, _ = violations[0]
+                raise sqlite3.IntegrityError(
+                    f"{len(violations)} foreign key violations in {table} after bulk load "
+                    f"(first: rowid {rowid} -> {parent})"
+                )
+        load.secs += time.perf_counter() - t0
+
+    rate = f"{load.rows / load.secs:,.0f}" if load.secs else "-"
+    print(f" Bulk load {', '.join(tables)}: {load.rows} rows in {load.secs:.2f}s ({rate} rows/s)")
@@ -1,11 +1,10 @@
 # src/check_promo_multipliers.py
-import sqlite3
+from src.db import connect_readonly
 
-DB_PATH = "data/pricing.db"
 ALLOWED = {0.90, 0.95, 1.00, 1.05, 1.10}
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         cur = conn.cursor()
 
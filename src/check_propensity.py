@@ -1,10 +1,9 @@
 # src/check_propensity.py
-import sqlite3
+from src.db import connect_readonly
 
-DB_PATH = "data/pricing.db"
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         cur = conn.cursor()
 
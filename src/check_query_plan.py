@@ -0,0 +1,52 @@
+# src/check_query_plan.py
+from src.build_run_summary import explain_summary_query
+from src.db import connect
+from src.pricing.run_context import ensure_run_indexes, explain_run_query
+
+
+def main():
+    conn = connect()
+    try:
+        ensure_run_indexes(conn)
+
+        run_date = conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+        if run_date is None:
+            raise ValueError("feature_sku_segment_day is empty")
+
+        plan = explain_run_query(conn, run_date)
+        print(f"Run query plan for {run_date}:")
+        for step in plan:
+            print(f"  {step}")
+
+        # every table access must be an index search; a SCAN means cost grows with history
+        scans = [step for step in plan if step.startswith("SCAN")]
+        if scans:
+            raise AssertionError(f"❌ run query scans a table: {scans}")
+
+        # the date index already yields (sku_id, segment_id) order
+        if any("TEMP B-TREE" in step for step in plan):
+            raise AssertionError("❌ run query needs a temp b-tree for ORDER BY")
+
+        print(" Run query plan uses date-leading index searches only")
+
+        summary_date = conn.execute("SELECT MAX(run_date) FROM pricing_recommendations").fetchone()[0]
+        if summary_date is None:
+            print(" No pricing_recommendations yet: skipping the run summary query plan")
+            return
+
+        plan = explain_summary_query(conn, summary_date)
+        print(f"Run summary query plan for {summary_date}:")
+        for step in plan:
+            print(f"  {step}")
+
+        # the latest-date summary must stay a primary-key search, not a scan of every past run
+        scans = [step for step in plan if step.startswith("SCAN")]
+        if scans:
+            raise AssertionError(f"❌ run summary query scans a table: {scans}")
+
+        print(" Run summary query plan searches one run_date")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
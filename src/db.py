@@ -0,0 +1,52 @@
+# src/db.py
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+# database every script uses unless given --db / db_path; override per environment with PRICING_DB_PATH
+DB_PATH_ENV = "PRICING_DB_PATH"
+DEFAULT_DB_PATH = "data/pricing.db"
+DB_PATH = os.environ.get(DB_PATH_ENV, DEFAULT_DB_PATH)
+
+# seconds a connection waits on a lock before raising "database is locked"
+BUSY_TIMEOUT_SECS = 60
+
+# per-connection: 64 MB page cache, reads through a 256 MB memory map
+CONNECTION_PRAGMAS = {
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    for name, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def connect(db_path: Optional[str] = None, foreign_keys: bool = True) -> sqlite3.Connection:
+    """
+    Read-write connection to db_path (default: DB_PATH). Switches the database
+    to WAL, so readers never block the writer and the writer never blocks readers;
+    lock waits retry for BUSY_TIMEOUT_SECS.
+    """
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=BUSY_TIMEOUT_SECS)
+    conn.execute("PRAGMA journal_mode = WAL")  # persistent; a no-op once set
+    _apply_pragmas(conn)
+    if foreign_keys:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def connect_readonly(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Read-only connection (mode=ro URI) for exports, checks and inspection. In
+    WAL mode it reads the last committed snapshot while a pricing run writes;
+    writes through it raise sqlite3.OperationalError.
+    """
+    path = Path(db_path or DB_PATH)
+    if not path.exists():
+        raise FileNotFoundError(f"Database not found: {path} (set {DB_PATH_ENV} or run db_init)")
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_SECS)
+    _apply_pragmas(conn)
+    return conn
@@ -1,7 +1,5 @@
 # src/db_check.py
-import sqlite3
-
-DB_PATH = "data/pricing.db"
+from src.db import connect_readonly
 
 TABLES = [
     "dim_sku",
@@ -14,7 +12,7 @@ TABLES = [
 ]
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         cur = conn.cursor()
         print("Table row counts:")
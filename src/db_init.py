@@ -1,28 +1,33 @@
 # src/db_init.py
-import sqlite3
 from pathlib import Path
 
+from src.db import DB_PATH, connect
+
 SCHEMA_PATH = Path("sql/schema.sql")
-DB_PATH = Path("data/pricing.db")
+FEATURE_SCHEMA_PATH = Path("sql/features_schema.sql")
+INDEXES_PATH = Path("sql/indexes.sql")
 
 
-def main():
+def main(db_path: Path = Path(DB_PATH)):
+    db_path = Path(db_path)
     # Ensure data/ exists
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    if not SCHEMA_PATH.exists():
-        raise FileNotFoundError(f"Schema file not found: {SCHEMA_PATH}")
+    db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    # base schema, feature table, then secondary indexes (they reference both)
+    schema_paths = (SCHEMA_PATH, FEATURE_SCHEMA_PATH, INDEXES_PATH)
+    for path in schema_paths:
+        if not path.exists():
+            raise FileNotFoundError(f"Schema file not found: {path}")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(db_path)
     try:
-        conn.executescript(schema_sql)
+        for path in schema_paths:
+            conn.executescript(path.read_text(encoding="utf-8"))
         conn.commit()
     finally:
         conn.close()
 
-    print(f"✅ Database created/updated at: {DB_PATH.resolve()}")
+    print(f"✅ Database created/updated at: {db_path.resolve()}")
 
 
 if __name__ == "__main__":
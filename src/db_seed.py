@@ -2,7 +2,8 @@
 import sqlite3
 from datetime import date, timedelta
 
-DB_PATH = "data/pricing.db"
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
 
 SEGMENTS = [
     ("new", "First-time visitors / new customers"),
@@ -22,17 +23,24 @@ def season_for_month(m: int) -> str:
     return "autumn"
 
 
-def seed_segments(conn: sqlite3.Connection) -> None:
+def make_segments(n: int) -> list[tuple[str, str]]:
+    # the four real segments first; generators treat unknown segments with neutral multipliers
+    extra = [(f"segment_{i}", "Synthetic segment") for i in range(len(SEGMENTS) + 1, n + 1)]
+    return (SEGMENTS + extra)[:n]
+
+
+def seed_segments(conn: sqlite3.Connection, segments: list[tuple[str, str]] = SEGMENTS) -> int:
     conn.executemany(
         """
         INSERT OR IGNORE INTO dim_segment (segment_id, description)
         VALUES (?, ?)
         """,
-        SEGMENTS,
+        segments,
     )
+    return len(segments)
 
 
-def seed_calendar(conn: sqlite3.Connection, start: date, end: date) -> None:
+def seed_calendar(conn: sqlite3.Connection, start: date, end: date) -> int:
     # end is inclusive
     rows = []
     d = start
@@ -66,19 +74,18 @@ def seed_calendar(conn: sqlite3.Connection, start: date, end: date) -> None:
         """,
         rows,
     )
+    return len(rows)
 
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
+def main(db_path: str = DB_PATH):
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        seed_segments(conn)
-
         today = date.today()
         start = today - timedelta(days=180)
-        seed_calendar(conn, start=start, end=today)
+        with bulk_load(conn, ["dim_segment", "dim_calendar"]) as load, load.timed():
+            load.rows += seed_segments(conn)
+            load.rows += seed_calendar(conn, start=start, end=today)
 
-        conn.commit()
         print(f" Seeded dim_segment and dim_calendar for {start.isoformat()} to {today.isoformat()}")
     finally:
         conn.close()
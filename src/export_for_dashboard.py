@@ -1,9 +1,9 @@
 # src/export_for_dashboard.py
-import sqlite3
 import csv
 from pathlib import Path
 
-DB_PATH = "data/pricing.db"
+from src.db import connect_readonly
+
 OUT_DIR = Path("dashboards/exports")
 
 def export_query(conn, query: str, params, out_path: Path):
@@ -21,7 +21,7 @@ def export_query(conn, query: str, params, out_path: Path):
     print(f"✅ Wrote {out_path} ({len(rows)} rows)")
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         cur = conn.cursor()
         run_date = cur.execute("SELECT MAX(run_date) FROM pricing_recommendations").fetchone()[0]
@@ -35,6 +35,13 @@ def main():
             OUT_DIR / "pricing_run_summary.csv",
         )
 
+        export_query(
+            conn,
+            "SELECT * FROM pipeline_stage_metrics ORDER BY run_date, pipeline, stage",
+            (),
+            OUT_DIR / "pipeline_stage_metrics.csv",
+        )
+
         export_query(
             conn,
             """
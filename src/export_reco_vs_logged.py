@@ -1,12 +1,12 @@
-import sqlite3
 import csv
 from pathlib import Path
 
-DB_PATH = "data/pricing.db"
+from src.db import connect_readonly
+
 OUT = Path("dashboards/exports/reco_vs_logged.csv")
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         run_date = conn.execute("SELECT MAX(run_date) FROM pricing_recommendations").fetchone()[0]
 
@@ -0,0 +1,176 @@
+# src/generate_data.py
+import argparse
+import contextlib
+import importlib
+import io
+import multiprocessing as mp
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from src import db_init, db_seed
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.generate_dim_sku import generate_skus, insert_skus
+from src.instrumentation import StageRecorder
+from src.pricing.price_history import PRICE_HISTORY_PATH
+from src.rng_streams import RNG_BLOCK_SKUS
+
+# SKUs per shard: whole RNG blocks, so a shard's draws match the single-process run
+SHARD_BLOCKS = 16
+SHARD_SKUS = SHARD_BLOCKS * RNG_BLOCK_SKUS
+
+# generator -> default seed (run_all.cmd); --seed shifts all of them
+GENERATOR_SEEDS = {
+    "generate_fact_inventory": 123,
+    "generate_fact_traffic": 999,
+    "generate_fact_prices_shown": 2025,
+    "generate_fact_sales": 7,  # reads the three tables above
+}
+SKU_SEED = 42
+
+# last calendar date unless --end is given: fixed, so a rebuild matches no matter when it runs
+DEFAULT_END = date(2026, 10, 17)
+
+# fact tables copied from each shard into the target, in foreign-key-safe order
+FACT_TABLES = ["fact_inventory", "fact_traffic", "fact_prices_shown", "fact_sales"]
+
+
+def seed_dims(conn: sqlite3.Connection, segments: list[tuple[str, str]], start: date, end: date,
+              sku_rows: list[tuple]) -> None:
+    db_seed.seed_segments(conn, segments)
+    db_seed.seed_calendar(conn, start=start, end=end)
+    insert_skus(conn, sku_rows)
+    conn.commit()
+
+
+def generate_shard(shard_path: str, segments: list[tuple[str, str]], start: date, end: date,
+                   sku_rows: list[tuple], first_block: int, seed: int) -> dict[str, int]:
+    """
+    Build one shard database: the shared dimensions, this shard's SKUs, and
+    every fact table for them. Runs in a worker process; generator output is
+    captured so shards don't interleave their logs. Returns rows per fact table.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_init.main(shard_path)
+        conn = connect(shard_path)
+        try:
+            seed_dims(conn, segments, start, end, sku_rows)
+        finally:
+            conn.close()
+
+        for name, base_seed in GENERATOR_SEEDS.items():
+            generator = importlib.import_module(f"src.{name}")
+            generator.main(seed=base_seed + seed, db_path=shard_path, first_block=first_block)
+
+    conn = connect(shard_path)
+    try:
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in FACT_TABLES}
+    finally:
+        conn.close()
+
+
+def merge_shard(conn: sqlite3.Connection, shard_path: str) -> int:
+    # one transaction per shard (ATTACH is not allowed inside one)
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        n = sum(conn.execute(f"INSERT INTO main.{t} SELECT * FROM shard.{t}").rowcount for t in FACT_TABLES)
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE shard")
+    return n
+
+
+def retire_database(db_path: Path) -> None:
+    """
+    Prepare db_path to be replaced by another file: fold its WAL back in and
+    remove the -wal/-shm sidecars (SQLite would replay stale WAL frames into
+    the new file), and drop the trust-window store built from its prices.
+    """
+    if db_path.exists():
+        conn = connect(db_path)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+    for suffix in ("-wal", "-shm"):
+        db_path.with_name(db_path.name + suffix).unlink(missing_ok=True)
+    db_path.with_name(PRICE_HISTORY_PATH.name).unlink(missing_ok=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic pricing database of any size")
+    parser.add_argument("--skus", type=int, default=600, help="catalog size (default: %(default)s)")
+    parser.add_argument("--days", type=int, default=181, help="calendar days ending at --end (default: %(default)s)")
+    parser.add_argument("--segments", type=int, default=len(db_seed.SEGMENTS),
+                        help="customer segments; beyond the real four they are neutral (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="offset added to every generator seed (default: %(default)s)")
+    parser.add_argument("--end", type=date.fromisoformat, default=DEFAULT_END,
+                        help="last calendar date (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="shard processes; output is identical for any worker count")
+    parser.add_argument("--db", default=DB_PATH, help="database to (re)build (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    start = args.end - timedelta(days=args.days - 1)
+    segments = db_seed.make_segments(args.segments)
+
+    stages = StageRecorder("generate_data")
+    with stages.span("skus", rows=args.skus):
+        # shards are contiguous runs of the sku_id order every generator iterates in
+        sku_rows = sorted(generate_skus(n=args.skus, seed=SKU_SEED + args.seed))
+    shards = [(k, sku_rows[i:i + SHARD_SKUS]) for k, i in enumerate(range(0, len(sku_rows), SHARD_SKUS))]
+    workers = max(1, min(args.workers, len(shards)))
+    print(f"Generating {args.skus} SKUs × {len(segments)} segments × {args.days} days "
+          f"({start.isoformat()} .. {args.end.isoformat()}) in {len(shards)} shards on {workers} workers")
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=db_path.parent, prefix="shards_") as tmp:
+        shard_paths = [str(Path(tmp) / f"shard_{k:04d}.db") for k, _ in shards]
+
+        with stages.span("shards") as span:
+            ctx = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                futures = [
+                    pool.submit(generate_shard, path, segments, start, args.end, rows, k * SHARD_BLOCKS, args.seed)
+                    for path, (k, rows) in zip(shard_paths, shards)
+                ]
+                counts = [f.result() for f in futures]
+            n_rows = span.rows = sum(sum(c.values()) for c in counts)
+
+        # build next to the target and swap it in at the end, so a failed run leaves the old DB
+        build_path = db_path.with_name(db_path.name + ".building")
+        for leftover in (build_path, build_path.with_name(build_path.name + "-wal"),
+                         build_path.with_name(build_path.name + "-shm")):
+            leftover.unlink(missing_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_init.main(build_path)
+        conn = connect(build_path)
+        try:
+            with stages.span("dims", rows=len(sku_rows)):
+                seed_dims(conn, segments, start, args.end, sku_rows)
+            with stages.span("merge", rows=n_rows), bulk_load(conn, FACT_TABLES) as load, load.timed():
+                for path in shard_paths:
+                    load.rows += merge_shard(conn, path)
+            stages.write(conn, args.end.isoformat())
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # the build moves as a single file
+        finally:
+            conn.close()
+    retire_database(db_path)
+    os.replace(build_path, db_path)
+
+    elapsed = time.perf_counter() - t0
+    for t in FACT_TABLES:
+        print(f"  {t}: {sum(c[t] for c in counts)} rows")
+    print(f"✅ Generated {n_rows} fact rows into {db_path} in {elapsed:.1f}s ({n_rows / elapsed:,.0f} rows/s)")
+    stages.report()
+
+
+if __name__ == "__main__":
+    main()
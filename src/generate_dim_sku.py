@@ -3,7 +3,9 @@ import random
 import sqlite3
 from datetime import date, timedelta
 
-DB_PATH = "data/pricing.db"
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
 
 CATEGORIES = {
     "electronics": ["Voltix", "NovaTech", "ZenWare"],
@@ -13,6 +15,12 @@ CATEGORIES = {
     "toys": ["PlayForge", "KiddoWorks", "BrightBee"],
 }
 
+INSERT_SKU_SQL = """
+    INSERT OR REPLACE INTO dim_sku
+    (sku_id, category, brand, unit_cost, msrp, map_price, launch_date, is_kvi)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 def rand_launch_date(rng: random.Random) -> str:
     # Launch sometime in last 2 years
     days_ago = rng.randint(0, 730)
@@ -70,22 +78,22 @@ def generate_skus(n: int = 600, seed: int = 42):
 
     return rows
 
-def main():
-    rows = generate_skus(n=600, seed=42)
+def insert_skus(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    conn.executemany(INSERT_SKU_SQL, rows)
+
+def main(db_path: str = DB_PATH, n_skus: int = 600, seed: int = 42):
+    stages = StageRecorder("generate_dim_sku")
+    with stages.span("simulate", rows=n_skus):
+        rows = generate_skus(n=n_skus, seed=seed)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO dim_sku
-            (sku_id, category, brand, unit_cost, msrp, map_price, launch_date, is_kvi)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            rows
-        )
-        conn.commit()
+        with stages.span("write", rows=len(rows)), bulk_load(conn, ["dim_sku"]) as load:
+            load.insert(INSERT_SKU_SQL, rows)
         print(f" Inserted {len(rows)} rows into dim_sku")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
     finally:
         conn.close()
 
@@ -1,13 +1,65 @@
 # src/generate_fact_inventory.py
-import random
-import sqlite3
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.rng_streams import day_rng, sku_blocks, sku_rng
+
+# rows inserted per executemany (bounds memory for any catalog size)
+INVENTORY_CHUNK_ROWS = 100_000
+
+# days in the rolling fulfilled-demand window behind days_of_cover
+COVER_WINDOW_DAYS = 7
+
+# inclusive (low, high) ranges by category; categories not listed use the default
+CATEGORY_START_ON_HAND = {
+    "electronics": (10, 80),
+    "beauty": (80, 400),
+}
+DEFAULT_START_ON_HAND = (30, 200)
+
+# restock size scales with category
+CATEGORY_RESTOCK_QTY = {
+    "electronics": (10, 60),
+    "beauty": (50, 250),
+}
+DEFAULT_RESTOCK_QTY = (20, 120)
+
+# rough category-level demand intensity (uniform range of the daily mean)
+CATEGORY_DEMAND_MU = {
+    "electronics": (0.4, 2.0),
+    "home": (0.6, 3.0),
+    "beauty": (1.0, 6.0),
+    "sports": (0.6, 3.5),
+}
+DEFAULT_DEMAND_MU = (0.8, 4.0)  # toys
+
+# restocking cadence: every 7-21 days, redrawn after each restock
+RESTOCK_EVERY = (7, 21)
+
+
+@dataclass
+class InventoryState:
+    """
+    Per-SKU simulation state, one array slot per SKU (memory is O(SKUs), not O(SKUs × days)).
+    """
+    on_hand: np.ndarray
+    restock_every: np.ndarray
+    next_restock_idx: np.ndarray
+    trials: np.ndarray
+    p: np.ndarray
+    restock_lo: np.ndarray
+    restock_hi: np.ndarray
+    window: np.ndarray  # (n_skus, COVER_WINDOW_DAYS) ring buffer of fulfilled demand
 
-DB_PATH = "data/pricing.db"
 
 def fetch_skus(conn):
     cur = conn.cursor()
-    cur.execute("SELECT sku_id, category FROM dim_sku")
+    cur.execute("SELECT sku_id, category FROM dim_sku ORDER BY sku_id")
     return cur.fetchall()
 
 def fetch_dates(conn):
@@ -15,95 +67,136 @@ def fetch_dates(conn):
     cur.execute("SELECT date FROM dim_calendar ORDER BY date")
     return [r[0] for r in cur.fetchall()]
 
-def base_daily_demand(category: str, rng: random.Random) -> float:
-    # rough category-level demand intensity
-    if category == "electronics":
-        return rng.uniform(0.4, 2.0)
-    if category == "home":
-        return rng.uniform(0.6, 3.0)
-    if category == "beauty":
-        return rng.uniform(1.0, 6.0)
-    if category == "sports":
-        return rng.uniform(0.6, 3.5)
-    return rng.uniform(0.8, 4.0)  # toys
-
-def main(seed: int = 123):
-    rng = random.Random(seed)
-
-    conn = sqlite3.connect(DB_PATH)
+def category_ranges(categories: list, table: dict, default: tuple) -> tuple[np.ndarray, np.ndarray]:
+    lo = np.array([table.get(c, default)[0] for c in categories])
+    hi = np.array([table.get(c, default)[1] for c in categories])
+    return lo, hi
+
+def initial_state(categories: list, seed: int, first_block: int = 0) -> InventoryState:
+    """
+    Starting stock, restock cadence and demand intensity for every SKU, one
+    sku_rng(seed, block) stream per SKU block.
+    """
+    n = len(categories)
+    start_lo, start_hi = category_ranges(categories, CATEGORY_START_ON_HAND, DEFAULT_START_ON_HAND)
+    mu_lo, mu_hi = category_ranges(categories, CATEGORY_DEMAND_MU, DEFAULT_DEMAND_MU)
+
+    on_hand = np.empty(n, dtype=np.int64)
+    restock_every = np.empty(n, dtype=np.int64)
+    next_restock_idx = np.empty(n, dtype=np.int64)
+    demand_mu = np.empty(n)
+    for block, start, end in sku_blocks(n, first_block):
+        rng = sku_rng(seed, block)
+        on_hand[start:end] = rng.integers(start_lo[start:end], start_hi[start:end] + 1)
+        restock_every[start:end] = rng.integers(RESTOCK_EVERY[0], RESTOCK_EVERY[1] + 1, end - start)
+        next_restock_idx[start:end] = rng.integers(0, restock_every[start:end])
+        demand_mu[start:end] = rng.uniform(mu_lo[start:end], mu_hi[start:end])
+
+    # daily demand ~ Binomial(trials, p) with mean ~demand_mu
+    trials = (demand_mu * 6).astype(np.int64) + 1
+    p = np.minimum(0.7, demand_mu / trials)
+
+    restock_lo, restock_hi = category_ranges(categories, CATEGORY_RESTOCK_QTY, DEFAULT_RESTOCK_QTY)
+    return InventoryState(
+        on_hand=on_hand,
+        restock_every=restock_every,
+        next_restock_idx=next_restock_idx,
+        trials=trials,
+        p=p,
+        restock_lo=restock_lo,
+        restock_hi=restock_hi,
+        window=np.zeros((n, COVER_WINDOW_DAYS), dtype=np.int64),
+    )
+
+def step_block(rng: np.random.Generator, state: InventoryState, start: int, end: int, day_idx: int) -> np.ndarray:
+    """
+    Advance SKUs [start, end) by one day in place: restock, then fulfil demand.
+    Returns the block's inbound quantities.
+    """
+    on_hand = state.on_hand[start:end]
+    inbound = np.zeros(end - start, dtype=np.int64)
+
+    # restock events: index array of the SKUs whose schedule lands today
+    idx = np.flatnonzero(state.next_restock_idx[start:end] == day_idx)
+    if len(idx):
+        sku = idx + start
+        inbound[idx] = rng.integers(state.restock_lo[sku], state.restock_hi[sku] + 1)
+        on_hand[idx] += inbound[idx]
+        state.next_restock_idx[sku] += state.restock_every[sku]
+        state.restock_every[sku] = rng.integers(RESTOCK_EVERY[0], RESTOCK_EVERY[1] + 1, len(idx))  # vary cadence
+
+    demand = rng.binomial(state.trials[start:end], state.p[start:end])
+
+    # fulfilling demand from on_hand
+    fulfilled = np.minimum(on_hand, demand)
+    on_hand -= fulfilled
+    state.window[start:end, day_idx % COVER_WINDOW_DAYS] = fulfilled
+    return inbound
+
+def iter_inventory_chunks(skus, dates, seed: int, chunk_rows: int = INVENTORY_CHUNK_ROWS,
+                          first_block: int = 0) -> Iterator[list]:
+    """
+    fact_inventory rows in (date, sku_id) order, in chunks of about chunk_rows.
+    All SKUs step together one day at a time.
+    """
+    sku_ids = [s[0] for s in skus]
+    state = initial_state([s[1] for s in skus], seed, first_block)
+    inbound = np.zeros(len(sku_ids), dtype=np.int64)
+
+    chunk = []
+    for day_idx, d in enumerate(dates):
+        for block, start, end in sku_blocks(len(sku_ids), first_block):
+            inbound[start:end] = step_block(day_rng(seed, d, block), state, start, end, day_idx)
+
+        stockout_flag = (state.on_hand == 0).astype(np.int64)
+
+        # days of cover estimate: on_hand / avg(last 7 fulfilled); None while nothing sold
+        avg7 = state.window.sum(axis=1) / min(day_idx + 1, COVER_WINDOW_DAYS)
+        cover = np.round(np.divide(state.on_hand, avg7, out=np.zeros(len(avg7)), where=avg7 > 0), 2)
+        days_of_cover = [c if a > 0 else None for c, a in zip(cover.tolist(), avg7.tolist())]
+
+        chunk.extend(zip(
+            sku_ids,
+            [d] * len(sku_ids),
+            state.on_hand.tolist(),
+            inbound.tolist(),
+            stockout_flag.tolist(),
+            days_of_cover,
+        ))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def main(seed: int = 123, db_path: str = DB_PATH, chunk_rows: int = INVENTORY_CHUNK_ROWS, first_block: int = 0):
+    stages = StageRecorder("generate_fact_inventory")
+
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        skus = fetch_skus(conn)
-        dates = fetch_dates(conn)
-
-        rows = []
-        # tracking recent sales proxy for DOC estimate
-        rolling_sales = defaultdict(list)  # sku_id -> list of last 7 "demand" draws
-
-        for sku_id, category in skus:
-            # starting inventory depends on category
-            if category == "electronics":
-                on_hand = rng.randint(10, 80)
-            elif category == "beauty":
-                on_hand = rng.randint(80, 400)
-            else:
-                on_hand = rng.randint(30, 200)
-
-            # restocking cadence: every 7-21 days
-            restock_every = rng.randint(7, 21)
-            next_restock_idx = rng.randint(0, restock_every - 1)
-
-            demand_mu = base_daily_demand(category, rng)
-
-            for day_idx, d in enumerate(dates):
-                inbound = 0
-
-                # restock event
-                if day_idx == next_restock_idx:
-                    # restock size scales with category
-                    if category == "electronics":
-                        inbound = rng.randint(10, 60)
-                    elif category == "beauty":
-                        inbound = rng.randint(50, 250)
-                    else:
-                        inbound = rng.randint(20, 120)
-
-                    on_hand += inbound
-                    next_restock_idx += restock_every
-                    restock_every = rng.randint(7, 21)  # vary cadence
-
-                demand = 0
-                trials = int(demand_mu * 6) + 1
-                p = min(0.7, demand_mu / max(1, trials))
-                for _ in range(trials):
-                    demand += 1 if rng.random() < p else 0
-
-                # fulfilling demand from on_hand
-                fulfilled = min(on_hand, demand)
-                on_hand -= fulfilled
-
-                stockout_flag = 1 if on_hand == 0 else 0
-
-                # days of cover estimate: on_hand / avg(last7 fulfilled + small epsilon)
-                rolling_sales[sku_id].append(fulfilled)
-                last7 = rolling_sales[sku_id][-7:]
-                avg7 = sum(last7) / max(1, len(last7))
-                days_of_cover = None
-                if avg7 > 0:
-                    days_of_cover = round(on_hand / avg7, 2)
-
-                rows.append((sku_id, d, int(on_hand), int(inbound), int(stockout_flag), days_of_cover))
-
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO fact_inventory
-            (sku_id, date, on_hand, inbound, stockout_flag, days_of_cover)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            rows,
-        )
-        conn.commit()
-        print(f"✅ Inserted {len(rows)} rows into fact_inventory")
+        with stages.span("fetch") as span:
+            skus = fetch_skus(conn)
+            dates = fetch_dates(conn)
+            span.rows = len(skus)
+
+        n_rows = 0
+        chunks = iter_inventory_chunks(skus, dates, seed, chunk_rows, first_block)
+        with stages.span("write"), bulk_load(conn, ["fact_inventory"]) as load:
+            for rows in stages.iterate("simulate", chunks):
+                with stages.span("write", rows=len(rows)):
+                    load.insert(
+                        """
+                        INSERT OR REPLACE INTO fact_inventory
+                        (sku_id, date, on_hand, inbound, stockout_flag, days_of_cover)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        rows,
+                    )
+                n_rows += len(rows)
+        print(f"✅ Inserted {n_rows} rows into fact_inventory")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
     finally:
         conn.close()
 
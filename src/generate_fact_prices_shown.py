@@ -1,8 +1,15 @@
 # src/generate_fact_prices_shown.py
-import random
-import sqlite3
+from typing import Iterator
 
-DB_PATH = "data/pricing.db"
+import numpy as np
+
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.rng_streams import day_rng, sku_blocks
+
+# rows inserted per executemany (bounds memory for any catalog size)
+PRICES_CHUNK_ROWS = 100_000
 
 # Logging policy: discrete multipliers (like buckets)
 MULTIPLIERS = [0.90, 0.95, 1.00, 1.05, 1.10]
@@ -14,14 +21,17 @@ SEGMENT_PRICE_PREF = {
     "high_value": 0.06,        # more likely to see higher prices
 }
 
+# KVI items see slightly lower prices
+KVI_PRICE_PREF = -0.02
+
 def fetch_skus(conn):
     cur = conn.cursor()
-    cur.execute("SELECT sku_id, unit_cost, msrp, is_kvi FROM dim_sku")
+    cur.execute("SELECT sku_id, unit_cost, msrp, is_kvi FROM dim_sku ORDER BY sku_id")
     return cur.fetchall()
 
 def fetch_segments(conn):
     cur = conn.cursor()
-    cur.execute("SELECT segment_id FROM dim_segment")
+    cur.execute("SELECT segment_id FROM dim_segment ORDER BY segment_id")
     return [r[0] for r in cur.fetchall()]
 
 def fetch_dates(conn):
@@ -29,108 +39,139 @@ def fetch_dates(conn):
     cur.execute("SELECT date, is_holiday, month FROM dim_calendar ORDER BY date")
     return cur.fetchall()
 
-def round_price(p: float) -> float:
-    return round(p, 2)
-
-def softmax(scores):
-    import math
-    mx = max(scores)
-    exps = [math.exp(s - mx) for s in scores]
-    s = sum(exps)
-    return [e / s for e in exps]
-
-def main(seed: int = 2025):
-    rng = random.Random(seed)
-
-    conn = sqlite3.connect(DB_PATH)
+def propensity_table(segments: list) -> np.ndarray:
+    """
+    Logging policy P(multiplier | segment, is_kvi) as a (segment × kvi × action) array.
+    Each multiplier scores -|m - (1 + seg_bias + kvi_bias)| * 8, then softmax: a
+    negative bias pulls toward lower multipliers.
+    """
+    mults = np.array(MULTIPLIERS)
+    seg_bias = np.array([SEGMENT_PRICE_PREF.get(seg, 0.0) for seg in segments])
+    kvi_bias = np.array([0.0, KVI_PRICE_PREF])
+
+    center = 1.0 + seg_bias[:, None] + kvi_bias[None, :]
+    scores = -np.abs(mults[None, None, :] - center[:, :, None]) * 8.0
+    exps = np.exp(scores - scores.max(axis=-1, keepdims=True))
+    return exps / exps.sum(axis=-1, keepdims=True)
+
+def promo_day(rng: np.random.Generator, is_holiday: int, month: int) -> bool:
+    # promos more likely in Nov/Dec + holidays
+    return bool((month in (11, 12) and rng.random() < 0.08) or (is_holiday == 1 and rng.random() < 0.20))
+
+def simulate_block(
+    rng: np.random.Generator,
+    unit_cost: np.ndarray,
+    msrp: np.ndarray,
+    is_kvi: np.ndarray,
+    cum_probs: np.ndarray,
+    probs: np.ndarray,
+    is_promo_day: bool,
+) -> tuple[np.ndarray, ...]:
+    """
+    Logged prices for one day × SKU block. Returns (n_skus, n_segments) price,
+    discount and propensity arrays plus per-SKU promo_active and competitor price.
+    """
+    n_skus, n_segments = len(unit_cost), cum_probs.shape[0]
+
+    # Competitor price: noisy around "market" (between cost*1.25 and msrp*1.02)
+    market = rng.uniform(unit_cost * 1.25, msrp * 1.02)
+    competitor_price = market * rng.uniform(0.96, 1.04, n_skus)
+
+    # Promo price if promo_day triggers (not all SKUs participate);
+    # discount 10% to 35% off msrp, but never below cost*1.05
+    promo_active = (rng.random(n_skus) < 0.18) & is_promo_day
+    promo_price = np.maximum(unit_cost * 1.05, msrp * rng.uniform(0.65, 0.90, n_skus))
+
+    # categorical draw per (sku, segment): first action whose cumulative probability covers u
+    u = rng.random((n_skus, n_segments))
+    seg_idx = np.arange(n_segments)
+    cum = cum_probs[seg_idx[None, :], is_kvi[:, None]]  # (n_skus, n_segments, n_actions)
+    choice = np.minimum((u[:, :, None] > cum).sum(axis=-1), len(MULTIPLIERS) - 1)
+    propensity = probs[seg_idx[None, :], is_kvi[:, None], choice]
+
+    # base price from msrp * multiplier, but keep above cost*1.05
+    price = np.maximum(unit_cost[:, None] * 1.05, msrp[:, None] * np.array(MULTIPLIERS)[choice])
+
+    # if promo active, price_shown becomes promo price (still log propensity as if policy chose it)
+    price = np.round(np.where(promo_active[:, None], promo_price[:, None], price), 2)
+
+    discount = np.round(1.0 - np.divide(price, msrp[:, None], out=np.ones_like(price), where=msrp[:, None] > 0), 4)
+    return price, discount, np.round(propensity, 6), promo_active.astype(np.int64), np.round(competitor_price, 2)
+
+def iter_price_chunks(skus, dates, segments, seed: int, chunk_rows: int = PRICES_CHUNK_ROWS,
+                      first_block: int = 0) -> Iterator[list]:
+    """
+    fact_prices_shown rows in (date, sku_id, segment_id) order, in chunks of about chunk_rows.
+    The day-level promo draw uses its own stream, day_rng(seed, date), so it
+    does not shift the per-block draws.
+    """
+    sku_ids = [s[0] for s in skus]
+    unit_cost = np.array([s[1] for s in skus], dtype=float)
+    msrp = np.array([s[2] for s in skus], dtype=float)  # None -> NaN
+    msrp = np.where(np.isnan(msrp), unit_cost * 2.0, msrp)
+    is_kvi = np.array([1 if s[3] == 1 else 0 for s in skus], dtype=np.int64)
+    has_msrp = (msrp > 0).tolist()
+
+    probs = propensity_table(segments)
+    cum_probs = np.cumsum(probs, axis=-1)
+
+    chunk = []
+    for (d, is_holiday, month) in dates:
+        is_promo_day = promo_day(day_rng(seed, d), is_holiday, month)
+
+        for block, start, end in sku_blocks(len(sku_ids), first_block):
+            price, discount, propensity, promo_active, competitor_price = simulate_block(
+                day_rng(seed, d, block), unit_cost[start:end], msrp[start:end], is_kvi[start:end],
+                cum_probs, probs, is_promo_day,
+            )
+            k = len(segments)
+            n = (end - start) * k
+            chunk.extend(zip(
+                np.repeat(sku_ids[start:end], k).tolist(),
+                segments * (end - start),
+                [d] * n,
+                price.ravel().tolist(),
+                np.repeat(promo_active, k).tolist(),
+                [x if ok else None for x, ok in zip(discount.ravel().tolist(), np.repeat(has_msrp[start:end], k))],
+                np.repeat(competitor_price, k).tolist(),
+                propensity.ravel().tolist(),
+            ))
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def main(seed: int = 2025, db_path: str = DB_PATH, chunk_rows: int = PRICES_CHUNK_ROWS, first_block: int = 0):
+    stages = StageRecorder("generate_fact_prices_shown")
+
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-
-        skus = fetch_skus(conn)
-        segments = fetch_segments(conn)
-        dates = fetch_dates(conn)
-
-        rows = []
-
-        for (d, is_holiday, month) in dates:
-            # promos more likely in Nov/Dec + holidays
-            promo_day = (month in (11, 12) and rng.random() < 0.08) or (is_holiday == 1 and rng.random() < 0.20)
-
-            for (sku_id, unit_cost, msrp, is_kvi) in skus:
-                unit_cost = float(unit_cost)
-                msrp = float(msrp) if msrp is not None else unit_cost * 2.0
-
-                # Competitor price: noisy around "market" (between cost*1.2 and msrp*1.05)
-                market = rng.uniform(unit_cost * 1.25, msrp * 1.02)
-                competitor_price = market * rng.uniform(0.96, 1.04)
-
-                # Promo price if promo_day triggers (not all SKUs participate)
-                promo_active = 1 if (promo_day and rng.random() < 0.18) else 0
-                promo_price = None
-                if promo_active == 1:
-                    # promo discount 10% to 35% off msrp, but never below cost*1.05
-                    promo_price = max(unit_cost * 1.05, msrp * rng.uniform(0.65, 0.90))
-
-                for seg in segments:
-                    # creating multiplier probabilities influenced by segment + KVI (KVI slightly lower prices)
-                    seg_bias = SEGMENT_PRICE_PREF.get(seg, 0.0)
-                    kvi_bias = -0.02 if is_kvi == 1 else 0.0
-
-                    # score each multiplier
-                    # lower multiplier is favored when seg_bias is negative
-                    scores = []
-                    for m in MULTIPLIERS:
-                        # center around 1.0; negative bias pulls toward lower multipliers
-                        score = -abs(m - (1.0 + seg_bias + kvi_bias)) * 8.0
-                        scores.append(score)
-
-                    probs = softmax(scores)
-
-                    # sample multiplier
-                    choice_idx = 0
-                    r = rng.random()
-                    cum = 0.0
-                    for i, p in enumerate(probs):
-                        cum += p
-                        if r <= cum:
-                            choice_idx = i
-                            break
-
-                    chosen_m = MULTIPLIERS[choice_idx]
-                    propensity = probs[choice_idx]
-
-                    # base price from msrp * multiplier, but keep above cost*1.05
-                    price = max(unit_cost * 1.05, msrp * chosen_m)
-
-                    # if promo active, price_shown becomes promo price (still log propensity as if policy chose it)
-                    if promo_active == 1 and promo_price is not None:
-                        price = promo_price
-
-                    price = round_price(price)
-
-                    discount_pct_vs_msrp = None
-                    if msrp > 0:
-                        discount_pct_vs_msrp = round(1.0 - (price / msrp), 4)
-
-                    rows.append((
-                        sku_id, seg, d,
-                        price,
-                        promo_active,
-                        discount_pct_vs_msrp,
-                        round_price(competitor_price),
-                        round(propensity, 6),
-                    ))
-
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO fact_prices_shown
-            (sku_id, segment_id, date, price_shown, promo_active, discount_pct_vs_msrp, competitor_price, logging_propensity)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            rows,
-        )
-        conn.commit()
-        print(f"✅ Inserted {len(rows)} rows into fact_prices_shown")
+
+        with stages.span("fetch") as span:
+            skus = fetch_skus(conn)
+            segments = fetch_segments(conn)
+            dates = fetch_dates(conn)
+            span.rows = len(skus)
+
+        n_rows = 0
+        chunks = iter_price_chunks(skus, dates, segments, seed, chunk_rows, first_block)
+        with stages.span("write"), bulk_load(conn, ["fact_prices_shown"]) as load:
+            for rows in stages.iterate("simulate", chunks):
+                with stages.span("write", rows=len(rows)):
+                    load.insert(
+                        """
+                        INSERT OR REPLACE INTO fact_prices_shown
+                        (sku_id, segment_id, date, price_shown, promo_active, discount_pct_vs_msrp, competitor_price, logging_propensity)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        rows,
+                    )
+                n_rows += len(rows)
+        print(f"✅ Inserted {n_rows} rows into fact_prices_shown")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
     finally:
         conn.close()
 
@@ -1,9 +1,16 @@
 # src/generate_fact_sales.py
-import math
-import random
 import sqlite3
+from typing import Iterator
 
-DB_PATH = "data/pricing.db"
+import numpy as np
+
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.rng_streams import block_of, day_rng
+
+# joined rows simulated and written per chunk (whole dates; bounds memory)
+SALES_CHUNK_ROWS = 100_000
 
 # Baseline conversion by segment (before price effects)
 SEGMENT_BASE_CVR = {
@@ -22,138 +29,179 @@ CATEGORY_ELASTICITY = {
     "toys": 1.2,
 }
 
-def sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + math.exp(-x))
+# Units per order (UPO) = 1 + U(0, spread): beauty higher multi-unit, electronics mostly 1
+CATEGORY_UPO_SPREAD = {
+    "beauty": 0.8,
+    "home": 0.5,
+}
+DEFAULT_UPO_SPREAD = 0.25
+
+# driven by the date-leading covering index on fact_prices_shown (sql/indexes.sql): rows come
+# out in index order, so the stream needs no temp B-tree sort (the fact PKs lead with sku_id)
+JOINED_ROWS_SQL = """
+    SELECT
+        t.sku_id,
+        t.segment_id,
+        t.date,
+        t.sessions,
+        t.add_to_cart,
+        p.price_shown,
+        p.promo_active,
+        p.competitor_price,
+        s.unit_cost,
+        s.msrp,
+        s.category,
+        i.stockout_flag
+    FROM fact_prices_shown p
+    JOIN fact_traffic t
+      ON t.sku_id = p.sku_id AND t.segment_id = p.segment_id AND t.date = p.date
+    JOIN dim_sku s
+      ON t.sku_id = s.sku_id
+    JOIN fact_inventory i
+      ON t.sku_id = i.sku_id AND t.date = i.date
+    ORDER BY p.date, p.sku_id, p.segment_id
+"""
+
+
+def iter_joined_chunks(conn: sqlite3.Connection, chunk_rows: int = SALES_CHUNK_ROWS) -> Iterator[list]:
+    """
+    Join the needed tables at sku_id x segment_id x date grain (inventory at
+    sku_id x date) and stream them in chunks of whole dates: each date's draws
+    come from its own RNG stream, so a date must not straddle two chunks.
+    """
+    cur = conn.execute(JOINED_ROWS_SQL)
+    carry = []
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        rows = carry + rows
+        # hold back the trailing date: the rest of it may be in the next fetch
+        last_date = rows[-1][2]
+        cut = len(rows)
+        while cut > 0 and rows[cut - 1][2] == last_date:
+            cut -= 1
+        if cut == 0:
+            carry = rows
+            continue
+        carry = rows[cut:]
+        yield rows[:cut]
+    if carry:
+        yield carry
+
+
+def sku_blocks(conn: sqlite3.Connection, first_block: int = 0) -> dict[str, int]:
+    # RNG block of each SKU, matching the other generators' (sorted sku_id) blocks
+    sku_ids = [r[0] for r in conn.execute("SELECT sku_id FROM dim_sku ORDER BY sku_id")]
+    return dict(zip(sku_ids, block_of(np.arange(len(sku_ids)), first_block).tolist()))
+
+
+def lookup(values: np.ndarray, table: dict, default: float) -> np.ndarray:
+    # per-row value of a small {key: value} table (few keys, so one vector compare each)
+    out = np.full(len(values), default)
+    for key, value in table.items():
+        out[values == key] = value
+    return out
+
+
+def conversion_rates(seg: np.ndarray, category: np.ndarray, add_to_cart: np.ndarray, price: np.ndarray,
+                     promo_active: np.ndarray, competitor_price: np.ndarray, msrp: np.ndarray) -> np.ndarray:
+    """
+    Per-row conversion rate: logit(segment base CVR) + price, competitor, promo
+    and intent effects, mapped through a sigmoid and bounded to [0.0001, 0.25].
+    """
+    base_cvr = lookup(seg, SEGMENT_BASE_CVR, 0.02)
+    elasticity = lookup(category, CATEGORY_ELASTICITY, 1.0)
+
+    # price position signals (neutral when msrp / competitor price are unknown)
+    price_vs_msrp = np.divide(price, msrp, out=np.ones_like(price), where=msrp > 0)
+    has_comp = ~np.isnan(competitor_price) & (competitor_price != 0)
+    price_vs_comp = np.divide(price, competitor_price, out=np.ones_like(price), where=has_comp)
+
+    # convert to log space for smooth effects
+    # higher price vs msrp reduces conversion; promo increases
+    price_effect = -elasticity * np.log(price_vs_msrp + 1e-9)
+    comp_effect = -0.6 * np.log(price_vs_comp + 1e-9)
+    promo_effect = np.where(promo_active == 1, 0.35, 0.0)
+
+    # add-to-cart provides extra intent signal
+    intent = 0.15 * np.log1p(add_to_cart)
+
+    base_logit = np.log(base_cvr / (1 - base_cvr))
+    logit = base_logit + price_effect + comp_effect + promo_effect + intent
+    return np.clip(1.0 / (1.0 + np.exp(-logit)), 0.0001, 0.25)
 
-def clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
 
-def fetch_joined_rows(conn):
+def simulate_chunk(rows: list, seed: int, blocks: dict[str, int]) -> list[tuple]:
     """
-    Join the needed tables at sku_id x segment_id x date grain.
-    We also join inventory at sku_id x date.
+    Orders ~ Binomial(sessions, cvr) and units = round(orders * UPO) for a chunk
+    of whole dates. Each date × SKU block draws from
+    day_rng(seed, date, block), so the output depends only
+    on the seed, not on the chunk size or how the catalog was sharded.
     """
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            t.sku_id,
-            t.segment_id,
-            t.date,
-            t.sessions,
-            t.add_to_cart,
-            p.price_shown,
-            p.promo_active,
-            p.competitor_price,
-            s.unit_cost,
-            s.msrp,
-            s.category,
-            i.stockout_flag
-        FROM fact_traffic t
-        JOIN fact_prices_shown p
-          ON t.sku_id = p.sku_id AND t.segment_id = p.segment_id AND t.date = p.date
-        JOIN dim_sku s
-          ON t.sku_id = s.sku_id
-        JOIN fact_inventory i
-          ON t.sku_id = i.sku_id AND t.date = i.date
-        ORDER BY t.date, t.sku_id, t.segment_id
-    """)
-    return cur.fetchall()
-
-def main(seed: int = 7):
-    rng = random.Random(seed)
-
-    conn = sqlite3.connect(DB_PATH)
+    sku_id, segment_id, d, sessions, add_to_cart, price, promo_active, competitor_price, \
+        unit_cost, msrp, category, stockout_flag = zip(*rows)
+
+    sessions = np.array(sessions, dtype=np.int64)
+    price = np.array(price, dtype=float)
+    unit_cost = np.array(unit_cost, dtype=float)
+    msrp = np.array(msrp, dtype=float)  # None -> NaN
+    msrp = np.where(np.isnan(msrp), price, msrp)
+
+    category = np.array(category)
+    cvr = conversion_rates(
+        np.array(segment_id), category,
+        np.array(add_to_cart, dtype=float), price,
+        np.array(promo_active, dtype=np.int64), np.array(competitor_price, dtype=float), msrp,
+    )
+    # no sales on stockout days
+    sessions = np.where(np.array(stockout_flag) == 1, 0, sessions)
+    spread = lookup(category, CATEGORY_UPO_SPREAD, DEFAULT_UPO_SPREAD)
+
+    orders = np.zeros(len(rows), dtype=np.int64)
+    upo_u = np.zeros(len(rows))
+    dates = np.array(d)
+    block = np.array([blocks[sku] for sku in sku_id])
+    starts = np.flatnonzero(np.r_[True, (dates[1:] != dates[:-1]) | (block[1:] != block[:-1])])
+    for start, end in zip(starts, np.r_[starts[1:], len(rows)]):
+        rng = day_rng(seed, dates[start], int(block[start]))
+        orders[start:end] = rng.binomial(sessions[start:end], cvr[start:end])
+        upo_u[start:end] = rng.random(end - start)
+
+    units_sold = np.rint(orders * (1.0 + upo_u * spread)).astype(np.int64)
+    revenue = np.round(price * units_sold, 2)
+    profit = np.round((price - unit_cost) * units_sold, 2)
+
+    return list(zip(sku_id, segment_id, d, orders.tolist(), units_sold.tolist(), revenue.tolist(), profit.tolist()))
+
+
+def main(seed: int = 7, db_path: str = DB_PATH, chunk_rows: int = SALES_CHUNK_ROWS, first_block: int = 0):
+    stages = StageRecorder("generate_fact_sales")
+
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        rows_in = fetch_joined_rows(conn)
-
-        out_rows = []
-
-        for (
-            sku_id, segment_id, d,
-            sessions, add_to_cart,
-            price, promo_active, competitor_price,
-            unit_cost, msrp, category,
-            stockout_flag
-        ) in rows_in:
-            sessions = int(sessions)
-            add_to_cart = int(add_to_cart)
-            price = float(price)
-            unit_cost = float(unit_cost)
-            msrp = float(msrp) if msrp is not None else price
-
-            if stockout_flag == 1 or sessions == 0:
-                orders = 0
-                units_sold = 0
-            else:
-                base_cvr = SEGMENT_BASE_CVR.get(segment_id, 0.02)
-                elasticity = CATEGORY_ELASTICITY.get(category, 1.0)
-
-                # price position signals
-                price_vs_msrp = price / msrp if msrp > 0 else 1.0
-                price_vs_comp = price / float(competitor_price) if competitor_price else 1.0
-
-                # convert to log space for smooth effects
-                # higher price vs msrp reduces conversion; promo increases
-                price_effect = -elasticity * math.log(price_vs_msrp + 1e-9)
-                comp_effect = -0.6 * math.log(price_vs_comp + 1e-9)
-
-                promo_effect = 0.35 if int(promo_active) == 1 else 0.0
-
-                # add-to-cart provides extra intent signal
-                intent = 0.15 * math.log(1 + add_to_cart)
-
-                # Building a probability around base_cvr but bounded
-                # We map (logit(base) + effects) -> sigmoid
-                base_logit = math.log(base_cvr / (1 - base_cvr))
-                logit = base_logit + price_effect + comp_effect + promo_effect + intent
-
-                cvr = sigmoid(logit)
-                cvr = clamp(cvr, 0.0001, 0.25)
-
-                # Orders ~ Binomial(sessions, cvr) approximated by sum of Bernoulli (fast enough for this size)
-                orders = 0
-                # For speed, approximate with normal/poisson when sessions large
-                if sessions <= 80:
-                    for _ in range(sessions):
-                        orders += 1 if rng.random() < cvr else 0
-                else:
-                    # poisson approximation
-                    lam = sessions * cvr
-                    # simple Poisson sampler (Knuth)
-                    L = math.exp(-lam)
-                    k = 0
-                    p_acc = 1.0
-                    while p_acc > L:
-                        k += 1
-                        p_acc *= rng.random()
-                    orders = max(0, k - 1)
-
-                # Units per order (UPO): beauty higher multi-unit, electronics mostly 1
-                if category == "beauty":
-                    upo = 1.0 + rng.random() * 0.8
-                elif category == "home":
-                    upo = 1.0 + rng.random() * 0.5
-                else:
-                    upo = 1.0 + rng.random() * 0.25
-
-                units_sold = int(round(orders * upo))
-
-            revenue = round(price * units_sold, 2)
-            profit = round((price - unit_cost) * units_sold, 2)
-
-            out_rows.append((sku_id, segment_id, d, orders, units_sold, revenue, profit))
-
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO fact_sales
-            (sku_id, segment_id, date, orders, units_sold, revenue, profit)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            out_rows
-        )
-        conn.commit()
-        print(f" Inserted {len(out_rows)} rows into fact_sales")
+        blocks = sku_blocks(conn, first_block)
+        n_rows = 0
+        with stages.span("write"), bulk_load(conn, ["fact_sales"]) as load:
+            for rows_in in stages.iterate("fetch", iter_joined_chunks(conn, chunk_rows)):
+                with stages.span("simulate", rows=len(rows_in)):
+                    out_rows = simulate_chunk(rows_in, seed, blocks)
+
+                with stages.span("write", rows=len(out_rows)):
+                    load.insert(
+                        """
+                        INSERT OR REPLACE INTO fact_sales
+                        (sku_id, segment_id, date, orders, units_sold, revenue, profit)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        out_rows
+                    )
+                n_rows += len(out_rows)
+
+        print(f" Inserted {n_rows} rows into fact_sales")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
     finally:
         conn.close()
 
@@ -1,10 +1,15 @@
 # src/generate_fact_traffic.py
-import math
-import random
-import sqlite3
-from collections import defaultdict
+from typing import Iterator
 
-DB_PATH = "data/pricing.db"
+import numpy as np
+
+from src.bulk_load import bulk_load
+from src.db import DB_PATH, connect
+from src.instrumentation import StageRecorder
+from src.rng_streams import day_rng, sku_blocks, sku_rng
+
+# rows inserted per executemany (bounds memory for any catalog size)
+TRAFFIC_CHUNK_ROWS = 100_000
 
 SEGMENT_MULT = {
     "new": 1.00,
@@ -21,9 +26,16 @@ CATEGORY_BASE_SESSIONS = {
     "toys": (7, 65),
 }
 
+# add-to-cart rate range: lower on high_value (they may buy quickly later), higher on price_sensitive browsing
+SEGMENT_ATC_RATE = {
+    "price_sensitive": (0.05, 0.12),
+    "high_value": (0.02, 0.07),
+}
+DEFAULT_ATC_RATE = (0.03, 0.09)
+
 def fetch_skus(conn):
     cur = conn.cursor()
-    cur.execute("SELECT sku_id, category, is_kvi FROM dim_sku")
+    cur.execute("SELECT sku_id, category, is_kvi FROM dim_sku ORDER BY sku_id")
     return cur.fetchall()
 
 def fetch_calendar(conn):
@@ -37,81 +49,121 @@ def fetch_calendar(conn):
 
 def fetch_segments(conn):
     cur = conn.cursor()
-    cur.execute("SELECT segment_id FROM dim_segment")
+    cur.execute("SELECT segment_id FROM dim_segment ORDER BY segment_id")
     return [r[0] for r in cur.fetchall()]
 
-def clamp_int(x: float) -> int:
-    return max(0, int(round(x)))
-
-def main(seed: int = 999):
-    rng = random.Random(seed)
-
-    conn = sqlite3.connect(DB_PATH)
+def day_multiplier(dow: int, is_holiday: int, month: int) -> float:
+    # weekly seasonality: weekends higher browsing
+    weekend_boost = 1.25 if dow in (5, 6) else 1.0
+    holiday_boost = 1.50 if is_holiday == 1 else 1.0
+
+    # mild monthly seasonality (example)
+    month_boost = 1.10 if month in (11, 12) else 1.0
+
+    return weekend_boost * holiday_boost * month_boost
+
+def sku_popularity(is_kvi: np.ndarray, seed: int, first_block: int = 0) -> np.ndarray:
+    # baseline popularity weight per SKU; KVI items tend to have higher traffic
+    weight = np.empty(len(is_kvi))
+    for block, start, end in sku_blocks(len(is_kvi), first_block):
+        weight[start:end] = sku_rng(seed, block).uniform(0.6, 1.4, end - start)
+    return weight * np.where(is_kvi == 1, 1.25, 1.0)
+
+def simulate_block(
+    rng: np.random.Generator,
+    base_lo: np.ndarray,
+    base_hi: np.ndarray,
+    popularity: np.ndarray,
+    day_mult: float,
+    seg_mult: np.ndarray,
+    atc_lo: np.ndarray,
+    atc_hi: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sessions, views and add-to-cart for one day × SKU block, as (n_skus, n_segments) int arrays.
+    """
+    n_skus, n_segments = len(popularity), len(seg_mult)
+    base_sessions = rng.uniform(base_lo, base_hi) * popularity * day_mult
+
+    sessions = base_sessions[:, None] * seg_mult * rng.uniform(0.85, 1.15, (n_skus, n_segments))
+
+    # views roughly proportional; add-to-cart fraction varies by segment
+    views = sessions * rng.uniform(1.8, 4.5, (n_skus, n_segments))
+    add_to_cart = sessions * rng.uniform(atc_lo, atc_hi, (n_skus, n_segments))
+
+    def clamp_int(x: np.ndarray) -> np.ndarray:
+        return np.maximum(np.rint(x), 0).astype(np.int64)
+
+    return clamp_int(sessions), clamp_int(views), clamp_int(add_to_cart)
+
+def iter_traffic_chunks(skus, cal, segments, seed: int, chunk_rows: int = TRAFFIC_CHUNK_ROWS,
+                        first_block: int = 0) -> Iterator[list]:
+    """
+    fact_traffic rows in (date, sku_id, segment_id) order, in chunks of about chunk_rows.
+    """
+    sku_ids = [s[0] for s in skus]
+    base_lo = np.array([CATEGORY_BASE_SESSIONS[s[1]][0] for s in skus], dtype=float)
+    base_hi = np.array([CATEGORY_BASE_SESSIONS[s[1]][1] for s in skus], dtype=float)
+    popularity = sku_popularity(np.array([s[2] for s in skus]), seed, first_block)
+
+    seg_mult = np.array([SEGMENT_MULT.get(seg, 1.0) for seg in segments])
+    atc_lo = np.array([SEGMENT_ATC_RATE.get(seg, DEFAULT_ATC_RATE)[0] for seg in segments])
+    atc_hi = np.array([SEGMENT_ATC_RATE.get(seg, DEFAULT_ATC_RATE)[1] for seg in segments])
+
+    chunk = []
+    for (d, dow, is_holiday, month) in cal:
+        day_mult = day_multiplier(dow, is_holiday, month)
+
+        for block, start, end in sku_blocks(len(sku_ids), first_block):
+            sessions, views, add_to_cart = simulate_block(
+                day_rng(seed, d, block), base_lo[start:end], base_hi[start:end], popularity[start:end],
+                day_mult, seg_mult, atc_lo, atc_hi,
+            )
+            n = (end - start) * len(segments)
+            chunk.extend(zip(
+                np.repeat(sku_ids[start:end], len(segments)).tolist(),
+                segments * (end - start),
+                [d] * n,
+                sessions.ravel().tolist(),
+                views.ravel().tolist(),
+                add_to_cart.ravel().tolist(),
+            ))
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def main(seed: int = 999, db_path: str = DB_PATH, chunk_rows: int = TRAFFIC_CHUNK_ROWS, first_block: int = 0):
+    stages = StageRecorder("generate_fact_traffic")
+
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-
-        skus = fetch_skus(conn)
-        cal = fetch_calendar(conn)
-        segments = fetch_segments(conn)
-
-        rows = []
-
-        # give each sku a baseline popularity weight
-        sku_pop = {}
-        for sku_id, category, is_kvi in skus:
-            # KVI items tend to have higher traffic
-            base = rng.uniform(0.6, 1.4) * (1.25 if is_kvi == 1 else 1.0)
-            sku_pop[sku_id] = base
-
-        for (d, dow, is_holiday, month) in cal:
-            # weekly seasonality: weekends higher browsing
-            weekend_boost = 1.25 if dow in (5, 6) else 1.0
-            holiday_boost = 1.50 if is_holiday == 1 else 1.0
-
-            # mild monthly seasonality (example)
-            month_boost = 1.10 if month in (11, 12) else 1.0
-
-            day_mult = weekend_boost * holiday_boost * month_boost
-
-            for sku_id, category, is_kvi in skus:
-                base_lo, base_hi = CATEGORY_BASE_SESSIONS[category]
-                base_sessions = rng.uniform(base_lo, base_hi) * sku_pop[sku_id] * day_mult
-
-                for seg in segments:
-                    seg_mult = SEGMENT_MULT.get(seg, 1.0)
-
-                    sessions = base_sessions * seg_mult * rng.uniform(0.85, 1.15)
-
-                    # views roughly proportional; add-to-cart fraction varies
-                    views = sessions * rng.uniform(1.8, 4.5)
-
-                    # add-to-cart: lower on high_value (they may buy quickly later), higher on price_sensitive browsing
-                    if seg == "price_sensitive":
-                        atc_rate = rng.uniform(0.05, 0.12)
-                    elif seg == "high_value":
-                        atc_rate = rng.uniform(0.02, 0.07)
-                    else:
-                        atc_rate = rng.uniform(0.03, 0.09)
-
-                    add_to_cart = sessions * atc_rate
-
-                    rows.append((
-                        sku_id, seg, d,
-                        clamp_int(sessions),
-                        clamp_int(views),
-                        clamp_int(add_to_cart),
-                    ))
-
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO fact_traffic
-            (sku_id, segment_id, date, sessions, views, add_to_cart)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            rows,
-        )
-        conn.commit()
-        print(f"✅ Inserted {len(rows)} rows into fact_traffic")
+
+        with stages.span("fetch") as span:
+            skus = fetch_skus(conn)
+            cal = fetch_calendar(conn)
+            segments = fetch_segments(conn)
+            span.rows = len(skus)
+
+        n_rows = 0
+        chunks = iter_traffic_chunks(skus, cal, segments, seed, chunk_rows, first_block)
+        with stages.span("write"), bulk_load(conn, ["fact_traffic"]) as load:
+            for rows in stages.iterate("simulate", chunks):
+                with stages.span("write", rows=len(rows)):
+                    load.insert(
+                        """
+                        INSERT OR REPLACE INTO fact_traffic
+                        (sku_id, segment_id, date, sessions, views, add_to_cart)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        rows,
+                    )
+                n_rows += len(rows)
+        print(f"✅ Inserted {n_rows} rows into fact_traffic")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
     finally:
         conn.close()
 
@@ -1,11 +1,12 @@
 # src/inspect_recommendations.py
-import sqlite3
 from collections import Counter
 
-DB_PATH = "data/pricing.db"
+from src.db import connect_readonly
+from src.pricing.reasons import reason_count_sql
+
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         cur = conn.cursor()
 
@@ -26,23 +27,21 @@ def main():
         for sku, seg, price, eu, ep, reasons in cur.fetchall():
             print(f"  {sku} | {seg:14s} | price={price:8.2f} | exp_units={eu:7.4f} | exp_profit={ep:8.4f} | {reasons}")
 
-        # Reason code hit rates
-        cur.execute("""
-            SELECT reasons
+        # Reason code hit rates (one SQL pass over reason_mask bits)
+        cur.execute(f"""
+            SELECT COUNT(*) AS total, {reason_count_sql()}
             FROM pricing_recommendations
             WHERE run_date = ?
         """, (run_date,))
+        names = [d[0] for d in cur.description]
+        agg = dict(zip(names, cur.fetchone()))
+        total = agg.pop("total")
+
         ctr = Counter()
-        total = 0
-        for (reasons,) in cur.fetchall():
-            total += 1
-            if reasons is None or reasons.strip() == "":
-                ctr["(none)"] += 1
-            else:
-                for r in reasons.split(","):
-                    r = r.strip()
-                    if r:
-                        ctr[r] += 1
+        for name, v in agg.items():
+            code = "(none)" if name == "n_none" else name[len("n_"):]
+            if v:
+                ctr[code] = int(v)
 
         print("\nReason code counts:")
         for k, v in ctr.most_common():
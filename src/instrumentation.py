@@ -0,0 +1,182 @@
+# src/instrumentation.py
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+try:
+    import resource  # POSIX only; peak RSS is left NULL elsewhere
+except ImportError:
+    resource = None
+
+METRICS_SCHEMA_PATH = Path("sql/pipeline_metrics_schema.sql")
+
+# tracemalloc roughly doubles the cost of allocation-heavy stages: opt in with PIPELINE_TRACE_MEMORY=1
+TRACE_MEMORY_ENV = "PIPELINE_TRACE_MEMORY"
+
+MB = 1024 * 1024
+
+_END = object()
+
+
+def peak_rss_mb() -> Optional[float]:
+    # process high-water mark so far (ru_maxrss is KiB on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class StageMetrics:
+    wall_secs: float = 0.0
+    cpu_secs: float = 0.0
+    n_rows: int = 0
+    n_calls: int = 0
+    peak_traced_mb: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+
+
+class Span:
+    """
+    One open stage. Set `rows` inside the block when the count is only known at the end.
+    """
+
+    def __init__(self, stage: str, rows: int):
+        self.stage = stage
+        self.rows = rows
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        self.peak_traced = 0
+
+
+class StageRecorder:
+    """
+    Per-stage wall time, CPU time, rows and peak memory for one pipeline run.
+    Spans nest: a stage's times exclude the spans opened inside it (e.g. `predict`
+    inside `guardrails`), so the stages of a run add up to its total. Re-entering
+    a stage (once per chunk) accumulates into the same row.
+    Peak RSS is the process high-water mark when the stage closed. With
+    trace_memory (default: PIPELINE_TRACE_MEMORY=1) it also records the
+    tracemalloc high-water mark while the stage was open (Python + NumPy
+    allocations), at the cost of slower allocations.
+    """
+
+    def __init__(self, pipeline: str, enabled: bool = True, trace_memory: Optional[bool] = None):
+        if trace_memory is None:
+            trace_memory = os.environ.get(TRACE_MEMORY_ENV, "") not in ("", "0")
+        self.pipeline = pipeline
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.stages: dict[str, StageMetrics] = {}
+        self._open: list[Span] = []
+
+    @contextmanager
+    def span(self, stage: str, rows: int = 0) -> Iterator[Span]:
+        s = Span(stage, rows)
+        if not self.enabled:
+            yield s
+            return
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # close out the parent's peak so far; this span measures its own
+            if self._open:
+                self._open[-1].peak_traced = max(self._open[-1].peak_traced, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        self._open.append(s)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield s
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            self._open.pop()
+            if self._open:
+                self._open[-1].child_wall += wall
+                self._open[-1].child_cpu += cpu
+
+            m = self.stages.setdefault(stage, StageMetrics())
+            m.wall_secs += wall - s.child_wall
+            m.cpu_secs += cpu - s.child_cpu
+            m.n_rows += int(s.rows)
+            m.n_calls += 1
+            if self.trace_memory:
+                s.peak_traced = max(s.peak_traced, tracemalloc.get_traced_memory()[1])
+                m.peak_traced_mb = max(m.peak_traced_mb or 0.0, s.peak_traced / MB)
+                if self._open:
+                    self._open[-1].peak_traced = max(self._open[-1].peak_traced, s.peak_traced)
+                tracemalloc.reset_peak()
+            rss = peak_rss_mb()
+            if rss is not None:
+                m.peak_rss_mb = max(m.peak_rss_mb or 0.0, rss)
+
+    def iterate(self, stage: str, items: Iterable, count: Callable = len) -> Iterator:
+        """
+        Yield from items, timing each next() as `stage` (e.g. streamed fetchmany chunks).
+        count(item) -> rows credited to the stage.
+        """
+        it = iter(items)
+        while True:
+            with self.span(stage) as s:
+                item = next(it, _END)
+                if item is not _END:
+                    s.rows = count(item)
+            if item is _END:
+                return
+            yield item
+
+    def report(self) -> None:
+        if not self.stages:
+            return
+        total = sum(m.wall_secs for m in self.stages.values())
+        print(f" Stages ({self.pipeline}, {total:.2f}s):")
+        for stage, m in self.stages.items():
+            mem = ""
+            if m.peak_traced_mb is not None:
+                mem = f" {m.peak_traced_mb:8.1f} MB traced"
+            elif m.peak_rss_mb is not None:
+                mem = f" {m.peak_rss_mb:8.1f} MB rss"
+            print(f"   {stage:14s} {m.wall_secs:7.3f}s wall {m.cpu_secs:7.3f}s cpu {m.n_rows:9d} rows{mem}")
+
+    def write(self, conn: sqlite3.Connection, run_date: str) -> int:
+        """
+        Store this run's stages in pipeline_stage_metrics (one row per
+        run_date × pipeline × stage). A rerun replaces the pipeline's rows for
+        run_date, including stages it no longer ran.
+        """
+        if not self.enabled or not self.stages:
+            return 0
+        conn.executescript(METRICS_SCHEMA_PATH.read_text(encoding="utf-8"))
+        recorded_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        conn.execute("DELETE FROM pipeline_stage_metrics WHERE run_date = ? AND pipeline = ?",
+                     (run_date, self.pipeline))
+        conn.executemany(
+            """
+            INSERT INTO pipeline_stage_metrics
+            (run_date, pipeline, stage, wall_secs, cpu_secs, n_rows, n_calls,
+             peak_traced_mb, peak_rss_mb, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (run_date, self.pipeline, stage, m.wall_secs, m.cpu_secs, m.n_rows, m.n_calls,
+                 m.peak_traced_mb, m.peak_rss_mb, recorded_at)
+                for stage, m in self.stages.items()
+            ],
+        )
+        conn.commit()
+        return len(self.stages)
+
+
+# default for helpers called without a recorder (e.g. inside pool workers)
+NO_STAGES = StageRecorder("none", enabled=False)
@@ -1,73 +1,58 @@
 # src/make_train_valid_split.py
-import sqlite3
+from datetime import date, timedelta
 from pathlib import Path
+from typing import Iterator, Optional
+
+from src.storage import open_reader
 
-DB_PATH = "data/pricing.db"
 OUT_TRAIN = Path("data/train.csv")
 OUT_VALID = Path("data/valid.csv")
 
 VALID_DAYS = 28
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
+def write_csv(path: Path, colnames: list, batches: Iterator[list]) -> int:
+    # Writing header + rows manually, one batch at a time; returns the row count
+    n = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write(",".join(colnames) + "\n")
+        for rows in batches:
+            for row in rows:
+                f.write(",".join("" if v is None else str(v) for v in row) + "\n")
+            n += len(rows)
+    return n
 
+def main(backend: Optional[str] = None):
+    # sqlite (default) or parquet; PRICING_STORAGE picks one when not given
+    reader = open_reader(backend)
+    try:
         # Get max date in feature table
-        max_date = cur.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+        max_date = reader.max_date("feature_sku_segment_day")
         if max_date is None:
             raise ValueError("feature_sku_segment_day is empty")
 
         # Finding split date = max_date - VALID_DAYS + 1 (inclusive window)
-        # SQLite date arithmetic:
-        split_date = cur.execute(
-            "SELECT date(?, '-' || ? || ' days')",
-            (max_date, VALID_DAYS - 1),
-        ).fetchone()[0]
+        split_date = (date.fromisoformat(max_date) - timedelta(days=VALID_DAYS - 1)).isoformat()
 
         print(f"Max date:   {max_date}")
         print(f"Valid from: {split_date} (last {VALID_DAYS} days)")
-        print("Exporting CSVs...")
+        print(f"Exporting CSVs from {reader.backend}...")
 
         # Export train
-        train_rows = cur.execute("""
-            SELECT *
-            FROM feature_sku_segment_day
-            WHERE date < ?
-            ORDER BY date
-        """, (split_date,))
-
-        # Writing header + rows manually
-        colnames = [d[0] for d in train_rows.description]
+        colnames, train_batches = reader.read_batches("feature_sku_segment_day", end=split_date, order_by=["date"])
         OUT_TRAIN.parent.mkdir(parents=True, exist_ok=True)
-
-        with OUT_TRAIN.open("w", encoding="utf-8") as f:
-            f.write(",".join(colnames) + "\n")
-            for row in train_rows:
-                f.write(",".join("" if v is None else str(v) for v in row) + "\n")
+        n_train = write_csv(OUT_TRAIN, colnames, train_batches)
 
         # Exporting valid
-        valid_rows = cur.execute("""
-            SELECT *
-            FROM feature_sku_segment_day
-            WHERE date >= ?
-            ORDER BY date
-        """, (split_date,))
-
-        with OUT_VALID.open("w", encoding="utf-8") as f:
-            f.write(",".join(colnames) + "\n")
-            for row in valid_rows:
-                f.write(",".join("" if v is None else str(v) for v in row) + "\n")
+        _, valid_batches = reader.read_batches("feature_sku_segment_day", start=split_date, order_by=["date"])
+        n_valid = write_csv(OUT_VALID, colnames, valid_batches)
 
         # Printing counts
-        n_train = cur.execute("SELECT COUNT(*) FROM feature_sku_segment_day WHERE date < ?", (split_date,)).fetchone()[0]
-        n_valid = cur.execute("SELECT COUNT(*) FROM feature_sku_segment_day WHERE date >= ?", (split_date,)).fetchone()[0]
         print(f" Train rows: {n_train}")
         print(f" Valid rows: {n_valid}")
         print(f" Wrote: {OUT_TRAIN} and {OUT_VALID}")
 
     finally:
-        conn.close()
+        reader.close()
 
 if __name__ == "__main__":
     main()
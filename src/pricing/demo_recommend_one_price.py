@@ -1,41 +1,12 @@
 # src/demo_recommend_one_price.py
-import sqlite3
-import yaml
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import HistGradientBoostingRegressor
 
-from src.pricing.rules import Context, apply_guardrails
-from src.pricing.objective import ObjectiveInputs, expected_profit
-
-DB_PATH = "data/pricing.db"
-POLICY_PATH = "src/config/pricing_policy.yaml"
-
-# candidate multipliers (business-realistic discrete set)
-CANDIDATE_MULTS = [0.90, 0.95, 1.00, 1.05, 1.10]
-
-TARGET = "units_sold"
-DROP_COLS = ["sku_id", "segment_id", "date"]
-
-def load_policy():
-    with open(POLICY_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
-def train_model():
-    train = pd.read_csv("data/train.csv")
-    X = train.drop(columns=[TARGET] + DROP_COLS).fillna(0)
-    y = train[TARGET].astype(float)
-
-    for c in X.columns:
-        X[c] = pd.to_numeric(X[c], errors="coerce").fillna(0)
-
-    model = HistGradientBoostingRegressor(
-        learning_rate=0.08,
-        max_depth=6,
-        max_iter=200,
-        random_state=42
-    )
-    model.fit(X, y)
-    return model, list(X.columns)
+from src.db import connect_readonly
+from src.pricing.reasons import decode_reasons
+from src.pricing.policy import load_policy
+from src.pricing.search import search_prices
+from src.pricing.model_registry import get_or_train
 
 def fetch_one_valid_row(conn):
     # Taking one row from the last day for a KVI if possible
@@ -117,9 +88,13 @@ def make_model_features(features_df: pd.DataFrame, feature_cols: list):
 
 def main():
     policy = load_policy()
-    model, feature_cols = train_model()
+    # reuse the model registered for the current train.csv (train_units_model / run_pricing_job);
+    # only fits one when the registry has none, e.g. on a fresh checkout
+    registered, trained = get_or_train()
+    print(f"Model: {registered.tag} ({'trained' if trained else 'loaded from registry'})")
+    model, feature_cols = registered.model, registered.feature_cols
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         sku_id, segment_id, date_str = fetch_one_valid_row(conn)
         payload = fetch_context_and_features(conn, sku_id, segment_id, date_str)
@@ -136,66 +111,48 @@ def main():
         # base feature row (we will modify price-dependent fields per candidate)
         base_df = payload["features_df"]
 
+        print(f"Model: {registered.tag}")
         print(f"SKU={sku_id} segment={segment_id} date={date_str}")
         print(f"Logged price today: {payload['today_logged_price']}")
         print(f"Cost={unit_cost:.2f} MSRP={msrp:.2f} MAP={map_price if map_price else 'None'} KVI={is_kvi}")
         print(f"Competitor={competitor_price:.2f} DaysOfCover={days_of_cover} YesterdayPrice={yesterday_price}")
 
-        best = None
-
-        for m in CANDIDATE_MULTS:
-            raw_candidate = msrp * m
-
-            ctx = Context(
-                sku=sku_id,
-                segment=segment_id,
-                unit_cost=unit_cost,
-                msrp=msrp,
-                map_price=map_price,
-                yesterday_price=yesterday_price,
-                competitor_price=competitor_price,
-                is_kvi=is_kvi,
-                promo_active=promo_active,
-                promo_price=None,
-                days_of_cover=days_of_cover,
-            )
-
-            ruled = apply_guardrails(raw_candidate, ctx, policy)
-            final_price = ruled.final_price
-
-            # Create a temp feature row updated with candidate price
-            temp = base_df.copy()
-            temp.loc[:, "price_shown"] = final_price
-            temp.loc[:, "discount_pct_vs_msrp"] = (1.0 - (final_price / msrp)) if msrp else 0.0
-            temp.loc[:, "price_index_vs_comp"] = (final_price / competitor_price) if competitor_price else 0.0
+        def nan_if_none(v):
+            return np.nan if v is None else v
+
+        # the same search the pricing job runs, on a one-row batch
+        guard = {
+            "unit_cost": np.array([unit_cost]),
+            "msrp": np.array([msrp]),
+            "map_price": np.array([nan_if_none(map_price)]),
+            "yesterday_price": np.array([nan_if_none(yesterday_price)]),
+            "competitor_price": np.array([nan_if_none(competitor_price)]),
+            "is_kvi": np.array([float(is_kvi)]),
+            "promo_active": np.array([float(promo_active)]),
+            "days_of_cover": np.array([nan_if_none(days_of_cover)]),
+            "promo_price": np.array([payload["today_logged_price"]]),
+        }
+
+        def score(row_idx, prices):
+            # one feature row per candidate price, updated with price-dependent fields
+            temp = base_df.loc[base_df.index.repeat(len(prices))].reset_index(drop=True)
+            temp.loc[:, "price_shown"] = prices
+            temp.loc[:, "discount_pct_vs_msrp"] = (1.0 - (prices / msrp)) if msrp else 0.0
+            temp.loc[:, "price_index_vs_comp"] = (prices / competitor_price) if competitor_price else 0.0
 
             X = make_model_features(temp, feature_cols)
-            expected_units = float(model.predict(X)[0])
-
-            exp_profit = expected_profit(ObjectiveInputs(
-                price=final_price,
-                unit_cost=unit_cost,
-                expected_units=expected_units
-            ))
-
-            cand = {
-                "multiplier": m,
-                "raw_candidate": raw_candidate,
-                "final_price": final_price,
-                "expected_units": expected_units,
-                "expected_profit": exp_profit,
-                "reasons": ruled.reasons
-            }
-
-            if best is None or cand["expected_profit"] > best["expected_profit"]:
-                best = cand
+            return model.predict(X)
+
+        found = search_prices(guard, score, policy)
+        final_price = float(found.prices[0])
 
         print("\n=== Recommendation ===")
-        print(f"Recommended price: {best['final_price']:.2f}")
-        print(f"From multiplier:   {best['multiplier']:.2f} (raw {best['raw_candidate']:.2f})")
-        print(f"Expected units:    {best['expected_units']:.4f}")
-        print(f"Expected profit:   {best['expected_profit']:.4f}")
-        print(f"Reason codes:      {best['reasons']}")
+        print(f"Recommended price: {final_price:.2f}")
+        print(f"Vs MSRP:           {final_price / msrp:.4f}x")
+        print(f"Expected units:    {float(found.units[0]):.4f}")
+        print(f"Expected profit:   {float(found.profits[0]):.4f}")
+        print(f"Reason codes:      {decode_reasons(found.reason_mask[0])}")
+        print(f"Model evaluations: {int(found.n_evals[0])} ({policy.search.strategy})")
 
     finally:
         conn.close()
@@ -1,14 +1,8 @@
 # src/pricing/demo_run.py
-import yaml
-
+from src.pricing.policy import load_policy
 from src.pricing.rules import Context, apply_guardrails
 
 
-def load_policy(path: str = "src/config/pricing_policy.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
-
 def main():
     policy = load_policy()
 
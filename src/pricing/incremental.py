@@ -0,0 +1,80 @@
+# src/pricing/incremental.py
+import hashlib
+import sqlite3
+
+from src.pricing.policy import CompiledPolicy
+
+# run-row columns that identify the row rather than feed the price search
+KEY_COLS = ("sku_id", "segment_id")
+NON_INPUT_COLS = ("date",)
+
+
+def run_salt(model_tag: str, policy: CompiledPolicy) -> str:
+    """
+    Run-level part of every row fingerprint: model version + the full policy
+    (not just policy_version, so an edit without a version bump still reprices).
+    """
+    h = hashlib.sha256(model_tag.encode("utf-8"))
+    h.update(policy.fingerprint.encode("utf-8"))
+    return h.hexdigest()
+
+
+def row_fingerprints(cols: list[str], rows: list, salt: str) -> dict:
+    """
+    (sku_id, segment_id) -> hash of the row's pricing inputs (feature row,
+    guardrail context, yesterday price) plus the run salt. The run date itself
+    is left out so an unchanged row matches the previous day's recommendation.
+    """
+    key_idx = [cols.index(c) for c in KEY_COLS]
+    input_idx = [i for i, c in enumerate(cols) if c not in NON_INPUT_COLS]
+    salt_bytes = salt.encode("utf-8")
+
+    out = {}
+    for r in rows:
+        h = hashlib.blake2b(salt_bytes, digest_size=16)
+        # repr keeps floats exact and distinguishes None from 0
+        h.update(repr(tuple(r[i] for i in input_idx)).encode("utf-8"))
+        out[tuple(r[i] for i in key_idx)] = h.hexdigest()
+    return out
+
+
+def previous_recommendations(
+    conn: sqlite3.Connection,
+    run_date: str,
+    first_key: tuple[str, str],
+    last_key: tuple[str, str],
+) -> dict:
+    """
+    Latest stored recommendations on or before run_date (a rerun of the same
+    date, else the previous run) for SKU×segment keys in [first_key, last_key]:
+    (sku_id, segment_id) -> (fingerprint, result tuple).
+    """
+    cur = conn.execute(
+        """
+        SELECT sku_id, segment_id, recommended_price, expected_units, expected_profit,
+               reasons, n_model_evals, reason_mask, input_fingerprint
+        FROM pricing_recommendations
+        WHERE run_date = (SELECT MAX(run_date) FROM pricing_recommendations WHERE run_date <= ?)
+          AND (sku_id, segment_id) BETWEEN (?, ?) AND (?, ?)
+          AND input_fingerprint IS NOT NULL
+        """,
+        (run_date, *first_key, *last_key),
+    )
+    return {(r[0], r[1]): (r[8], tuple(r[:8])) for r in cur.fetchall()}
+
+
+def split_unchanged(cols: list[str], rows: list, fingerprints: dict, previous: dict) -> tuple[list[tuple], list]:
+    """
+    Split run rows into (reused results, rows to reprice). A row is reused when
+    its fingerprint equals the stored one for the same SKU×segment.
+    """
+    key_idx = [cols.index(c) for c in KEY_COLS]
+    reused, changed = [], []
+    for r in rows:
+        key = tuple(r[i] for i in key_idx)
+        prev = previous.get(key)
+        if prev is not None and prev[0] == fingerprints[key]:
+            reused.append(prev[1])
+        else:
+            changed.append(r)
+    return reused, changed
@@ -0,0 +1,202 @@
+# src/pricing/model_registry.py
+from __future__ import annotations
+
+import hashlib
+import json
+import pickle
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import sklearn
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+REGISTRY_DIR = Path("models")
+TRAIN_PATH = Path("data/train.csv")
+VALID_PATH = Path("data/valid.csv")
+
+UNITS_MODEL_NAME = "HistGradientBoostingRegressor_units_v1_noleak"
+
+TARGET = "units_sold"
+ID_COLS = ["sku_id", "segment_id", "date"]
+LABEL_LEAK_COLS = ["orders", "revenue", "profit"]  # do NOT use these as features
+
+HYPERPARAMS = {
+    "learning_rate": 0.08,
+    "max_depth": 6,
+    "max_iter": 200,
+    "random_state": 42,
+}
+
+
+@dataclass
+class RegisteredModel:
+    name: str
+    version: str
+    model: HistGradientBoostingRegressor
+    feature_cols: list[str]
+    meta: dict
+
+    @property
+    def tag(self) -> str:
+        # written into pricing_recommendations.model_name
+        return f"{self.name}@{self.version}"
+
+
+def fingerprint_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def model_version(train_fingerprint: str, hyperparams: dict) -> str:
+    """
+    Version = hash of training data + hyperparameters, so the same inputs map
+    to the same registry entry and only a data/param change triggers a refit.
+    """
+    h = hashlib.sha256(train_fingerprint.encode("utf-8"))
+    h.update(json.dumps(hyperparams, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def prepare_xy(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Split a feature table export into X/y for the units model.
+    IMPORTANT: outcome-like columns (orders/revenue/profit) are never features.
+    """
+    y = df[TARGET].astype(float)
+    X = df.drop(columns=[TARGET] + ID_COLS, errors="ignore")
+    X = X.drop(columns=[c for c in LABEL_LEAK_COLS if c in X.columns], errors="ignore")
+
+    # lags are missing on first day per SKU×segment
+    X = X.fillna(0)
+    for c in X.columns:
+        X[c] = pd.to_numeric(X[c], errors="coerce").fillna(0)
+    return X, y
+
+
+def train_units_model(
+    train_path: Path = TRAIN_PATH,
+    valid_path: Optional[Path] = VALID_PATH,
+    hyperparams: Optional[dict] = None,
+) -> tuple[HistGradientBoostingRegressor, list[str], dict]:
+    hyperparams = dict(HYPERPARAMS if hyperparams is None else hyperparams)
+
+    train = pd.read_csv(train_path)
+    X, y = prepare_xy(train)
+
+    model = HistGradientBoostingRegressor(**hyperparams)
+    model.fit(X, y)
+
+    metrics = {"n_train": int(len(X))}
+    if valid_path is not None and Path(valid_path).exists():
+        X_valid, y_valid = prepare_xy(pd.read_csv(valid_path))
+        X_valid = X_valid.reindex(columns=list(X.columns), fill_value=0)
+        pred = model.predict(X_valid)
+        metrics.update({
+            "n_valid": int(len(X_valid)),
+            "valid_mae": float(mean_absolute_error(y_valid, pred)),
+            "valid_rmse": float(mean_squared_error(y_valid, pred) ** 0.5),
+            "valid_avg_actual": float(y_valid.mean()),
+            "valid_avg_pred": float(pred.mean()),
+        })
+
+    return model, list(X.columns), metrics
+
+
+def _model_dir(name: str, version: str) -> Path:
+    return REGISTRY_DIR / name / version
+
+
+def save_model(
+    name: str,
+    model: HistGradientBoostingRegressor,
+    feature_cols: list[str],
+    train_path: Path,
+    train_fingerprint: str,
+    hyperparams: dict,
+    metrics: dict,
+) -> RegisteredModel:
+    version = model_version(train_fingerprint, hyperparams)
+    out_dir = _model_dir(name, version)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    meta = {
+        "name": name,
+        "version": version,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "train_path": str(train_path),
+        "train_fingerprint": train_fingerprint,
+        "hyperparams": hyperparams,
+        "feature_cols": feature_cols,
+        "metrics": metrics,
+        "sklearn_version": sklearn.__version__,
+    }
+
+    with open(out_dir / "model.pkl", "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    # written last: a half-saved version is never picked up as latest
+    (REGISTRY_DIR / name / "LATEST").write_text(version, encoding="utf-8")
+
+    return RegisteredModel(name=name, version=version, model=model, feature_cols=feature_cols, meta=meta)
+
+
+def list_versions(name: str = UNITS_MODEL_NAME) -> list[dict]:
+    base = REGISTRY_DIR / name
+    if not base.exists():
+        return []
+    metas = [json.loads(p.read_text(encoding="utf-8")) for p in base.glob("*/meta.json")]
+    return sorted(metas, key=lambda m: m["trained_at"])
+
+
+def load_model(name: str = UNITS_MODEL_NAME, version: Optional[str] = None) -> RegisteredModel:
+    """
+    Load a registered model by name and version (default: the latest saved version).
+    """
+    if version is None:
+        latest = REGISTRY_DIR / name / "LATEST"
+        if not latest.exists():
+            raise FileNotFoundError(f"No registered versions for model {name!r} in {REGISTRY_DIR}")
+        version = latest.read_text(encoding="utf-8").strip()
+
+    model_dir = _model_dir(name, version)
+    if not (model_dir / "model.pkl").exists():
+        raise FileNotFoundError(f"Model {name}@{version} not found in {REGISTRY_DIR}")
+
+    meta = json.loads((model_dir / "meta.json").read_text(encoding="utf-8"))
+    with open(model_dir / "model.pkl", "rb") as f:
+        model = pickle.load(f)
+
+    return RegisteredModel(name=name, version=version, model=model, feature_cols=meta["feature_cols"], meta=meta)
+
+
+def get_or_train(
+    name: str = UNITS_MODEL_NAME,
+    train_path: Path = TRAIN_PATH,
+    valid_path: Optional[Path] = VALID_PATH,
+    hyperparams: Optional[dict] = None,
+    force: bool = False,
+) -> tuple[RegisteredModel, bool]:
+    """
+    Return (model, trained). Loads the registered version matching the current
+    training data fingerprint + hyperparameters, and only refits when none exists.
+    """
+    hyperparams = dict(HYPERPARAMS if hyperparams is None else hyperparams)
+    fingerprint = fingerprint_file(train_path)
+    version = model_version(fingerprint, hyperparams)
+
+    if not force and (_model_dir(name, version) / "model.pkl").exists():
+        registered = load_model(name, version)
+        (REGISTRY_DIR / name / "LATEST").write_text(version, encoding="utf-8")
+        return registered, False
+
+    model, feature_cols, metrics = train_units_model(train_path, valid_path, hyperparams)
+    registered = save_model(name, model, feature_cols, train_path, fingerprint, hyperparams, metrics)
+    return registered, True
@@ -0,0 +1,52 @@
+# src/pricing/parallel.py
+import multiprocessing as mp
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from threadpoolctl import threadpool_limits
+
+from src.db import connect_readonly
+from src.pricing.model_registry import RegisteredModel, load_model
+from src.pricing.policy import CompiledPolicy
+
+# per-worker state, filled once by _init_worker
+_state = {}
+
+
+def _init_worker(model_name: str, model_version: str, policy: CompiledPolicy, db_path: Optional[str]) -> None:
+    # one model per process; keep sklearn single-threaded so N workers don't oversubscribe cores
+    threadpool_limits(1)
+    registered = load_model(model_name, model_version)
+    _state["model"] = registered.model
+    _state["feature_cols"] = registered.feature_cols
+    _state["policy"] = policy
+    _state["conn"] = connect_readonly(db_path) if db_path else None
+
+
+def worker_state() -> dict:
+    return _state
+
+
+def pricing_pool(
+    workers: int,
+    registered: RegisteredModel,
+    policy: CompiledPolicy,
+    db_path: Optional[str] = None,
+) -> ProcessPoolExecutor:
+    """
+    Process pool whose workers each hold the registered model, the policy and
+    (optionally) their own SQLite connection. Spawn context: fresh interpreters,
+    no forked OpenMP/SQLite state, and the same behaviour on Windows.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(registered.name, registered.version, policy, db_path),
+    )
+
+
+def shard_of(sku_id: str, n_shards: int) -> int:
+    # stable across processes and runs (built-in hash() is salted per interpreter)
+    return zlib.crc32(sku_id.encode("utf-8")) % n_shards
@@ -0,0 +1,73 @@
+# src/pricing/planner.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class PlanResult:
+    action: np.ndarray          # (n_skus,) price-level index to use today
+    horizon_profit: np.ndarray  # (n_skus,) expected profit of the plan over the horizon
+    path: np.ndarray            # (n_skus, horizon_days) price-level index per day along the expected stock path
+    stock_left: np.ndarray      # (n_skus,) expected units left at the end of the horizon
+
+
+def plan_inventory_dp(
+    demand: np.ndarray,
+    margin: np.ndarray,
+    stock: np.ndarray,
+    horizon_days: int,
+    stock_levels: int,
+) -> PlanResult:
+    """
+    Finite-horizon DP over (day, remaining stock) for every SKU at once.
+      - demand: (n_skus, n_actions) expected units per day at each price level
+      - margin: (n_skus, n_actions) expected profit per unit sold at that level
+      - stock: (n_skus,) units available for the whole horizon
+    Expected sales are min(demand, stock left); remaining stock is tracked on a
+    per-SKU grid of stock_levels points with linear interpolation between them.
+    Unsold stock keeps its cost, so it is worth 0 at the end (no fire sale).
+    With ample stock the plan reduces to the myopic best level every day.
+    """
+    n, n_actions = demand.shape
+    ar = np.arange(n)
+    stock = np.maximum(np.nan_to_num(stock, nan=0.0), 0.0)
+
+    levels = np.linspace(0.0, 1.0, stock_levels)
+    grid = stock[:, None] * levels                          # (n, L)
+    step = stock / (stock_levels - 1)
+    inv_step = np.divide(1.0, step, out=np.zeros_like(step), where=step > 0)
+
+    # sold / next-stock do not depend on the day: compute once
+    sold = np.minimum(demand[:, :, None], grid[:, None, :])  # (n, A, L)
+    pos = (grid[:, None, :] - sold) * inv_step[:, None, None]
+    lo = np.clip(np.floor(pos).astype(np.int64), 0, stock_levels - 2)
+    frac = pos - lo
+    reward = margin[:, :, None] * sold
+
+    value = np.zeros((n, stock_levels))
+    policy = np.empty((horizon_days, n, stock_levels), dtype=np.int16)
+    rows = ar[:, None, None]
+    for t in range(horizon_days - 1, -1, -1):
+        v_next = value[rows, lo] * (1.0 - frac) + value[rows, lo + 1] * frac
+        q = reward + v_next
+        policy[t] = np.argmax(q, axis=1)  # first max: the lowest price level on ties
+        value = q.max(axis=1)
+
+    # follow the plan from full stock along the expected path
+    path = np.empty((n, horizon_days), dtype=np.int16)
+    s = stock.copy()
+    for t in range(horizon_days):
+        level = np.clip(np.rint(s * inv_step).astype(np.int64), 0, stock_levels - 1)
+        a = policy[t][ar, level]
+        path[:, t] = a
+        s = s - np.minimum(demand[ar, a], s)
+
+    return PlanResult(
+        action=path[:, 0].astype(np.int64),
+        horizon_profit=value[:, -1],
+        path=path,
+        stock_left=s,
+    )
@@ -0,0 +1,239 @@
+# src/pricing/policy.py
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+POLICY_PATH = Path("src/config/pricing_policy.yaml")
+
+STRATEGIES = ("grid", "coarse_to_fine")
+
+
+@dataclass(frozen=True)
+class SearchConfig:
+    strategy: str
+    grid_mults: tuple[float, ...]  # grid candidates; min/max also bound the continuous search
+    coarse_points: int
+    refine_points: int
+    precision: float
+    max_evals_per_row: int
+
+
+@dataclass(frozen=True)
+class PriceFloorRule:
+    enabled: bool
+    min_margin_pct: float
+
+
+@dataclass(frozen=True)
+class PriceCeilingRule:
+    enabled: bool
+    enforce_map: bool
+
+
+@dataclass(frozen=True)
+class MaxDailyChangeRule:
+    enabled: bool
+    default_pct: float
+    low_stock_pct: float
+    overstock_pct: float  # downward moves only
+
+
+@dataclass(frozen=True)
+class PromoRule:
+    enabled: bool
+
+
+@dataclass(frozen=True)
+class CompetitorRule:
+    enabled: bool
+    max_over_competitor_pct: float
+
+
+@dataclass(frozen=True)
+class TrustRule:
+    enabled: bool
+    window_days: int
+    max_large_changes: int
+    large_change_threshold_pct: float
+
+
+@dataclass(frozen=True)
+class PlannerConfig:
+    enabled: bool
+    horizon_days: int
+    price_mults: tuple[float, ...]  # msrp multiples, guardrailed like search candidates
+    stock_levels: int               # DP grid points for remaining stock
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """
+    pricing_policy.yaml parsed, validated and converted once. Immutable and
+    picklable, so it is shared by the guardrails, the search and pool workers.
+    """
+    version: str
+    fingerprint: str  # hash of the full YAML content (see incremental.run_salt)
+    price_floor: PriceFloorRule
+    price_ceiling: PriceCeilingRule
+    max_daily_change: MaxDailyChangeRule
+    promo: PromoRule
+    competitor: CompetitorRule
+    trust: TrustRule
+    low_stock_days_of_cover_lt: float
+    overstock_days_of_cover_gt: float
+    search: SearchConfig
+    planner: PlannerConfig
+    search_profiles: tuple[tuple[str, SearchConfig], ...] = ()
+    source: Optional[str] = None
+
+    def search_for(self, profile: Optional[str] = None) -> SearchConfig:
+        """
+        Search settings for a profile (e.g. "quote"); the base settings when None.
+        """
+        if profile is None:
+            return self.search
+        for name, cfg in self.search_profiles:
+            if name == profile:
+                return cfg
+        raise KeyError(f"policy {self.version} has no search profile {profile!r}")
+
+
+def search_config(raw: dict, profile: Optional[str] = None) -> SearchConfig:
+    """
+    Parse the policy's `search` block; `profile` (e.g. "quote") overlays the
+    matching sub-block on top of the base settings.
+    """
+    cfg = dict(raw.get("search", {}))
+    if profile is not None:
+        cfg.update(cfg.get(profile, {}))
+    out = SearchConfig(
+        strategy=str(cfg.get("strategy", "grid")),
+        grid_mults=tuple(float(m) for m in cfg.get("grid_mults", [0.90, 0.95, 1.00, 1.05, 1.10])),
+        coarse_points=int(cfg.get("coarse_points", 5)),
+        refine_points=int(cfg.get("refine_points", 4)),
+        precision=float(cfg.get("precision", 0.01)),
+        max_evals_per_row=int(cfg.get("max_evals_per_row", 40)),
+    )
+    if out.strategy not in STRATEGIES:
+        raise ValueError(f"search.strategy must be one of {STRATEGIES}, got {out.strategy!r}")
+    if not out.grid_mults or min(out.grid_mults) <= 0:
+        raise ValueError("search.grid_mults must be non-empty and > 0")
+    if out.coarse_points < 2 or out.refine_points < 2 or out.refine_points % 2:
+        raise ValueError("search.coarse_points must be >= 2 and search.refine_points an even number >= 2")
+    if out.precision <= 0:
+        raise ValueError("search.precision must be > 0")
+    return out
+
+
+def planner_config(raw: dict) -> PlannerConfig:
+    cfg = raw.get("planner", {})
+    out = PlannerConfig(
+        enabled=bool(cfg.get("enabled", False)),
+        horizon_days=int(cfg.get("horizon_days", 14)),
+        price_mults=tuple(float(m) for m in cfg.get("price_mults", [0.85, 0.90, 0.95, 1.00, 1.05, 1.10])),
+        stock_levels=int(cfg.get("stock_levels", 64)),
+    )
+    if out.horizon_days < 1:
+        raise ValueError("planner.horizon_days must be >= 1")
+    if not out.price_mults or min(out.price_mults) <= 0:
+        raise ValueError("planner.price_mults must be non-empty and > 0")
+    if out.stock_levels < 2:
+        raise ValueError("planner.stock_levels must be >= 2")
+    return out
+
+
+def _section(raw: dict, *path: str) -> dict:
+    node = raw
+    for i, key in enumerate(path):
+        if not isinstance(node, dict) or key not in node:
+            raise ValueError(f"policy is missing `{'.'.join(path[:i + 1])}`")
+        node = node[key]
+    return node
+
+
+def _pct(section: dict, key: str, where: str, below_one: bool = True) -> float:
+    if key not in section:
+        raise ValueError(f"policy is missing `{where}.{key}`")
+    value = float(section[key])
+    if value < 0.0 or (below_one and value >= 1.0):
+        bounds = "[0, 1)" if below_one else ">= 0"
+        raise ValueError(f"`{where}.{key}` must be {bounds}, got {value}")
+    return value
+
+
+def compile_policy(raw: dict, source: Optional[str] = None) -> CompiledPolicy:
+    """
+    Validate a parsed policy dict and convert every threshold once.
+    Raises ValueError naming the offending key.
+    """
+    g = _section(raw, "guardrails")
+
+    floor = _section(g, "price_floor")
+    ceiling = _section(g, "price_ceiling")
+    change = _section(g, "max_daily_change")
+    promo = _section(g, "promo")
+    comp = _section(g, "competitor")
+    trust = _section(g, "trust")
+    flags = _section(raw, "inventory_flags")
+
+    trust_rule = TrustRule(
+        enabled=bool(trust["enabled"]),
+        window_days=int(trust.get("window_days", 7)),
+        max_large_changes=int(trust.get("max_large_changes", 3)),
+        large_change_threshold_pct=_pct(trust, "large_change_threshold_pct", "guardrails.trust"),
+    )
+    if trust_rule.window_days < 1 or trust_rule.max_large_changes < 0:
+        raise ValueError("guardrails.trust.window_days must be >= 1 and max_large_changes >= 0")
+
+    low_lt = float(_section(flags, "low_stock_days_of_cover_lt"))
+    over_gt = float(_section(flags, "overstock_days_of_cover_gt"))
+    if low_lt > over_gt:
+        raise ValueError("inventory_flags.low_stock_days_of_cover_lt must be <= overstock_days_of_cover_gt")
+
+    profiles = tuple(
+        (name, search_config(raw, profile=name))
+        for name, value in raw.get("search", {}).items()
+        if isinstance(value, dict)
+    )
+
+    return CompiledPolicy(
+        version=str(raw.get("policy_version", "unknown")),
+        fingerprint=hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode("utf-8")).hexdigest(),
+        price_floor=PriceFloorRule(
+            enabled=bool(floor["enabled"]),
+            min_margin_pct=_pct(floor, "min_margin_pct", "guardrails.price_floor", below_one=False),
+        ),
+        price_ceiling=PriceCeilingRule(
+            enabled=bool(ceiling["enabled"]),
+            enforce_map=bool(ceiling.get("enforce_map", False)),
+        ),
+        max_daily_change=MaxDailyChangeRule(
+            enabled=bool(change["enabled"]),
+            default_pct=_pct(change, "default_pct", "guardrails.max_daily_change"),
+            low_stock_pct=_pct(change, "low_stock_pct", "guardrails.max_daily_change"),
+            overstock_pct=_pct(change, "overstock_pct", "guardrails.max_daily_change"),
+        ),
+        promo=PromoRule(enabled=bool(promo["enabled"])),
+        competitor=CompetitorRule(
+            enabled=bool(comp["enabled"]),
+            max_over_competitor_pct=_pct(comp, "max_over_competitor_pct", "guardrails.competitor", below_one=False),
+        ),
+        trust=trust_rule,
+        low_stock_days_of_cover_lt=low_lt,
+        overstock_days_of_cover_gt=over_gt,
+        search=search_config(raw),
+        planner=planner_config(raw),
+        search_profiles=profiles,
+        source=source,
+    )
+
+
+def load_policy(path: Path = POLICY_PATH) -> CompiledPolicy:
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_policy(yaml.safe_load(f), source=str(path))
@@ -0,0 +1,235 @@
+# src/pricing/price_history.py
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.pricing.policy import TrustRule
+
+PRICE_HISTORY_PATH = Path("data/price_history.npz")
+
+# extra run-row column added by PriceHistory.annotate (read by guard_columns)
+LARGE_CHANGES_COL = "recent_large_changes"
+
+
+def _dates(start: str, end: str) -> list[str]:
+    d0, d1 = date.fromisoformat(start), date.fromisoformat(end)
+    return [(d0 + timedelta(days=i)).isoformat() for i in range((d1 - d0).days + 1)]
+
+
+def large_change_flags(prev: np.ndarray, cur: np.ndarray, threshold_pct: float) -> np.ndarray:
+    # a move is "large" when it exceeds the threshold relative to the previous price
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.abs(cur / prev - 1.0) > threshold_pct
+
+
+def prices_digest(rows: list[tuple]) -> str:
+    """
+    Checksum of one day's (sku_id, segment_id, price_shown) rows, any order. Ties
+    a saved history to the fact_prices_shown it was built from.
+    """
+    h = hashlib.sha1()
+    for r in sorted(rows):
+        h.update(repr(r).encode())
+    return h.hexdigest()
+
+
+def day_digest(conn: sqlite3.Connection, day: str) -> str:
+    rows = conn.execute(
+        "SELECT sku_id, segment_id, price_shown FROM fact_prices_shown WHERE date = ?", (day,)
+    ).fetchall()
+    return prices_digest(rows)
+
+
+def count_large_changes(prices: list[float], threshold_pct: float) -> int:
+    """
+    Large day-over-day moves in a price list ordered oldest -> newest.
+    """
+    a = np.array(prices, dtype=float)
+    return int(large_change_flags(a[:-1], a[1:], threshold_pct).sum())
+
+
+class PriceHistory:
+    """
+    Last `window_days` shown prices per SKU×segment in a fixed-width ring buffer.
+    Alongside the prices it keeps a large-change flag per day and a running
+    count of flags inside the window, so the count for any row is an O(1)
+    lookup and advancing one day is a single O(n_keys) column write.
+    """
+
+    def __init__(self, keys: list[tuple[str, str]], window_days: int, threshold_pct: float):
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.window_days = window_days
+        self.threshold_pct = threshold_pct
+        self.prices = np.full((len(keys), window_days), np.nan)
+        # flag for the move into each column; the oldest column's move is outside the window
+        self.large = np.zeros((len(keys), window_days), dtype=bool)
+        self.counts = np.zeros(len(keys), dtype=np.int16)
+        self.pos = 0  # column the next push overwrites (= oldest day)
+        self.end_date: Optional[str] = None
+        # prices_digest of end_date's logged prices, set when loaded or advanced from a database
+        self.source_digest: Optional[str] = None
+
+    def push(self, day: str, prices: np.ndarray) -> None:
+        """
+        Append one day's prices (aligned with self.keys, NaN = not shown) in place.
+        """
+        if self.end_date is not None:
+            expected = (date.fromisoformat(self.end_date) + timedelta(days=1)).isoformat()
+            if day != expected:
+                raise ValueError(f"push expects {expected} (the day after {self.end_date}), got {day}")
+        latest = self.prices[:, (self.pos - 1) % self.window_days]
+        flags = large_change_flags(latest, prices, self.threshold_pct)
+
+        self.prices[:, self.pos] = prices
+        self.large[:, self.pos] = flags
+        self.counts += flags
+
+        # the next-oldest day's move drops out of the window
+        self.pos = (self.pos + 1) % self.window_days
+        self.counts -= self.large[:, self.pos]
+        self.end_date = day
+
+    def large_change_counts(self, keys: list[tuple[str, str]]) -> np.ndarray:
+        """
+        Large moves among the last window_days - 1 day-over-day changes, per key
+        (NaN for keys without history). Today's candidate move is the window's last one.
+        """
+        idx = np.array([self.index.get(k, -1) for k in keys], dtype=np.int64)
+        out = np.full(len(keys), np.nan)
+        known = idx >= 0
+        out[known] = self.counts[idx[known]]
+        return out
+
+    def recent_prices(self, key: tuple[str, str]) -> Optional[list[float]]:
+        """
+        key's shown prices, oldest -> newest (Context.recent_prices for the scalar rules).
+        """
+        i = self.index.get(key)
+        if i is None:
+            return None
+        return np.roll(self.prices[i], -self.pos).tolist()
+
+    def annotate(self, cols: list[str], rows: list) -> tuple[list[str], list]:
+        """
+        Append LARGE_CHANGES_COL to fetched run rows, so the count travels with
+        each row into sharded workers and incremental fingerprints.
+        """
+        sku_idx, seg_idx = cols.index("sku_id"), cols.index("segment_id")
+        counts = self.large_change_counts([(r[sku_idx], r[seg_idx]) for r in rows])
+        values = [None if np.isnan(c) else int(c) for c in counts.tolist()]
+        return cols + [LARGE_CHANGES_COL], [tuple(r) + (v,) for r, v in zip(rows, values)]
+
+    # --- loading / persistence ---
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, end_date: str, trust: TrustRule) -> "PriceHistory":
+        """
+        Bulk-load shown prices for the window ending at end_date in one query
+        (date-leading covering index on fact_prices_shown).
+        """
+        days = _dates((date.fromisoformat(end_date) - timedelta(days=trust.window_days - 1)).isoformat(), end_date)
+        cur = conn.execute(
+            """
+            SELECT date, sku_id, segment_id, price_shown
+            FROM fact_prices_shown
+            WHERE date BETWEEN ? AND ?
+            """,
+            (days[0], days[-1]),
+        )
+        by_day = {d: {} for d in days}
+        for d, sku, seg, price in cur:
+            by_day[d][(sku, seg)] = price
+
+        keys = sorted(set().union(*(v.keys() for v in by_day.values())))
+        history = cls(keys, trust.window_days, trust.large_change_threshold_pct)
+        for d in days:
+            history.push(d, history._aligned(by_day[d]))
+        history.source_digest = prices_digest([k + (p,) for k, p in by_day[end_date].items()])
+        return history
+
+    def _aligned(self, prices_by_key: dict) -> np.ndarray:
+        out = np.full(len(self.keys), np.nan)
+        for k, p in prices_by_key.items():
+            i = self.index.get(k)
+            if i is not None and p is not None:
+                out[i] = p
+        return out
+
+    def advance(self, conn: sqlite3.Connection, day: str) -> bool:
+        """
+        Push one logged day from fact_prices_shown in place. Returns False (and
+        changes nothing) when the day has SKU×segments this history doesn't track.
+        """
+        rows = conn.execute(
+            "SELECT sku_id, segment_id, price_shown FROM fact_prices_shown WHERE date = ?", (day,)
+        ).fetchall()
+        prices_by_key = {(sku, seg): price for sku, seg, price in rows}
+        if any(k not in self.index for k in prices_by_key):
+            return False
+        self.push(day, self._aligned(prices_by_key))
+        self.source_digest = prices_digest(rows)
+        return True
+
+    def save(self, path: Path = PRICE_HISTORY_PATH) -> None:
+        np.savez(
+            path,
+            sku_id=np.array([k[0] for k in self.keys]),
+            segment_id=np.array([k[1] for k in self.keys]),
+            prices=self.prices,
+            large=self.large,
+            counts=self.counts,
+            pos=self.pos,
+            end_date=self.end_date or "",
+            window_days=self.window_days,
+            threshold_pct=self.threshold_pct,
+            source_digest=self.source_digest or "",
+        )
+
+    @classmethod
+    def from_file(cls, path: Path = PRICE_HISTORY_PATH) -> "PriceHistory":
+        with np.load(path) as z:
+            keys = list(zip(z["sku_id"].tolist(), z["segment_id"].tolist()))
+            history = cls(keys, int(z["window_days"]), float(z["threshold_pct"]))
+            history.prices = z["prices"].copy()
+            history.large = z["large"].copy()
+            history.counts = z["counts"].copy()
+            history.pos = int(z["pos"])
+            history.end_date = str(z["end_date"]) or None
+            # files saved before the digest existed never match a database
+            history.source_digest = str(z["source_digest"]) if "source_digest" in z.files else None
+        return history
+
+
+def open_price_history(
+    conn: sqlite3.Connection,
+    end_date: str,
+    trust: TrustRule,
+    path: Optional[Path] = PRICE_HISTORY_PATH,
+) -> PriceHistory:
+    """
+    History for the window ending at end_date. Reuses the saved store when it
+    has the same window/threshold, was built from this database (its last day's
+    prices still match fact_prices_shown) and only needs a few logged days pushed;
+    otherwise bulk-loads from fact_prices_shown.
+    """
+    if path is not None and Path(path).exists():
+        history = PriceHistory.from_file(path)
+        compatible = (
+            history.window_days == trust.window_days
+            and history.threshold_pct == trust.large_change_threshold_pct
+            and history.end_date is not None
+            and history.end_date <= end_date
+            and history.source_digest == day_digest(conn, history.end_date)
+        )
+        missing = _dates(history.end_date, end_date)[1:] if compatible else []
+        if compatible and len(missing) < trust.window_days and all(history.advance(conn, d) for d in missing):
+            return history
+
+    return PriceHistory.load(conn, end_date, trust)
@@ -0,0 +1,217 @@
+# src/pricing/quote_service.py
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from threadpoolctl import ThreadpoolController
+
+from src.db import connect_readonly
+from src.pricing.model_registry import UNITS_MODEL_NAME, load_model
+from src.pricing.reasons import decode_reasons
+from src.pricing.price_history import PRICE_HISTORY_PATH, open_price_history
+from src.pricing.run_context import fetch_run_rows, previous_date
+from src.pricing.policy import load_policy
+from src.pricing.search import search_prices
+from src.run_pricing_job import (
+    DB_PATH,
+    candidate_features,
+    guard_columns,
+    row_features,
+    score_candidates,
+)
+
+# latencies kept for the p50/p99 counters (most recent quotes)
+LATENCY_WINDOW = 10_000
+
+
+@dataclass
+class Quote:
+    sku_id: str
+    segment_id: str
+    run_date: str
+    price: float
+    expected_units: float
+    expected_profit: float
+    reasons: list[str]
+    n_model_evals: int
+    latency_ms: float
+
+
+class QuoteService:
+    """
+    In-process single-quote API. Loads the model and policy once and keeps the
+    run date's per-SKU×segment context (cost, MSRP, MAP, KVI, competitor/promo,
+    yesterday price, inventory cover, demand features) in memory, so a quote is
+    the price search alone: no SQLite, no pandas reads, no refit.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        model_name: str = UNITS_MODEL_NAME,
+        model_version: Optional[str] = None,
+        run_date: Optional[str] = None,
+    ):
+        self.db_path = db_path
+        self.policy = load_policy()
+        self.search_cfg = self.policy.search_for("quote")
+
+        registered = load_model(model_name, model_version)
+        self.model = registered.model
+        self.feature_cols = registered.feature_cols
+        self.model_tag = registered.tag
+
+        # library discovery is slow; do it once and reuse the controller per quote
+        self._threadpools = ThreadpoolController()
+
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.n_quotes = 0
+        self.refresh(run_date)
+
+    def refresh(self, run_date: Optional[str] = None) -> int:
+        """
+        (Re)load the context cache for run_date (default: latest feature date).
+        """
+        conn = connect_readonly(self.db_path)
+        try:
+            if run_date is None:
+                run_date = conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+                if run_date is None:
+                    raise ValueError("feature_sku_segment_day is empty")
+            cols, rows = fetch_run_rows(conn, run_date)
+            if self.policy.trust.enabled:
+                # the job's saved window for this database (read-only here)
+                history_path = Path(self.db_path).with_name(PRICE_HISTORY_PATH.name)
+                history = open_price_history(conn, previous_date(run_date), self.policy.trust, history_path)
+                cols, rows = history.annotate(cols, rows)
+        finally:
+            conn.close()
+
+        recs = [rec for rec in (dict(zip(cols, r)) for r in rows)
+                if rec["msrp"] is not None and float(rec["msrp"]) > 0]
+
+        self.run_date = run_date
+        self._recs = recs
+        self._guard = guard_columns(recs)
+        self._features = row_features(recs, self.feature_cols)
+        self._index = {(rec["sku_id"], rec["segment_id"]): i for i, rec in enumerate(recs)}
+        return len(recs)
+
+    def quote(self, sku_id: str, segment_id: str) -> Quote:
+        t0 = time.perf_counter()
+
+        i = self._index.get((sku_id, segment_id))
+        if i is None:
+            raise KeyError(f"No context for sku_id={sku_id!r} segment_id={segment_id!r} on {self.run_date}")
+
+        guard = {k: v[i:i + 1] for k, v in self._guard.items()}
+
+        def score(row_idx: np.ndarray, prices: np.ndarray) -> np.ndarray:
+            # the search sees a one-row guard; row 0 is cached row i
+            X = candidate_features(self._features, row_idx + i, prices)
+            return score_candidates(self.model, X, self.feature_cols)
+
+        # small batches: OpenMP start-up costs more than it saves
+        with self._threadpools.limit(limits=1):
+            found = search_prices(guard, score, self.policy, self.search_cfg)
+
+        latency_ms = (time.perf_counter() - t0) * 1000.0
+        self._latencies_ms.append(latency_ms)
+        self.n_quotes += 1
+
+        return Quote(
+            sku_id=sku_id,
+            segment_id=segment_id,
+            run_date=self.run_date,
+            price=float(found.prices[0]),
+            expected_units=float(found.units[0]),
+            expected_profit=float(found.profits[0]),
+            reasons=decode_reasons(found.reason_mask[0]),
+            n_model_evals=int(found.n_evals[0]),
+            latency_ms=latency_ms,
+        )
+
+    def latency_stats(self) -> dict:
+        lat = np.asarray(self._latencies_ms, dtype=float)
+        return {
+            "n_quotes": self.n_quotes,
+            "window": int(lat.size),
+            "p50_ms": float(np.percentile(lat, 50)) if lat.size else None,
+            "p99_ms": float(np.percentile(lat, 99)) if lat.size else None,
+            "max_ms": float(lat.max()) if lat.size else None,
+        }
+
+
+async def _handle(service: QuoteService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        # drain headers; GET requests carry no body
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+        url = urlsplit(parts[1]) if len(parts) >= 2 else urlsplit("/")
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        status, body = 200, None
+        if len(parts) < 2 or parts[0] != "GET":
+            status, body = 405, {"error": "only GET is supported"}
+        elif url.path == "/quote":
+            try:
+                body = asdict(service.quote(params["sku_id"], params["segment_id"]))
+            except KeyError as e:
+                status, body = 404, {"error": str(e).strip("'\"")}
+        elif url.path == "/metrics":
+            body = {**service.latency_stats(), "run_date": service.run_date, "model_name": service.model_tag}
+        elif url.path == "/health":
+            body = {"status": "ok"}
+        else:
+            status, body = 404, {"error": f"unknown path {url.path}"}
+
+        payload = json.dumps(body).encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(service: QuoteService, host: str, port: int) -> None:
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    print(f" Quote service on http://{host}:{port} (run_date={service.run_date}, model={service.model_tag})")
+    print("   GET /quote?sku_id=...&segment_id=...   GET /metrics   GET /health")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve single SKU×segment price quotes over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--run-date", help="context date to cache (default: latest feature date)")
+    parser.add_argument("--model-version", help="registered model version (default: latest)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    service = QuoteService(model_version=args.model_version, run_date=args.run_date)
+    print(f" Loaded {len(service._index)} SKU×segment contexts in {time.perf_counter() - t0:.2f}s")
+
+    asyncio.run(serve(service, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
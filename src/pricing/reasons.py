@@ -0,0 +1,52 @@
+# src/pricing/reasons.py
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+
+# Reason codes in the order the rules fire. Bit i of a reason mask is REASON_CODES[i],
+# so decoding a mask in bit order gives the same list apply_guardrails returns.
+# Append new codes at the end: stored reason_mask values depend on these positions.
+REASON_CODES = (
+    "PROMO_LOCK",
+    "MARGIN_FLOOR_APPLIED",
+    "MAP_FLOOR_APPLIED",
+    "MSRP_CEILING_APPLIED",
+    "MAX_DAILY_CHANGE_CLAMPED",
+    "COMPETITOR_CAP_APPLIED",
+    "TRUST_VOLATILITY_CLAMPED",
+)
+REASON_BITS = {code: 1 << i for i, code in enumerate(REASON_CODES)}
+REASON_MASK_DTYPE = np.uint16
+
+
+def decode_reasons(mask: int) -> List[str]:
+    return [code for i, code in enumerate(REASON_CODES) if int(mask) & (1 << i)]
+
+
+def reasons_string(mask: int) -> str:
+    # the comma-separated `reasons` column, derived from the mask
+    return ",".join(decode_reasons(mask))
+
+
+def reason_count_sql(column: str = "reason_mask") -> str:
+    """
+    SELECT-list fragment counting rows per reason code in one pass:
+    n_<CODE> for every code plus n_none for rows without any reason.
+    """
+    parts = [f"SUM(({column} & {bit}) != 0) AS n_{code}" for code, bit in REASON_BITS.items()]
+    parts.append(f"SUM({column} = 0) AS n_none")
+    return ",\n".join(parts)
+
+
+def reason_mask_from_string_sql(column: str = "reasons") -> str:
+    """
+    SQL expression rebuilding the mask from a comma-separated reasons column
+    (fills reason_mask for rows written before the column existed).
+    """
+    terms = [
+        f"(CASE WHEN instr(',' || IFNULL({column}, '') || ',', ',{code},') > 0 THEN {bit} ELSE 0 END)"
+        for code, bit in REASON_BITS.items()
+    ]
+    return " + ".join(terms)
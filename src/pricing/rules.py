@@ -4,6 +4,12 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Optional
 
+import numpy as np
+
+from src.pricing.policy import CompiledPolicy
+from src.pricing.price_history import count_large_changes
+from src.pricing.reasons import REASON_BITS, REASON_MASK_DTYPE
+
 
 @dataclass
 class Context:
@@ -18,7 +24,7 @@ class Context:
     promo_active: bool
     promo_price: Optional[float]
     days_of_cover: Optional[float]
-    # later phases will populate this (used for weekly volatility checks)
+    # shown prices for the trust window, oldest -> newest, ending yesterday
     recent_prices: Optional[List[float]] = None
 
 
@@ -28,6 +34,12 @@ class RuleResult:
     reasons: List[str]
 
 
+@dataclass
+class BatchRuleResult:
+    final_prices: np.ndarray  # same shape as the candidate matrix
+    reason_mask: np.ndarray   # REASON_MASK_DTYPE, one bitmask per cell
+
+
 def clamp(value: float, lo: Optional[float], hi: Optional[float]) -> float:
     if lo is not None and value < lo:
         value = lo
@@ -36,7 +48,7 @@ def clamp(value: float, lo: Optional[float], hi: Optional[float]) -> float:
     return value
 
 
-def apply_guardrails(candidate_price: float, ctx: Context, policy: dict) -> RuleResult:
+def apply_guardrails(candidate_price: float, ctx: Context, policy: CompiledPolicy) -> RuleResult:
     """
     Apply business guardrails to a candidate price and return:
       - final_price (float)
@@ -49,59 +61,56 @@ def apply_guardrails(candidate_price: float, ctx: Context, policy: dict) -> Rule
         raise ValueError("candidate_price must be > 0")
 
     # 1) Promo lock
-    promo_cfg = policy["guardrails"]["promo"]
-    if promo_cfg["enabled"] and ctx.promo_active:
+    if policy.promo.enabled and ctx.promo_active:
         if ctx.promo_price is None:
             raise ValueError("promo_active=True but promo_price is None")
         return RuleResult(final_price=float(ctx.promo_price), reasons=["PROMO_LOCK"])
 
     # 2) Price floor (cost + margin)
-    floor_cfg = policy["guardrails"]["price_floor"]
-    if floor_cfg["enabled"]:
-        min_margin = float(floor_cfg["min_margin_pct"])
-        floor = float(ctx.unit_cost) * (1.0 + min_margin)
+    if policy.price_floor.enabled:
+        floor = float(ctx.unit_cost) * (1.0 + policy.price_floor.min_margin_pct)
         if p < floor:
             p = floor
             reasons.append("MARGIN_FLOOR_APPLIED")
 
     # 3) Ceiling (MSRP) + MAP enforcement
-    ceil_cfg = policy["guardrails"]["price_ceiling"]
+    ceil_cfg = policy.price_ceiling
 
     # MAP acts like an additional floor
-    if ceil_cfg["enabled"] and ceil_cfg.get("enforce_map", False) and ctx.map_price is not None:
+    if ceil_cfg.enabled and ceil_cfg.enforce_map and ctx.map_price is not None:
         if p < float(ctx.map_price):
             p = float(ctx.map_price)
             reasons.append("MAP_FLOOR_APPLIED")
 
     # MSRP acts like a ceiling
-    if ceil_cfg["enabled"] and ctx.msrp is not None:
+    if ceil_cfg.enabled and ctx.msrp is not None:
         msrp = float(ctx.msrp)
         if p > msrp:
             p = msrp
             reasons.append("MSRP_CEILING_APPLIED")
 
     # 4) Max daily price move (inventory-aware)
-    change_cfg = policy["guardrails"]["max_daily_change"]
-    if change_cfg["enabled"] and ctx.yesterday_price is not None:
+    change_cfg = policy.max_daily_change
+    if change_cfg.enabled and ctx.yesterday_price is not None:
         y = float(ctx.yesterday_price)
 
         low_stock = (
             ctx.days_of_cover is not None
-            and ctx.days_of_cover < policy["inventory_flags"]["low_stock_days_of_cover_lt"]
+            and ctx.days_of_cover < policy.low_stock_days_of_cover_lt
         )
         overstock = (
             ctx.days_of_cover is not None
-            and ctx.days_of_cover > policy["inventory_flags"]["overstock_days_of_cover_gt"]
+            and ctx.days_of_cover > policy.overstock_days_of_cover_gt
         )
 
-        up_pct = float(change_cfg["default_pct"])
-        down_pct = float(change_cfg["default_pct"])
+        up_pct = change_cfg.default_pct
+        down_pct = change_cfg.default_pct
 
         if low_stock:
-            up_pct = down_pct = float(change_cfg["low_stock_pct"])
+            up_pct = down_pct = change_cfg.low_stock_pct
         elif overstock:
             # allow bigger downward change only
-            down_pct = float(change_cfg["overstock_pct"])
+            down_pct = change_cfg.overstock_pct
 
         min_p = y * (1.0 - down_pct)
         max_p = y * (1.0 + up_pct)
@@ -111,18 +120,139 @@ def apply_guardrails(candidate_price: float, ctx: Context, policy: dict) -> Rule
             reasons.append("MAX_DAILY_CHANGE_CLAMPED")
         p = p2
 
-    comp_cfg = policy["guardrails"]["competitor"]
-    if comp_cfg["enabled"] and ctx.is_kvi and ctx.competitor_price is not None:
-        cap = float(ctx.competitor_price) * (1.0 + float(comp_cfg["max_over_competitor_pct"]))
+    if policy.competitor.enabled and ctx.is_kvi and ctx.competitor_price is not None:
+        cap = float(ctx.competitor_price) * (1.0 + policy.competitor.max_over_competitor_pct)
         if p > cap:
             p = cap
             reasons.append("COMPETITOR_CAP_APPLIED")
 
-    trust_cfg = policy["guardrails"]["trust"]
-    if trust_cfg["enabled"] and ctx.recent_prices:
-        pass
+    # 5) Trust: after max_large_changes large moves in the window, today's move stays small
+    trust = policy.trust
+    if trust.enabled and ctx.recent_prices and ctx.yesterday_price is not None:
+        n_large = count_large_changes(ctx.recent_prices[-trust.window_days:], trust.large_change_threshold_pct)
+        if n_large >= trust.max_large_changes:
+            y = float(ctx.yesterday_price)
+            thr = trust.large_change_threshold_pct
+            p2 = clamp(p, lo=y * (1.0 - thr), hi=y * (1.0 + thr))
+            if p2 != p:
+                reasons.append("TRUST_VOLATILITY_CLAMPED")
+            p = p2
 
     if p <= 0:
         raise ValueError("Final price must be > 0")
 
     return RuleResult(final_price=float(p), reasons=reasons)
+
+
+def apply_guardrails_batch(
+    candidate_prices,
+    unit_cost,
+    msrp,
+    map_price,
+    yesterday_price,
+    competitor_price,
+    is_kvi,
+    promo_active,
+    days_of_cover,
+    policy: CompiledPolicy,
+    promo_price=None,
+    recent_large_changes=None,
+) -> BatchRuleResult:
+    """
+    Array version of apply_guardrails.
+      - candidate_prices: (n_rows,) or (n_rows, n_candidates)
+      - context columns: (n_rows,) arrays, missing values as NaN
+      - recent_large_changes: large moves in the trust window per row (PriceHistory),
+        in place of Context.recent_prices
+    Returns final prices and a reason bitmask per cell (see REASON_CODES),
+    identical to calling apply_guardrails cell by cell.
+    """
+    p = np.array(candidate_prices, dtype=float)
+    if np.any(p <= 0):
+        raise ValueError("candidate_price must be > 0")
+
+    def col(values) -> np.ndarray:
+        # (n_rows,) -> broadcastable against the candidate matrix
+        a = np.asarray(values, dtype=float)
+        return a.reshape(a.shape + (1,) * (p.ndim - a.ndim))
+
+    mask = np.zeros(p.shape, dtype=REASON_MASK_DTYPE)
+
+    # 1) Promo lock (resolved at the end: locked cells skip every other rule)
+    promo = np.zeros(p.shape, dtype=bool)
+    if policy.promo.enabled:
+        promo = np.broadcast_to(col(promo_active) != 0, p.shape)
+    if promo.any():
+        promo_p = np.broadcast_to(col(promo_price if promo_price is not None else np.nan), p.shape)
+        if np.isnan(promo_p[promo]).any():
+            raise ValueError("promo_active=True but promo_price is None")
+
+    # 2) Price floor (cost + margin)
+    if policy.price_floor.enabled:
+        floor = col(unit_cost) * (1.0 + policy.price_floor.min_margin_pct)
+        hit = p < floor
+        p = np.where(hit, floor, p)
+        mask[hit] |= REASON_BITS["MARGIN_FLOOR_APPLIED"]
+
+    # 3) Ceiling (MSRP) + MAP enforcement; NaN compares False, i.e. "not set"
+    ceil_cfg = policy.price_ceiling
+    if ceil_cfg.enabled and ceil_cfg.enforce_map:
+        map_p = col(map_price)
+        hit = p < map_p
+        p = np.where(hit, map_p, p)
+        mask[hit] |= REASON_BITS["MAP_FLOOR_APPLIED"]
+
+    if ceil_cfg.enabled:
+        msrp_p = col(msrp)
+        hit = p > msrp_p
+        p = np.where(hit, msrp_p, p)
+        mask[hit] |= REASON_BITS["MSRP_CEILING_APPLIED"]
+
+    # 4) Max daily price move (inventory-aware)
+    change_cfg = policy.max_daily_change
+    if change_cfg.enabled:
+        y = col(yesterday_price)
+        doc = col(days_of_cover)
+        low_stock = doc < policy.low_stock_days_of_cover_lt
+        overstock = doc > policy.overstock_days_of_cover_gt
+
+        default_pct = change_cfg.default_pct
+        low_pct = change_cfg.low_stock_pct
+        up_pct = np.where(low_stock, low_pct, default_pct)
+        down_pct = np.where(low_stock, low_pct, np.where(overstock, change_cfg.overstock_pct, default_pct))
+
+        min_p = y * (1.0 - down_pct)
+        max_p = y * (1.0 + up_pct)
+
+        # same order as clamp(): lo first, then hi
+        p2 = np.where(p < min_p, min_p, p)
+        p2 = np.where(p2 > max_p, max_p, p2)
+        mask[p2 != p] |= REASON_BITS["MAX_DAILY_CHANGE_CLAMPED"]
+        p = p2
+
+    if policy.competitor.enabled:
+        cap = col(competitor_price) * (1.0 + policy.competitor.max_over_competitor_pct)
+        hit = (col(is_kvi) != 0) & (p > cap)
+        p = np.where(hit, cap, p)
+        mask[hit] |= REASON_BITS["COMPETITOR_CAP_APPLIED"]
+
+    # 5) Trust: rows at the large-move limit keep today's move within the threshold
+    trust = policy.trust
+    if trust.enabled and recent_large_changes is not None:
+        y = col(yesterday_price)
+        thr = trust.large_change_threshold_pct
+        limited = col(recent_large_changes) >= trust.max_large_changes  # NaN: no history
+        lo, hi = y * (1.0 - thr), y * (1.0 + thr)
+        p2 = np.where(limited & (p < lo), lo, p)
+        p2 = np.where(limited & (p2 > hi), hi, p2)
+        mask[p2 != p] |= REASON_BITS["TRUST_VOLATILITY_CLAMPED"]
+        p = p2
+
+    if promo.any():
+        p = np.where(promo, promo_p, p)
+        mask[promo] = REASON_BITS["PROMO_LOCK"]
+
+    if np.any(p[~promo] <= 0):
+        raise ValueError("Final price must be > 0")
+
+    return BatchRuleResult(final_prices=p, reason_mask=mask)
@@ -0,0 +1,147 @@
+# src/pricing/run_context.py
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+INDEXES_PATH = Path("sql/indexes.sql")
+
+# run row layout (RUN_ROWS_SQL's select list), by source; non-SQL readers assemble the same columns
+RUN_FEATURE_COLUMNS = [
+    "price_shown", "discount_pct_vs_msrp", "price_index_vs_comp",
+    "price_change_pct_1d", "price_rolling_avg_7d",
+    "sessions", "views", "add_to_cart", "sessions_lag_1d",
+    "on_hand", "inbound", "stockout_flag", "days_of_cover",
+    "low_stock_flag", "overstock_flag",
+]
+RUN_SKU_COLUMNS = ["unit_cost", "msrp", "map_price", "is_kvi"]
+RUN_LOGGED_COLUMNS = ["competitor_price", "promo_active"]
+RUN_COLUMNS = (["sku_id", "segment_id", "date"] + RUN_FEATURE_COLUMNS + RUN_SKU_COLUMNS
+               + RUN_LOGGED_COLUMNS + ["yesterday_price"])
+
+# One row per SKU×segment for the run date. yesterday_price comes from a
+# self-join on the previous date (bound once), so every table access is an
+# index search keyed by date and the fetch scales with the run date's rows.
+# :after_sku/:after_segment (both NULL for a full fetch) resume after a key.
+RUN_ROWS_SQL = """
+    SELECT
+      f.sku_id, f.segment_id, f.date,
+
+      -- base features
+      f.price_shown, f.discount_pct_vs_msrp, f.price_index_vs_comp,
+      f.price_change_pct_1d, f.price_rolling_avg_7d,
+      f.sessions, f.views, f.add_to_cart, f.sessions_lag_1d,
+      f.on_hand, f.inbound, f.stockout_flag, f.days_of_cover,
+      f.low_stock_flag, f.overstock_flag,
+
+      -- sku context
+      s.unit_cost, s.msrp, s.map_price, s.is_kvi,
+
+      -- logged context
+      p.competitor_price, p.promo_active,
+
+      -- yesterday price for guardrails + price_change recompute
+      py.price_shown AS yesterday_price
+
+    FROM feature_sku_segment_day f
+    JOIN dim_sku s ON f.sku_id = s.sku_id
+    JOIN fact_prices_shown p
+      ON f.sku_id = p.sku_id AND f.segment_id = p.segment_id AND f.date = p.date
+    LEFT JOIN fact_prices_shown py
+      ON py.date = :prev_date AND py.sku_id = f.sku_id AND py.segment_id = f.segment_id
+    WHERE f.date = :run_date
+      AND (:after_sku IS NULL OR (f.sku_id, f.segment_id) > (:after_sku, :after_segment))
+    ORDER BY f.sku_id, f.segment_id
+"""
+
+
+def previous_date(run_date: str) -> str:
+    return (date.fromisoformat(run_date) - timedelta(days=1)).isoformat()
+
+
+def run_params(run_date: str, after: Optional[tuple[str, str]] = None) -> dict:
+    after_sku, after_segment = after if after is not None else (None, None)
+    return {
+        "run_date": run_date,
+        "prev_date": previous_date(run_date),
+        "after_sku": after_sku,
+        "after_segment": after_segment,
+    }
+
+
+def ensure_run_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Create the date-leading indexes the run query relies on (no-op if present),
+    so databases built before sql/indexes.sql existed get them too.
+    """
+    conn.executescript(INDEXES_PATH.read_text(encoding="utf-8"))
+
+    # without planner stats SQLite picks the PK autoindex over the covering index
+    if not _has_index_stats(conn, "idx_fact_prices_shown_date"):
+        conn.execute("ANALYZE feature_sku_segment_day")
+        conn.execute("ANALYZE fact_prices_shown")
+    conn.commit()
+
+
+def _has_index_stats(conn: sqlite3.Connection, index_name: str) -> bool:
+    try:
+        row = conn.execute("SELECT 1 FROM sqlite_stat1 WHERE idx = ?", (index_name,)).fetchone()
+    except sqlite3.OperationalError:
+        # sqlite_stat1 only exists after the first ANALYZE
+        return False
+    return row is not None
+
+
+def fetch_run_rows(conn: sqlite3.Connection, run_date: str):
+    """
+    Fetch everything needed for pricing for run_date at SKU×segment grain:
+    - base features from feature table
+    - sku context: cost/msrp/map/is_kvi
+    - competitor & promo from fact_prices_shown
+    - yesterday_price from fact_prices_shown (same sku+segment, date-1)
+    """
+    cur = conn.cursor()
+    cur.execute(RUN_ROWS_SQL, run_params(run_date))
+    cols = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    return cols, rows
+
+
+def iter_run_rows(
+    reader,
+    run_date: str,
+    chunk_rows: int,
+    after: Optional[tuple[str, str]] = None,
+) -> Iterator[tuple[list[str], list]]:
+    """
+    Stream run_date's rows as (cols, rows) chunks in (sku_id, segment_id) order,
+    optionally starting after a (sku_id, segment_id) key. A chunk never splits a
+    SKU's segments (they share stock), so it holds chunk_rows rows plus at most
+    one SKU's worth. reader is a src.storage reader (SQLite or Parquet).
+    """
+    cols, batches = reader.run_rows(run_date, after, chunk_rows)
+    sku_idx = cols.index("sku_id")
+
+    carry = []
+    for rows in batches:
+        rows = carry + rows
+        # hold back the trailing SKU: its remaining segments may be in the next fetch
+        last_sku = rows[-1][sku_idx]
+        cut = len(rows)
+        while cut > 0 and rows[cut - 1][sku_idx] == last_sku:
+            cut -= 1
+        if cut == 0:
+            carry = rows
+            continue
+        carry = rows[cut:]
+        yield cols, rows[:cut]
+    if carry:
+        yield cols, carry
+
+
+def explain_run_query(conn: sqlite3.Connection, run_date: str) -> list[str]:
+    """
+    EXPLAIN QUERY PLAN details for the run query (one string per plan step).
+    """
+    cur = conn.execute("EXPLAIN QUERY PLAN " + RUN_ROWS_SQL, run_params(run_date))
+    return [r[3] for r in cur.fetchall()]
@@ -0,0 +1,173 @@
+# src/pricing/search.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable
+
+import numpy as np
+
+from src.pricing.objective import expected_profit_array
+from src.pricing.policy import CompiledPolicy, SearchConfig
+from src.pricing.rules import apply_guardrails_batch
+
+# score_fn(row_idx, prices) -> expected units, for flat arrays of (row, final price) pairs
+ScoreFn = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+@dataclass
+class SearchResult:
+    prices: np.ndarray       # (n_rows,) best final price
+    units: np.ndarray
+    profits: np.ndarray
+    reason_mask: np.ndarray  # reasons for the raw candidate that produced the best price
+    n_evals: np.ndarray      # model evaluations spent per row
+
+
+def _evaluate(score_fn: ScoreFn, unit_cost: np.ndarray, prices: np.ndarray, valid: np.ndarray):
+    """
+    Score the valid cells of a (rows x points) price matrix in one call.
+    Invalid cells get profit -inf so they never win the argmax.
+    """
+    rows, cols = np.nonzero(valid)
+    units = np.zeros(prices.shape, dtype=float)
+    units[rows, cols] = score_fn(rows, prices[rows, cols])
+    profits = expected_profit_array(prices, unit_cost[:, None], units)
+    profits[~valid] = -np.inf
+    return units, profits
+
+
+def price_decimals(precision: float) -> int:
+    # decimal places of the price grid: 0.01 -> 2, 0.005 -> 3, 0.25 -> 2, 1 -> 0
+    return max(0, -Decimal(str(precision)).normalize().as_tuple().exponent)
+
+
+def to_grid(p: np.ndarray, precision: float, how=np.round) -> np.ndarray:
+    """
+    Nearest multiple of precision (or the one above/below with how=np.ceil/np.floor),
+    rounded to the grid's decimal places so it prints exactly.
+    """
+    # the tolerance keeps prices already on the grid (e.g. 12.34 / 0.01 = 1233.999...) in place
+    q = p / precision
+    q = np.where(np.abs(q - np.round(q)) < 1e-6, np.round(q), q)
+    return np.round(how(q) * precision, price_decimals(precision))
+
+
+def _grid_search(guard: dict, score_fn: ScoreFn, policy: CompiledPolicy, cfg: SearchConfig) -> SearchResult:
+    msrp = guard["msrp"]
+    ruled = apply_guardrails_batch(msrp[:, None] * np.asarray(cfg.grid_mults, dtype=float), policy=policy, **guard)
+    prices = ruled.final_prices
+    units, profits = _evaluate(score_fn, guard["unit_cost"], prices, np.ones(prices.shape, dtype=bool))
+
+    # argmax keeps the first maximum, same tie-break as a strict ">" scan
+    best = np.argmax(profits, axis=1)
+    idx = np.arange(len(msrp))
+    return SearchResult(
+        prices=prices[idx, best],
+        units=units[idx, best],
+        profits=profits[idx, best],
+        reason_mask=ruled.reason_mask[idx, best],
+        n_evals=np.full(len(msrp), prices.shape[1], dtype=np.int64),
+    )
+
+
+def _coarse_to_fine(guard: dict, score_fn: ScoreFn, policy: CompiledPolicy, cfg: SearchConfig) -> SearchResult:
+    msrp = guard["msrp"]
+    unit_cost = guard["unit_cost"]
+    n = len(msrp)
+    idx = np.arange(n)
+
+    # guardrails are a composition of clamps (monotone), so the feasible final prices
+    # for raw candidates in [raw_lo, raw_hi] are exactly [g(raw_lo), g(raw_hi)]
+    raw_lo = msrp * min(cfg.grid_mults)
+    raw_hi = msrp * max(cfg.grid_mults)
+    bounds = apply_guardrails_batch(np.stack([raw_lo, raw_hi], axis=1), policy=policy, **guard)
+    exact_lo, exact_hi = bounds.final_prices[:, 0], bounds.final_prices[:, 1]
+    degenerate = (exact_hi - exact_lo) < cfg.precision
+
+    # the search runs on the precision grid inside the feasible interval: bounds round inward.
+    # An interval narrower than one step may hold no grid price (e.g. pinned by the daily-change
+    # clamp); it takes the nearest grid price, within half a step of the guardrail price.
+    lo = to_grid(exact_lo, cfg.precision, np.ceil)
+    hi = to_grid(exact_hi, cfg.precision, np.floor)
+    off_grid = lo > hi
+    nearest = to_grid((exact_lo + exact_hi) / 2, cfg.precision)
+    lo, hi = np.where(off_grid, nearest, lo), np.where(off_grid, nearest, hi)
+
+    def snap(p: np.ndarray, rows=slice(None)) -> np.ndarray:
+        # grid prices inside the (grid) feasible interval
+        return np.clip(to_grid(p, cfg.precision), lo[rows, None], hi[rows, None])
+
+    # coarse grid over the feasible interval + warm start at yesterday's price
+    warm = np.where(np.isnan(guard["yesterday_price"]), msrp, guard["yesterday_price"])
+    coarse = lo[:, None] + (hi - lo)[:, None] * np.linspace(0.0, 1.0, cfg.coarse_points)
+    prices = np.concatenate([coarse, warm[:, None]], axis=1)
+    prices[:, 1:] = snap(prices[:, 1:])
+
+    valid = np.ones(prices.shape, dtype=bool)
+    valid[degenerate, 1:] = False  # a single feasible price needs one evaluation
+    units, profits = _evaluate(score_fn, unit_cost, prices, valid)
+    n_evals = valid.sum(axis=1)
+
+    best = np.argmax(profits, axis=1)
+    best_price = prices[idx, best]
+    best_units = units[idx, best]
+    best_profit = profits[idx, best]
+
+    # refine: bracket [best - step, best + step] with refine_points interior points
+    half = cfg.refine_points // 2
+    offsets = np.concatenate([-np.arange(half, 0, -1), np.arange(1, half + 1)]) / (half + 1)
+    step = (hi - lo) / (cfg.coarse_points - 1)
+
+    while True:
+        active = ~degenerate & (step >= cfg.precision) & (n_evals + cfg.refine_points <= cfg.max_evals_per_row)
+        if not active.any():
+            break
+        rows = np.nonzero(active)[0]
+
+        pts = snap(best_price[rows, None] + step[rows, None] * offsets, rows)
+        sub_units, sub_profits = _evaluate(
+            lambda r, p: score_fn(rows[r], p), unit_cost[rows], pts, np.ones(pts.shape, dtype=bool)
+        )
+        n_evals[rows] += cfg.refine_points
+
+        j = np.argmax(sub_profits, axis=1)
+        k = np.arange(len(rows))
+        better = sub_profits[k, j] > best_profit[rows]
+        upd = rows[better]
+        best_price[upd] = pts[k, j][better]
+        best_units[upd] = sub_units[k, j][better]
+        best_profit[upd] = sub_profits[k, j][better]
+
+        step[rows] = step[rows] / (half + 1)
+
+    # reasons: the bounds were reached by clamping raw_lo/raw_hi; interior prices pass unchanged.
+    # The price stays the grid bound, not the exact clamp result it was rounded in from.
+    at_lo, at_hi = best_price == lo, best_price == hi
+    raw_best = np.where(at_lo, raw_lo, np.where(at_hi, raw_hi, best_price))
+    final = apply_guardrails_batch(raw_best, policy=policy, **guard)
+
+    return SearchResult(
+        prices=np.where(at_lo, lo, np.where(at_hi, hi, final.final_prices)),
+        units=best_units,
+        profits=best_profit,
+        reason_mask=final.reason_mask,
+        n_evals=n_evals,
+    )
+
+
+def search_prices(guard: dict, score_fn: ScoreFn, policy: CompiledPolicy, cfg: SearchConfig | None = None) -> SearchResult:
+    """
+    Pick the expected-profit-maximizing final price per row.
+      - guard: apply_guardrails_batch context columns (unit_cost, msrp, ... as (n_rows,) arrays)
+      - score_fn: expected units for (row_idx, final_price) pairs
+    "grid" scores the fixed grid_mults; "coarse_to_fine" searches the feasible
+    guardrail interval down to `precision` within max_evals_per_row model calls.
+    """
+    cfg = cfg or policy.search
+    if len(guard["msrp"]) == 0:
+        empty = np.zeros(0, dtype=float)
+        return SearchResult(empty, empty, empty, np.zeros(0, dtype=np.uint16), np.zeros(0, dtype=np.int64))
+    if cfg.strategy == "grid":
+        return _grid_search(guard, score_fn, policy, cfg)
+    return _coarse_to_fine(guard, score_fn, policy, cfg)
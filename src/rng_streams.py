@@ -0,0 +1,34 @@
+# src/rng_streams.py
+from datetime import date
+from typing import Iterator, Optional
+
+import numpy as np
+
+# SKUs per random stream, in sorted sku_id order. Draws depend on (seed, block) and
+# (seed, date, block), not on chunking or sharding: block numbers count from the
+# first SKU of the full catalog (sharded runs pass first_block).
+RNG_BLOCK_SKUS = 1024
+
+
+def sku_blocks(n_skus: int, first_block: int = 0) -> Iterator[tuple[int, int, int]]:
+    """
+    (block, start, end) for consecutive runs of RNG_BLOCK_SKUS SKUs out of n_skus.
+    """
+    for block, start in enumerate(range(0, n_skus, RNG_BLOCK_SKUS), first_block):
+        yield block, start, min(start + RNG_BLOCK_SKUS, n_skus)
+
+
+def block_of(sku_index: np.ndarray, first_block: int = 0) -> np.ndarray:
+    # block of each SKU given its position in sorted sku_id order
+    return first_block + np.asarray(sku_index) // RNG_BLOCK_SKUS
+
+
+def sku_rng(seed: int, block: int) -> np.random.Generator:
+    # static per-SKU draws (popularity, starting stock, ...)
+    return np.random.default_rng([seed, block])
+
+
+def day_rng(seed: int, d: str, block: Optional[int] = None) -> np.random.Generator:
+    # draws for one date (YYYY-MM-DD) and SKU block; block=None is the date-level stream
+    ordinal = date.fromisoformat(d).toordinal()
+    return np.random.default_rng([seed, ordinal] if block is None else [seed, ordinal, block])
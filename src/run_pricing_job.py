@@ -1,258 +1,557 @@
 # src/run_pricing_job.py
+import argparse
 import sqlite3
+from concurrent.futures import Executor
+from contextlib import nullcontext
+from dataclasses import dataclass
 from pathlib import Path
-import yaml
+from typing import Optional
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import HistGradientBoostingRegressor
 
-from src.pricing.rules import Context, apply_guardrails
-from src.pricing.objective import ObjectiveInputs, expected_profit
+from src.bulk_load import tune_for_bulk
+from src.db import DB_PATH, connect
+from src.instrumentation import NO_STAGES, StageRecorder
+from src.pricing.policy import CompiledPolicy, load_policy
+from src.pricing.reasons import reason_mask_from_string_sql, reasons_string
+from src.pricing.planner import plan_inventory_dp
+from src.pricing.rules import apply_guardrails_batch
+from src.pricing.search import search_prices
+from src.pricing.model_registry import get_or_train
+from src.pricing.run_context import ensure_run_indexes, iter_run_rows, previous_date
+from src.pricing.price_history import LARGE_CHANGES_COL, PRICE_HISTORY_PATH, open_price_history
+from src.pricing.parallel import pricing_pool, shard_of, worker_state
+from src.pricing.incremental import previous_recommendations, row_fingerprints, run_salt, split_unchanged
+from src.storage import BACKENDS, PARQUET_ROOT, default_backend, open_reader
 
-DB_PATH = "data/pricing.db"
-POLICY_PATH = Path("src/config/pricing_policy.yaml")
 RECO_SCHEMA_PATH = Path("sql/recommendations_schema.sql")
 
-# Candidate action space (same as logging buckets for now)
-CANDIDATE_MULTS = [0.90, 0.95, 1.00, 1.05, 1.10]
+# columns added to pricing_recommendations after its first release -> SQL type
+RECO_ADDED_COLUMNS = {
+    "n_model_evals": "INTEGER",
+    "input_fingerprint": "TEXT",
+    "reason_mask": "INTEGER",
+    "planned_price": "REAL",
+}
 
-TARGET = "units_sold"
-ID_COLS = ["sku_id", "segment_id", "date"]
-LABEL_LEAK_COLS = ["orders", "revenue", "profit"]  # do NOT use these as features
+# SKU×segment rows fetched, priced and staged per chunk (bounds run memory)
+RUN_CHUNK_ROWS = 5_000
 
-
-def load_policy() -> dict:
-    with open(POLICY_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+# max candidate rows per model.predict call (bounds peak memory of the batch)
+SCORE_CHUNK_ROWS = 100_000
 
 
 def ensure_reco_table(conn: sqlite3.Connection) -> None:
     conn.executescript(RECO_SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    # CREATE TABLE IF NOT EXISTS does not add columns introduced after a DB was built
+    for table in ("pricing_recommendations", "pricing_recommendations_staging"):
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        for col, decl in RECO_ADDED_COLUMNS.items():
+            if col not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
+
+        if "reason_mask" not in existing:
+            # history written before the mask existed: rebuild it from the reasons string
+            conn.execute(f"UPDATE {table} SET reason_mask = {reason_mask_from_string_sql()}")
     conn.commit()
 
 
-def train_units_model_no_leak() -> tuple[HistGradientBoostingRegressor, list[str]]:
+def score_candidates(
+    model: HistGradientBoostingRegressor,
+    X: np.ndarray,
+    feature_cols: list[str],
+    chunk_rows: int = SCORE_CHUNK_ROWS,
+) -> np.ndarray:
     """
-    Train on train.csv, predicting units_sold.
-    IMPORTANT: do not use outcome-like columns (orders/revenue/profit) as features.
+    Predict expected units for a candidate feature matrix (columns in feature_cols order).
+    Scores in fixed-size chunks so one call covers the whole run without a huge frame.
     """
-    train = pd.read_csv("data/train.csv")
-
-    y = train[TARGET].astype(float)
-    X = train.drop(columns=[TARGET] + ID_COLS, errors="ignore")
-
-    # removing label leakage columns if present
-    X = X.drop(columns=[c for c in LABEL_LEAK_COLS if c in X.columns], errors="ignore")
+    out = np.empty(X.shape[0], dtype=float)
+    for start in range(0, X.shape[0], chunk_rows):
+        chunk = pd.DataFrame(X[start:start + chunk_rows], columns=feature_cols)
+        out[start:start + chunk_rows] = model.predict(chunk)
+    return out
+
+
+# candidate-dependent features, recomputed for every candidate price
+PRICE_FEATURES = ("price_shown", "discount_pct_vs_msrp", "price_index_vs_comp", "price_change_pct_1d")
+
+# candidate-invariant features (built from existing feature fields, not labels) -> type conversion
+INVARIANT_FEATURES = {
+    "price_rolling_avg_7d": float,
+
+    # demand
+    "sessions": int,
+    "views": int,
+    "add_to_cart": int,
+    "sessions_lag_1d": int,
+
+    # inventory
+    "on_hand": int,
+    "inbound": int,
+    "stockout_flag": int,
+    "days_of_cover": float,
+    "low_stock_flag": int,
+    "overstock_flag": int,
+}
+
+
+@dataclass
+class RowFeatures:
+    invariant: np.ndarray  # (n_rows, n_features) in feature_cols order; price columns left at 0
+    msrp: np.ndarray
+    competitor_price: np.ndarray  # NaN when unknown
+    yesterday_price: np.ndarray   # NaN when unknown
+    price_col_idx: dict           # price feature name -> column index (only those the model uses)
+
+
+def row_features(recs: list[dict], feature_cols: list[str]) -> RowFeatures:
+    """
+    Build and type-convert the candidate-invariant part of each row's features once;
+    candidate_features() broadcasts it and fills in the price-derived columns.
+    """
+    invariant = np.zeros((len(recs), len(feature_cols)), dtype=float)
+    for j, c in enumerate(feature_cols):
+        convert = INVARIANT_FEATURES.get(c)
+        if convert is not None:
+            # missing values (e.g. first-day lags) -> 0
+            invariant[:, j] = [convert(rec[c]) if rec[c] is not None else 0 for rec in recs]
+
+    def column(name: str) -> np.ndarray:
+        return np.array([rec[name] for rec in recs], dtype=float)
+
+    return RowFeatures(
+        invariant=invariant,
+        msrp=column("msrp"),
+        competitor_price=column("competitor_price"),
+        yesterday_price=column("yesterday_price"),
+        price_col_idx={c: feature_cols.index(c) for c in PRICE_FEATURES if c in feature_cols},
+    )
 
-    X = X.fillna(0)
-    for c in X.columns:
-        X[c] = pd.to_numeric(X[c], errors="coerce").fillna(0)
 
-    model = HistGradientBoostingRegressor(
-        learning_rate=0.08,
-        max_depth=6,
-        max_iter=200,
-        random_state=42
+def candidate_features(rows: RowFeatures, row_idx: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Feature matrix (feature_cols order) for flat (row, final price) candidate pairs:
+    the row's invariant block with the four price-derived columns filled in.
+    """
+    X = rows.invariant[row_idx]
+    cols = rows.price_col_idx
+
+    if "price_shown" in cols:
+        X[:, cols["price_shown"]] = prices
+    if "discount_pct_vs_msrp" in cols:
+        msrp = rows.msrp[row_idx]
+        X[:, cols["discount_pct_vs_msrp"]] = 1.0 - prices / msrp
+    if "price_index_vs_comp" in cols:
+        comp = rows.competitor_price[row_idx]
+        ok = ~np.isnan(comp) & (comp != 0)
+        X[:, cols["price_index_vs_comp"]] = np.divide(prices, comp, out=np.zeros_like(prices), where=ok)
+    if "price_change_pct_1d" in cols:
+        y = rows.yesterday_price[row_idx]
+        ok = ~np.isnan(y) & (y > 0)
+        X[:, cols["price_change_pct_1d"]] = np.divide(prices - y, y, out=np.zeros_like(prices), where=ok)
+    return X
+
+
+def guard_columns(recs: list[dict]) -> dict:
+    """
+    apply_guardrails_batch / search_prices context columns for fetched run rows.
+    """
+    def column(name: str) -> np.ndarray:
+        # None -> NaN, which the batch guardrails treat as "not set"
+        return np.array([rec[name] for rec in recs], dtype=float)
+
+    guard = {
+        "unit_cost": column("unit_cost"),
+        "msrp": column("msrp"),
+        "map_price": column("map_price"),
+        "yesterday_price": column("yesterday_price"),
+        "competitor_price": column("competitor_price"),
+        "is_kvi": column("is_kvi"),
+        "promo_active": column("promo_active"),
+        "days_of_cover": column("days_of_cover"),
+        # promo days log the promo price as price_shown; promo rows lock to it
+        "promo_price": column("price_shown"),
+    }
+    # present when the rows were annotated from a PriceHistory (trust guardrail)
+    if recs and LARGE_CHANGES_COL in recs[0]:
+        guard["recent_large_changes"] = column(LARGE_CHANGES_COL)
+    return guard
+
+
+def price_rows(
+    cols: list[str],
+    rows: list,
+    model: HistGradientBoostingRegressor,
+    feature_cols: list[str],
+    policy: CompiledPolicy,
+    stages: StageRecorder = NO_STAGES,
+) -> list[tuple]:
+    """
+    Search guardrailed candidate prices, score them and keep the best per SKU×segment
+    (strategy from the policy's `search` block).
+    Returns (sku_id, segment_id, recommended_price, expected_units, expected_profit, reasons,
+    n_model_evals, reason_mask) tuples in input row order.
+    """
+    with stages.span("features", rows=len(rows)):
+        # skip pathological rows (no usable MSRP to anchor candidates)
+        recs = [rec for rec in (dict(zip(cols, r)) for r in rows)
+                if rec["msrp"] is not None and float(rec["msrp"]) > 0]
+        guard = guard_columns(recs)
+        features = row_features(recs, feature_cols)
+
+    def score(row_idx: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        with stages.span("predict", rows=len(row_idx)):
+            X = candidate_features(features, row_idx, prices)
+            return score_candidates(model, X, feature_cols)
+
+    # search time minus the nested predict spans = guardrails + candidate bookkeeping
+    with stages.span("guardrails", rows=len(recs)):
+        found = search_prices(guard, score, policy)
+
+    return [
+        (
+            rec["sku_id"], rec["segment_id"],
+            float(found.prices[i]),
+            float(found.units[i]),
+            float(found.profits[i]),
+            reasons_string(found.reason_mask[i]),
+            int(found.n_evals[i]),
+            int(found.reason_mask[i]),
+        )
+        for i, rec in enumerate(recs)
+    ]
+
+
+def plan_rows(
+    cols: list[str],
+    rows: list,
+    model: HistGradientBoostingRegressor,
+    feature_cols: list[str],
+    policy: CompiledPolicy,
+    stages: StageRecorder = NO_STAGES,
+) -> dict:
+    """
+    Inventory-aware multi-day plan (policy `planner` block): per SKU, pick the
+    price level whose path over horizon_days maximizes expected profit against
+    on_hand + inbound shared by its segments. Rows must hold whole SKUs.
+    Returns (sku_id, segment_id) -> today's planned price (None without stock).
+    """
+    cfg = policy.planner
+    recs = [rec for rec in (dict(zip(cols, r)) for r in rows)
+            if rec["msrp"] is not None and float(rec["msrp"]) > 0]
+    if not cfg.enabled or not recs:
+        return {}
+
+    with stages.span("plan", rows=len(recs)):
+        guard = guard_columns(recs)
+        features = row_features(recs, feature_cols)
+
+        # same guardrails as the daily search, one price per (row, level)
+        ruled = apply_guardrails_batch(guard["msrp"][:, None] * np.asarray(cfg.price_mults), policy=policy, **guard)
+        prices = ruled.final_prices
+        n_rows, n_levels = prices.shape
+        row_idx = np.repeat(np.arange(n_rows), n_levels)
+        with stages.span("predict", rows=len(row_idx)):
+            units = score_candidates(model, candidate_features(features, row_idx, prices.ravel()), feature_cols)
+        units = np.maximum(units, 0.0).reshape(n_rows, n_levels)
+
+        # SKU totals over segments: demand and profit per day at each level
+        sku_ids, sku_idx = np.unique([rec["sku_id"] for rec in recs], return_inverse=True)
+        demand = np.zeros((len(sku_ids), n_levels))
+        profit = np.zeros((len(sku_ids), n_levels))
+        np.add.at(demand, sku_idx, units)
+        np.add.at(profit, sku_idx, (prices - guard["unit_cost"][:, None]) * units)
+        margin = np.divide(profit, demand, out=np.zeros_like(profit), where=demand > 0)
+
+        stock = np.zeros(len(sku_ids))
+        stock[sku_idx] = [float(rec["on_hand"] or 0) + float(rec["inbound"] or 0) for rec in recs]
+
+        plan = plan_inventory_dp(demand, margin, stock, cfg.horizon_days, cfg.stock_levels)
+    level = plan.action[sku_idx]
+    return {
+        (rec["sku_id"], rec["segment_id"]): float(prices[i, level[i]]) if stock[sku_idx[i]] > 0 else None
+        for i, rec in enumerate(recs)
+    }
+
+
+def write_recommendations(
+    conn: sqlite3.Connection,
+    run_date: str,
+    results: list[tuple],
+    model_name: str,
+    policy_version: str,
+    fingerprints: Optional[dict] = None,
+    planned_prices: Optional[dict] = None,
+) -> int:
+    """
+    Replace run_date's recommendations with results in one transaction, so a
+    rerun (or a backfill worker retry) is idempotent and never half-written.
+    fingerprints: optional (sku_id, segment_id) -> input fingerprint for incremental runs.
+    planned_prices: optional (sku_id, segment_id) -> plan_rows() price.
+    """
+    fingerprints = fingerprints or {}
+    planned_prices = planned_prices or {}
+    try:
+        conn.execute("DELETE FROM pricing_recommendations WHERE run_date = ?", (run_date,))
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO pricing_recommendations
+            (run_date, sku_id, segment_id, recommended_price, expected_units, expected_profit,
+             reasons, n_model_evals, reason_mask, model_name, policy_version, input_fingerprint, planned_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(run_date, *r, model_name, policy_version, fingerprints.get((r[0], r[1])),
+              planned_prices.get((r[0], r[1]))) for r in results]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(results)
+
+
+def stage_chunk(
+    conn: sqlite3.Connection,
+    run_date: str,
+    results: list[tuple],
+    model_name: str,
+    policy_version: str,
+    fingerprints: dict,
+    salt: str,
+    planned_prices: dict,
+) -> None:
+    """
+    Write one chunk of results to the staging table and commit it, so a crash
+    after this point resumes from the next chunk.
+    """
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO pricing_recommendations_staging
+        (run_date, sku_id, segment_id, recommended_price, expected_units, expected_profit,
+         reasons, n_model_evals, reason_mask, model_name, policy_version, input_fingerprint, run_salt,
+         planned_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(run_date, *r, model_name, policy_version, fingerprints.get((r[0], r[1])), salt,
+          planned_prices.get((r[0], r[1]))) for r in results]
     )
-    model.fit(X, y)
-    return model, list(X.columns)
+    conn.commit()
 
 
-def fetch_run_rows(conn: sqlite3.Connection, run_date: str):
+def staged_resume_point(conn: sqlite3.Connection, run_date: str, salt: str) -> tuple[Optional[tuple[str, str]], int]:
     """
-    Fetch everything needed for pricing for run_date at SKU×segment grain:
-    - base features from feature table
-    - sku context: cost/msrp/map/is_kvi
-    - competitor & promo from fact_prices_shown
-    - yesterday_price from fact_prices_shown (same sku+segment, date-1)
+    (last staged (sku_id, segment_id) key, staged row count) for an interrupted
+    run of run_date with the same model + policy. Staged rows from a different
+    model/policy are discarded and the run starts over.
     """
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-          f.sku_id, f.segment_id, f.date,
-
-          -- base features
-          f.price_shown, f.discount_pct_vs_msrp, f.price_index_vs_comp,
-          f.price_change_pct_1d, f.price_rolling_avg_7d,
-          f.sessions, f.views, f.add_to_cart, f.sessions_lag_1d,
-          f.on_hand, f.inbound, f.stockout_flag, f.days_of_cover,
-          f.low_stock_flag, f.overstock_flag,
-
-          -- sku context
-          s.unit_cost, s.msrp, s.map_price, s.is_kvi,
-
-          -- logged context
-          p.competitor_price, p.promo_active,
-
-          -- yesterday price for guardrails + price_change recompute
-          (SELECT p2.price_shown
-           FROM fact_prices_shown p2
-           WHERE p2.sku_id = p.sku_id
-             AND p2.segment_id = p.segment_id
-             AND p2.date = date(p.date, '-1 day')
-          ) AS yesterday_price
-
-        FROM feature_sku_segment_day f
-        JOIN dim_sku s ON f.sku_id = s.sku_id
-        JOIN fact_prices_shown p
-          ON f.sku_id = p.sku_id AND f.segment_id = p.segment_id AND f.date = p.date
-        WHERE f.date = ?
-        ORDER BY f.sku_id, f.segment_id
-    """, (run_date,))
-    cols = [d[0] for d in cur.description]
-    rows = cur.fetchall()
-    return cols, rows
-
-
-def make_model_row(base: dict, feature_cols: list[str]) -> pd.DataFrame:
+    salts = {r[0] for r in conn.execute(
+        "SELECT DISTINCT run_salt FROM pricing_recommendations_staging WHERE run_date = ?", (run_date,)
+    )}
+    if salts - {salt}:
+        conn.execute("DELETE FROM pricing_recommendations_staging WHERE run_date = ?", (run_date,))
+        conn.commit()
+        return None, 0
+
+    last = conn.execute(
+        """
+        SELECT sku_id, segment_id FROM pricing_recommendations_staging
+        WHERE run_date = ?
+        ORDER BY sku_id DESC, segment_id DESC
+        LIMIT 1
+        """,
+        (run_date,),
+    ).fetchone()
+    if last is None:
+        return None, 0
+    n = conn.execute(
+        "SELECT COUNT(*) FROM pricing_recommendations_staging WHERE run_date = ?", (run_date,)
+    ).fetchone()[0]
+    return (last[0], last[1]), n
+
+
+def swap_in_staged(conn: sqlite3.Connection, run_date: str) -> int:
     """
-    Build a single-row DataFrame aligned to model feature columns.
-    base should contain ALL potential feature fields; we will select/reindex.
+    Replace run_date's recommendations with the staged run in one transaction.
     """
-    df = pd.DataFrame([base])
-    df = df.reindex(columns=feature_cols, fill_value=0)
-    df = df.fillna(0)
-    for c in df.columns:
-        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-    return df
+    try:
+        conn.execute("DELETE FROM pricing_recommendations WHERE run_date = ?", (run_date,))
+        n = conn.execute(
+            """
+            INSERT INTO pricing_recommendations
+            (run_date, sku_id, segment_id, recommended_price, expected_units, expected_profit,
+             reasons, n_model_evals, reason_mask, model_name, policy_version, input_fingerprint, planned_price)
+            SELECT run_date, sku_id, segment_id, recommended_price, expected_units, expected_profit,
+                   reasons, n_model_evals, reason_mask, model_name, policy_version, input_fingerprint, planned_price
+            FROM pricing_recommendations_staging
+            WHERE run_date = ?
+            """,
+            (run_date,),
+        ).rowcount
+        conn.execute("DELETE FROM pricing_recommendations_staging WHERE run_date = ?", (run_date,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return n
+
 
+def _price_shard(cols: list[str], rows: list) -> list[tuple]:
+    state = worker_state()
+    return price_rows(cols, rows, state["model"], state["feature_cols"], state["policy"])
 
-def main():
-    policy = load_policy()
-    model, feature_cols = train_units_model_no_leak()
 
-    conn = sqlite3.connect(DB_PATH)
+def price_rows_sharded(cols: list[str], rows: list, pool: Executor, workers: int) -> list[tuple]:
+    """
+    Hash-partition rows by sku_id, price each shard on a pricing_pool worker and
+    merge back into (sku_id, segment_id) order. Rows are priced independently,
+    so the result is identical for any worker count.
+    """
+    sku_idx = cols.index("sku_id")
+    shards = [[] for _ in range(workers)]
+    for r in rows:
+        shards[shard_of(r[sku_idx], workers)].append(r)
+
+    results = []
+    for shard_results in pool.map(_price_shard, [cols] * workers, shards):
+        results.extend(shard_results)
+
+    results.sort(key=lambda r: (r[0], r[1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price the latest feature date into pricing_recommendations")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; >1 prices SKU hash shards in parallel")
+    parser.add_argument("--incremental", action="store_true",
+                        help="copy forward recommendations whose pricing inputs are unchanged; reprice the rest")
+    parser.add_argument("--chunk-rows", type=int, default=RUN_CHUNK_ROWS,
+                        help="SKU×segment rows fetched, priced and staged per chunk")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    parser.add_argument("--storage", choices=BACKENDS, default=default_backend(),
+                        help="backend the run rows are read from (default: %(default)s, or PRICING_STORAGE)")
+    parser.add_argument("--parquet-root", type=Path, default=PARQUET_ROOT,
+                        help="Parquet dataset root for --storage parquet (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    stages = StageRecorder("run_pricing_job")
+    with stages.span("load_policy"):
+        policy = load_policy()
+    # loads the registered model for the current train.csv; only refits when the data changed
+    with stages.span("load_model"):
+        registered, trained = get_or_train()
+    model, feature_cols = registered.model, registered.feature_cols
+    print(f"Model: {registered.tag} ({'trained' if trained else 'loaded from registry'})")
+
+    conn = connect(args.db)
+    # run rows come through the storage reader; recommendations, staging and history stay in SQLite
+    reader = open_reader(args.storage, args.db, args.parquet_root)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
+        # staged chunks already commit per chunk; indexes and FK checks stay on (daily incremental write)
+        tune_for_bulk(conn)
         ensure_reco_table(conn)
+        ensure_run_indexes(conn)
 
-        run_date = conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+        run_date = reader.max_date("feature_sku_segment_day")
         if run_date is None:
             raise ValueError("feature_sku_segment_day is empty")
 
         print(f"Run date: {run_date}")
 
-        cols, rows = fetch_run_rows(conn, run_date)
-        print(f"Rows to price: {len(rows)}")
-
         # metadata
-        model_name = "HistGradientBoostingRegressor_units_v1_noleak"
-        policy_version = str(policy.get("policy_version", "unknown"))
-
-        # replace existing recos for this run_date (idempotent)
-        conn.execute("DELETE FROM pricing_recommendations WHERE run_date = ?", (run_date,))
-        conn.commit()
-
-        inserts = []
-
-        for r in rows:
-            rec = dict(zip(cols, r))
-
-            sku_id = rec["sku_id"]
-            segment_id = rec["segment_id"]
-
-            unit_cost = float(rec["unit_cost"])
-            msrp = float(rec["msrp"]) if rec["msrp"] is not None else None
-            map_price = float(rec["map_price"]) if rec["map_price"] is not None else None
-            is_kvi = bool(rec["is_kvi"])
-            competitor_price = float(rec["competitor_price"]) if rec["competitor_price"] is not None else None
-            promo_active = bool(rec["promo_active"])
-            days_of_cover = float(rec["days_of_cover"]) if rec["days_of_cover"] is not None else None
-            yesterday_price = float(rec["yesterday_price"]) if rec["yesterday_price"] is not None else None
-
-            if msrp is None or msrp <= 0:
-                # skip pathological rows
-                continue
-
-            best = None
-
-            for m in CANDIDATE_MULTS:
-                raw_candidate = msrp * m
-
-                ctx = Context(
-                    sku=sku_id,
-                    segment=segment_id,
-                    unit_cost=unit_cost,
-                    msrp=msrp,
-                    map_price=map_price,
-                    yesterday_price=yesterday_price,
-                    competitor_price=competitor_price,
-                    is_kvi=is_kvi,
-                    promo_active=promo_active,
-                    promo_price=None,
-                    days_of_cover=days_of_cover,
-                )
-
-                ruled = apply_guardrails(raw_candidate, ctx, policy)
-                final_price = float(ruled.final_price)
-
-                # Building candidate feature row based on existing feature fields (not labels)
-                base_features = {
-                    # price features
-                    "price_shown": final_price,
-                    "discount_pct_vs_msrp": (1.0 - (final_price / msrp)) if msrp else 0.0,
-                    "price_index_vs_comp": (final_price / competitor_price) if competitor_price else 0.0,
-                    "price_change_pct_1d": ((final_price - yesterday_price) / yesterday_price)
-                                          if (yesterday_price and yesterday_price > 0) else 0.0,
-                    "price_rolling_avg_7d": float(rec["price_rolling_avg_7d"]),
-
-                    # demand
-                    "sessions": int(rec["sessions"]),
-                    "views": int(rec["views"]),
-                    "add_to_cart": int(rec["add_to_cart"]),
-                    "sessions_lag_1d": int(rec["sessions_lag_1d"]) if rec["sessions_lag_1d"] is not None else 0,
-
-                    # inventory
-                    "on_hand": int(rec["on_hand"]),
-                    "inbound": int(rec["inbound"]),
-                    "stockout_flag": int(rec["stockout_flag"]),
-                    "days_of_cover": days_of_cover if days_of_cover is not None else 0.0,
-                    "low_stock_flag": int(rec["low_stock_flag"]),
-                    "overstock_flag": int(rec["overstock_flag"]),
-                }
-
-                X = make_model_row(base_features, feature_cols)
-                expected_units = float(model.predict(X)[0])
-                exp_profit = expected_profit(ObjectiveInputs(
-                    price=final_price, unit_cost=unit_cost, expected_units=expected_units
-                ))
-
-                cand = {
-                    "final_price": final_price,
-                    "expected_units": expected_units,
-                    "expected_profit": exp_profit,
-                    "reasons": ruled.reasons,
-                }
-
-                if best is None or cand["expected_profit"] > best["expected_profit"]:
-                    best = cand
-
-            if best is None:
-                continue
-
-            inserts.append((
-                run_date, sku_id, segment_id,
-                best["final_price"],
-                best["expected_units"],
-                best["expected_profit"],
-                ",".join(best["reasons"]),
-                model_name,
-                policy_version
-            ))
-
-        conn.executemany(
-            """
-            INSERT OR REPLACE INTO pricing_recommendations
-            (run_date, sku_id, segment_id, recommended_price, expected_units, expected_profit,
-             reasons, model_name, policy_version)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            inserts
-        )
-        conn.commit()
-
-        print(f" Wrote {len(inserts)} recommendations into pricing_recommendations for {run_date}")
+        model_name = registered.tag
+        policy_version = policy.version
+        salt = run_salt(model_name, policy)
+
+        # trust window up to yesterday: saved ring buffer (kept next to the DB), or one bulk query when stale
+        history = None
+        history_path = Path(args.db).with_name(PRICE_HISTORY_PATH.name)
+        if policy.trust.enabled:
+            with stages.span("price_history"):
+                history = open_price_history(conn, previous_date(run_date), policy.trust, history_path)
+
+        after, n_staged = staged_resume_point(conn, run_date, salt)
+        if after is not None:
+            print(f" Resuming after {n_staged} staged rows (last {after[0]} / {after[1]})")
+
+        n_rows = n_reused = n_priced = evals_sum = evals_max = n_planned = n_plan_differs = 0
+
+        pool_ctx = pricing_pool(args.workers, registered, policy) if args.workers > 1 else nullcontext()
+        with pool_ctx as pool:
+            if pool is not None:
+                print(f"Pricing in {args.workers} SKU shards")
+
+            chunks = iter_run_rows(reader, run_date, args.chunk_rows, after)
+            for cols, rows in stages.iterate("fetch", chunks, count=lambda chunk: len(chunk[1])):
+                if history is not None:
+                    cols, rows = history.annotate(cols, rows)
+
+                with stages.span("fingerprint", rows=len(rows)):
+                    # always stored, so the next --incremental run can compare against this one
+                    fingerprints = row_fingerprints(cols, rows, salt)
+
+                    reused, to_price = [], rows
+                    if args.incremental:
+                        keys = list(fingerprints)
+                        previous = previous_recommendations(conn, run_date, keys[0], keys[-1])
+                        reused, to_price = split_unchanged(cols, rows, fingerprints, previous)
+
+                if not to_price:
+                    priced = []
+                elif pool is not None:
+                    # workers don't report stages: the parent times the sharded pricing as a whole
+                    with stages.span("price_sharded", rows=len(to_price)):
+                        priced = price_rows_sharded(cols, to_price, pool, args.workers)
+                else:
+                    priced = price_rows(cols, to_price, model, feature_cols, policy, stages)
+
+                # the plan couples a SKU's segments through shared stock: always replanned
+                planned = plan_rows(cols, rows, model, feature_cols, policy, stages)
+
+                with stages.span("write", rows=len(rows)):
+                    stage_chunk(conn, run_date, reused + priced, model_name, policy_version, fingerprints, salt,
+                                planned)
+
+                n_rows += len(rows)
+                n_reused += len(reused)
+                n_priced += len(priced)
+                evals = [r[6] for r in priced]
+                evals_sum += sum(evals)
+                evals_max = max([evals_max, *evals])
+                plan_diffs = [abs(planned[(r[0], r[1])] - r[2]) >= 0.01
+                              for r in reused + priced if planned.get((r[0], r[1])) is not None]
+                n_planned += len(plan_diffs)
+                n_plan_differs += sum(plan_diffs)
+
+        print(f"Rows processed: {n_rows}")
+
+        # replace existing recos for this run_date in one transaction (idempotent)
+        with stages.span("write"):
+            n = swap_in_staged(conn, run_date)
+
+        print(f" Wrote {n} recommendations into pricing_recommendations for {run_date}")
+
+        # roll the trust window forward in place, ready for tomorrow's run
+        if history is not None:
+            with stages.span("price_history"):
+                if history.advance(conn, run_date):
+                    history.save(history_path)
+        if args.incremental:
+            print(f" Incremental: reused {n_reused} unchanged rows, recomputed {n_priced}")
+        if n_priced:
+            print(f" Model evaluations per row: avg {evals_sum / n_priced:.1f}, max {evals_max}")
+        if n_planned:
+            print(f" Inventory plan ({policy.planner.horizon_days}d): planned_price differs from the "
+                  f"daily recommendation on {n_plan_differs}/{n_planned} rows")
+
+        stages.report()
+        stages.write(conn, run_date)
 
     finally:
+        reader.close()
         conn.close()
 
 
@@ -0,0 +1,386 @@
+# src/storage.py
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only the parquet backend needs it
+    pa = ds = pq = None
+
+from src.db import DB_PATH, connect, connect_readonly
+from src.instrumentation import StageRecorder
+from src.pricing.run_context import (
+    RUN_COLUMNS,
+    RUN_FEATURE_COLUMNS,
+    RUN_LOGGED_COLUMNS,
+    RUN_ROWS_SQL,
+    RUN_SKU_COLUMNS,
+    previous_date,
+    run_params,
+)
+
+# backend analytics reads use unless given one: "sqlite" (default) or "parquet"
+STORAGE_ENV = "PRICING_STORAGE"
+BACKENDS = ("sqlite", "parquet")
+
+PARQUET_ROOT = Path("data/parquet")
+
+# tables mirrored to Parquet -> sort keys within a date partition (primary key minus date)
+PARQUET_TABLES = {
+    "fact_traffic": ("sku_id", "segment_id"),
+    "fact_prices_shown": ("sku_id", "segment_id"),
+    "fact_sales": ("sku_id", "segment_id"),
+    "fact_inventory": ("sku_id",),
+    "feature_sku_segment_day": ("sku_id", "segment_id"),
+}
+
+# rows fetched from SQLite per fetchmany while exporting
+EXPORT_CHUNK_ROWS = 100_000
+
+# rows per batch from read_batches (bounds memory for streaming reads)
+READ_BATCH_ROWS = 50_000
+
+# schema metadata key holding the table's full column order (date lives in the partition path)
+COLUMNS_META_KEY = b"pricing.columns"
+
+SQLITE_TO_ARROW = {"INTEGER": "int64", "REAL": "float64", "TEXT": "string"}
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("The parquet backend needs pyarrow: pip install pyarrow")
+
+
+def default_backend() -> str:
+    return os.environ.get(STORAGE_ENV, "sqlite")
+
+
+def _date_partitioning():
+    # hive-style date=YYYY-MM-DD directories; ISO strings compare correctly
+    return ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def arrow_schema(conn, table: str) -> "pa.Schema":
+    # file schema from the SQLite declared types, so every partition agrees (even all-NULL columns)
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    columns = [name for _, name, *_ in info]
+    fields = [pa.field(name, SQLITE_TO_ARROW.get(decl.upper(), "string"), nullable=not notnull)
+              for _, name, decl, notnull, *_ in info if name != "date"]
+    return pa.schema(fields, metadata={COLUMNS_META_KEY: json.dumps(columns).encode()})
+
+
+def _batch_rows(batch) -> list:
+    # Arrow record batch / table -> row tuples (to_pylist keeps NULLs as None)
+    return list(zip(*(col.to_pylist() for col in batch.columns)))
+
+
+def write_partition(table_dir: Path, d: str, schema: "pa.Schema", cols: list[str], rows: list) -> None:
+    """
+    Replace the date=d partition of a dataset with rows (one file, written next to it first).
+    """
+    data = {c: list(v) for c, v in zip(cols, zip(*rows)) if c != "date"}
+    out_dir = table_dir / f"date={d}"
+    tmp_dir = table_dir / f".date={d}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    pq.write_table(pa.Table.from_pydict(data, schema=schema), tmp_dir / "part-0.parquet")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+
+def write_parquet(conn, table: str, root: Path = PARQUET_ROOT, start: Optional[str] = None,
+                  end: Optional[str] = None) -> tuple[int, int]:
+    """
+    Export table (dates in [start, end], default all) from SQLite to root/<table>/date=.../part-0.parquet,
+    rows in primary-key order. Rewrites only the exported dates. Returns (rows, partitions).
+    """
+    require_pyarrow()
+    keys = ", ".join(PARQUET_TABLES[table])
+    schema = arrow_schema(conn, table)
+    table_dir = Path(root) / table
+    cur = conn.execute(
+        f"""
+        SELECT *
+        FROM {table}
+        WHERE (:start IS NULL OR date >= :start)
+          AND (:end IS NULL OR date <= :end)
+        ORDER BY date, {keys}
+        """,
+        {"start": start, "end": end},
+    )
+    cols = [c[0] for c in cur.description]
+    date_idx = cols.index("date")
+
+    n_rows = n_parts = 0
+    current, pending = None, []
+    while True:
+        chunk = cur.fetchmany(EXPORT_CHUNK_ROWS)
+        for r in chunk:
+            if r[date_idx] != current:
+                if pending:
+                    write_partition(table_dir, current, schema, cols, pending)
+                    n_rows += len(pending)
+                    n_parts += 1
+                current, pending = r[date_idx], []
+            pending.append(r)
+        if not chunk:
+            break
+    if pending:
+        write_partition(table_dir, current, schema, cols, pending)
+        n_rows += len(pending)
+        n_parts += 1
+    return n_rows, n_parts
+
+
+class SqliteReader:
+    """
+    Analytics reads from the SQLite database (read-only connection).
+    """
+    backend = "sqlite"
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.conn = connect_readonly(db_path)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def max_date(self, table: str) -> Optional[str]:
+        return self.conn.execute(f"SELECT MAX(date) FROM {table}").fetchone()[0]
+
+    def _select(self, table: str, columns: Optional[Sequence[str]], start: Optional[str], end: Optional[str],
+                order_by: Sequence[str]) -> sqlite3.Cursor:
+        where, params = [], []
+        if start is not None:
+            where.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("date < ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order_by:
+            sql += " ORDER BY " + ", ".join(order_by)
+        return self.conn.execute(sql, params)
+
+    def read(self, table: str, columns: Optional[Sequence[str]] = None, start: Optional[str] = None,
+             end: Optional[str] = None, order_by: Sequence[str] = ()) -> tuple[list[str], list]:
+        """
+        (columns, rows) for start <= date < end (either bound optional), optionally ordered.
+        """
+        cur = self._select(table, columns, start, end, order_by)
+        return [c[0] for c in cur.description], cur.fetchall()
+
+    def read_batches(self, table: str, columns: Optional[Sequence[str]] = None, start: Optional[str] = None,
+                     end: Optional[str] = None, order_by: Sequence[str] = (),
+                     batch_rows: int = READ_BATCH_ROWS) -> tuple[list[str], Iterator[list]]:
+        """
+        Like read, but (columns, iterator of row lists of up to batch_rows) streamed from the cursor.
+        """
+        cur = self._select(table, columns, start, end, order_by)
+
+        def batches():
+            while rows := cur.fetchmany(batch_rows):
+                yield rows
+
+        return [c[0] for c in cur.description], batches()
+
+    def run_rows(self, run_date: str, after: Optional[tuple[str, str]] = None,
+                 batch_rows: int = READ_BATCH_ROWS) -> tuple[list[str], Iterator[list]]:
+        """
+        Pricing-run rows for run_date (RUN_ROWS_SQL: date-leading index searches) in
+        (sku_id, segment_id) order, optionally after a key, as batches of up to batch_rows.
+        """
+        cur = self.conn.execute(RUN_ROWS_SQL, run_params(run_date, after))
+
+        def batches():
+            while rows := cur.fetchmany(batch_rows):
+                yield rows
+
+        return [c[0] for c in cur.description], batches()
+
+    def read_arrays(self, table: str, columns: Sequence[str], start: Optional[str] = None,
+                    end: Optional[str] = None) -> dict[str, np.ndarray]:
+        cols, rows = self.read(table, columns, start, end)
+        return {c: np.array(v) for c, v in zip(cols, zip(*rows))} if rows else {c: np.array([]) for c in cols}
+
+
+class ParquetReader:
+    """
+    Analytics reads from the date-partitioned Parquet datasets under root: only
+    the requested columns are decoded and date bounds prune whole partitions.
+    Dimensions (dim_sku) stay in SQLite and are read from db_path when needed.
+    """
+    backend = "parquet"
+
+    def __init__(self, root: Path = PARQUET_ROOT, db_path: Optional[str] = None):
+        require_pyarrow()
+        self.root = Path(root)
+        self.db_path = db_path
+        self._dim_sku = None
+
+    def close(self) -> None:
+        pass
+
+    def dim_sku(self) -> "pa.Table":
+        # small and read once per reader: run-row SKU context
+        if self._dim_sku is None:
+            conn = connect_readonly(self.db_path)
+            try:
+                columns = ["sku_id"] + RUN_SKU_COLUMNS
+                schema = arrow_schema(conn, "dim_sku")
+                rows = conn.execute(f"SELECT {', '.join(columns)} FROM dim_sku").fetchall()
+                data = {c: list(v) for c, v in zip(columns, zip(*rows))} if rows else {c: [] for c in columns}
+                self._dim_sku = pa.Table.from_pydict(data, schema=pa.schema([schema.field(c) for c in columns]))
+            finally:
+                conn.close()
+        return self._dim_sku
+
+    def dataset(self, table: str) -> "ds.Dataset":
+        table_dir = self.root / table
+        if not table_dir.exists():
+            raise FileNotFoundError(f"No Parquet dataset for {table} under {self.root} (run python -m src.storage)")
+        return ds.dataset(table_dir, format="parquet", partitioning=_date_partitioning())
+
+    def dates(self, table: str, start: Optional[str] = None, end: Optional[str] = None) -> list[str]:
+        # partition names only, no file reads
+        dates = sorted(p.name.split("=", 1)[1] for p in (self.root / table).glob("date=*"))
+        return [d for d in dates if (start is None or d >= start) and (end is None or d < end)]
+
+    def max_date(self, table: str) -> Optional[str]:
+        dates = self.dates(table)
+        return dates[-1] if dates else None
+
+    @staticmethod
+    def _columns(dataset: "ds.Dataset", columns: Optional[Sequence[str]]) -> list[str]:
+        return list(columns) if columns is not None else json.loads(dataset.schema.metadata[COLUMNS_META_KEY])
+
+    @staticmethod
+    def _date_filter(start: Optional[str], end: Optional[str]):
+        condition = None
+        if start is not None:
+            condition = ds.field("date") >= start
+        if end is not None:
+            upper = ds.field("date") < end
+            condition = upper if condition is None else condition & upper
+        return condition
+
+    def read_table(self, table: str, columns: Optional[Sequence[str]] = None, start: Optional[str] = None,
+                   end: Optional[str] = None) -> "pa.Table":
+        dataset = self.dataset(table)
+        return dataset.to_table(columns=self._columns(dataset, columns), filter=self._date_filter(start, end))
+
+    def read(self, table: str, columns: Optional[Sequence[str]] = None, start: Optional[str] = None,
+             end: Optional[str] = None, order_by: Sequence[str] = ()) -> tuple[list[str], list]:
+        t = self.read_table(table, columns, start, end)
+        if order_by:
+            t = t.sort_by([(c, "ascending") for c in order_by])
+        return t.column_names, _batch_rows(t)
+
+    def read_batches(self, table: str, columns: Optional[Sequence[str]] = None, start: Optional[str] = None,
+                     end: Optional[str] = None, order_by: Sequence[str] = (),
+                     batch_rows: int = READ_BATCH_ROWS) -> tuple[list[str], Iterator[list]]:
+        """
+        Like read, but (columns, iterator of row lists of up to batch_rows). Unordered
+        reads stream the dataset's record batches; ordered reads must lead with date
+        and go one date partition at a time (sorted by the remaining keys within it).
+        """
+        if order_by and order_by[0] != "date":
+            raise ValueError(f"Parquet batches stream in date order; order_by must start with date, got {order_by}")
+        dataset = self.dataset(table)
+        columns = self._columns(dataset, columns)
+
+        def batches():
+            if not order_by:
+                scan = dataset.to_batches(columns=columns, filter=self._date_filter(start, end), batch_size=batch_rows)
+                for batch in scan:
+                    if batch.num_rows:
+                        yield _batch_rows(batch)
+                return
+            for d in self.dates(table, start, end):
+                t = dataset.to_table(columns=columns, filter=ds.field("date") == d)
+                if len(order_by) > 1:
+                    t = t.sort_by([(c, "ascending") for c in order_by[1:]])
+                for batch in t.to_batches(batch_rows):
+                    yield _batch_rows(batch)
+
+        return columns, batches()
+
+    def run_rows(self, run_date: str, after: Optional[tuple[str, str]] = None,
+                 batch_rows: int = READ_BATCH_ROWS) -> tuple[list[str], Iterator[list]]:
+        """
+        Same rows as SqliteReader.run_rows, joined in Arrow: each fact read touches only
+        the run date's (or yesterday's) partition and the columns the run needs.
+        """
+        keys = ["sku_id", "segment_id"]
+        on_day = ds.field("date") == run_date
+        features = self.dataset("feature_sku_segment_day").to_table(
+            columns=keys + ["date"] + RUN_FEATURE_COLUMNS, filter=on_day)
+        logged = self.dataset("fact_prices_shown").to_table(columns=keys + RUN_LOGGED_COLUMNS, filter=on_day)
+        yesterday = self.dataset("fact_prices_shown").to_table(
+            columns=keys + ["price_shown"], filter=ds.field("date") == previous_date(run_date),
+        ).rename_columns(keys + ["yesterday_price"])
+
+        t = (features.join(self.dim_sku(), "sku_id")
+             .join(logged, keys)
+             .join(yesterday, keys, join_type="left outer"))
+        if after is not None:
+            after_sku, after_segment = after
+            t = t.filter((ds.field("sku_id") > after_sku)
+                         | ((ds.field("sku_id") == after_sku) & (ds.field("segment_id") > after_segment)))
+        t = t.sort_by([("sku_id", "ascending"), ("segment_id", "ascending")]).select(RUN_COLUMNS)
+        return list(RUN_COLUMNS), (_batch_rows(batch) for batch in t.to_batches(batch_rows))
+
+    def read_arrays(self, table: str, columns: Sequence[str], start: Optional[str] = None,
+                    end: Optional[str] = None) -> dict[str, np.ndarray]:
+        t = self.read_table(table, columns, start, end)
+        return {c: t.column(c).to_numpy() for c in t.column_names}
+
+
+def open_reader(backend: Optional[str] = None, db_path: Optional[str] = None, root: Path = PARQUET_ROOT):
+    """
+    Reader for backend (default: PRICING_STORAGE, else sqlite).
+    """
+    backend = backend or default_backend()
+    if backend == "sqlite":
+        return SqliteReader(db_path)
+    if backend == "parquet":
+        return ParquetReader(root, db_path)
+    raise ValueError(f"Unknown storage backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export fact and feature tables to date-partitioned Parquet")
+    parser.add_argument("--tables", nargs="+", choices=list(PARQUET_TABLES), default=list(PARQUET_TABLES))
+    parser.add_argument("--start", help="first date to export (YYYY-MM-DD), default: all")
+    parser.add_argument("--end", help="last date to export (YYYY-MM-DD), default: all")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database (default: %(default)s)")
+    parser.add_argument("--out", type=Path, default=PARQUET_ROOT, help="dataset root (default: %(default)s)")
+    args = parser.parse_args(argv)
+    require_pyarrow()
+
+    stages = StageRecorder("export_parquet")
+    conn = connect(args.db)
+    try:
+        for table in args.tables:
+            with stages.span(table) as span:
+                span.rows, n_parts = write_parquet(conn, table, args.out, args.start, args.end)
+            print(f"✅ Wrote {span.rows} rows of {table} to {args.out / table} ({n_parts} date partitions)")
+
+        stages.report()
+        stages.write(conn, conn.execute("SELECT MAX(date) FROM dim_calendar").fetchone()[0])
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 # src/validate_data.py
-import sqlite3
+from src.db import connect_readonly
 
-DB_PATH = "data/pricing.db"
 
 def scalar(conn, sql: str, params=()):
     cur = conn.cursor()
@@ -82,7 +81,7 @@ def check_abrupt_traffic_spikes(conn, spike_multiplier: float = 20.0):
 
 
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_readonly()
     try:
         conn.execute("PRAGMA foreign_keys = ON;")
         check_no_duplicates(conn)
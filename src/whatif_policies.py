@@ -0,0 +1,129 @@
+# src/whatif_policies.py
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.db import connect
+from src.pricing.model_registry import get_or_train
+from src.pricing.policy import POLICY_PATH, load_policy
+from src.pricing.price_history import PriceHistory
+from src.pricing.reasons import REASON_BITS
+from src.pricing.run_context import ensure_run_indexes, fetch_run_rows, previous_date
+from src.pricing.search import search_prices
+from src.run_pricing_job import (
+    RowFeatures,
+    candidate_features,
+    guard_columns,
+    row_features,
+    score_candidates,
+)
+
+
+class SharedScorer:
+    """
+    Units-model predictions memoized by (row, final price). Policies that land on
+    the same final price for a row (most of them, for most rows) reuse the
+    features and the prediction instead of scoring them again.
+    """
+
+    def __init__(self, model, features: RowFeatures, feature_cols: list[str]):
+        self.model = model
+        self.features = features
+        self.feature_cols = feature_cols
+        self.cache = {}
+        self.n_requested = 0
+        self.n_scored = 0
+
+    def __call__(self, row_idx: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        keys = list(zip(row_idx.tolist(), prices.tolist()))
+        missing = list(dict.fromkeys(k for k in keys if k not in self.cache))
+        if missing:
+            rows = np.array([k[0] for k in missing], dtype=np.int64)
+            new_prices = np.array([k[1] for k in missing], dtype=float)
+            X = candidate_features(self.features, rows, new_prices)
+            self.cache.update(zip(missing, score_candidates(self.model, X, self.feature_cols).tolist()))
+
+        self.n_requested += len(keys)
+        self.n_scored += len(missing)
+        return np.array([self.cache[k] for k in keys], dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score several pricing policies against the same run date")
+    parser.add_argument("policies", nargs="*", type=Path, default=[POLICY_PATH],
+                        help="policy YAML files; the first is the baseline for deltas")
+    parser.add_argument("--run-date", help="feature date to price (default: latest)")
+    args = parser.parse_args()
+
+    # compile everything up front: a broken file fails before any scoring
+    policies = [load_policy(path) for path in args.policies]
+    registered, _ = get_or_train()
+    print(f"Model: {registered.tag}")
+
+    conn = connect()
+    try:
+        ensure_run_indexes(conn)
+        run_date = args.run_date or conn.execute("SELECT MAX(date) FROM feature_sku_segment_day").fetchone()[0]
+        if run_date is None:
+            raise ValueError("feature_sku_segment_day is empty")
+        cols, rows = fetch_run_rows(conn, run_date)
+
+        # trust windows can differ per policy: one history per distinct trust rule
+        histories = {
+            p.trust: PriceHistory.load(conn, previous_date(run_date), p.trust)
+            for p in policies if p.trust.enabled
+        }
+    finally:
+        conn.close()
+
+    # one fetch, one guard/feature build, one prediction cache for every policy
+    recs = [rec for rec in (dict(zip(cols, r)) for r in rows)
+            if rec["msrp"] is not None and float(rec["msrp"]) > 0]
+    guard = guard_columns(recs)
+    keys = [(rec["sku_id"], rec["segment_id"]) for rec in recs]
+    scorer = SharedScorer(registered.model, row_features(recs, registered.feature_cols), registered.feature_cols)
+    print(f"Run date: {run_date} ({len(recs)} SKU×segment rows)\n")
+
+    results = []
+    for path, policy in zip(args.policies, policies):
+        t0 = time.perf_counter()
+        scored_before = scorer.n_scored
+        policy_guard = dict(guard)
+        if policy.trust.enabled:
+            policy_guard["recent_large_changes"] = histories[policy.trust].large_change_counts(keys)
+        found = search_prices(policy_guard, scorer, policy)
+        results.append({
+            "label": f"{policy.version} ({path.name})",
+            "profit": float(found.profits.sum()),
+            "units": float(found.units.sum()),
+            "avg_price": float(found.prices.mean()) if len(found.prices) else 0.0,
+            "evals": int(found.n_evals.sum()),
+            "new_predictions": scorer.n_scored - scored_before,
+            "reasons": {code: float(((found.reason_mask & bit) != 0).mean()) if len(found.reason_mask) else 0.0
+                        for code, bit in REASON_BITS.items()},
+            "none": float((found.reason_mask == 0).mean()) if len(found.reason_mask) else 0.0,
+            "secs": time.perf_counter() - t0,
+        })
+
+    base = results[0]["profit"]
+    print(f"{'policy':32s} {'exp_profit':>12s} {'vs base':>8s} {'exp_units':>10s} {'avg_price':>9s} "
+          f"{'evals':>7s} {'new preds':>9s} {'secs':>5s}")
+    for r in results:
+        delta = (r["profit"] / base - 1.0) if base else 0.0
+        print(f"{r['label']:32s} {r['profit']:12.2f} {delta:+8.2%} {r['units']:10.2f} {r['avg_price']:9.2f} "
+              f"{r['evals']:7d} {r['new_predictions']:9d} {r['secs']:5.2f}")
+
+    print("\nReason mix (share of rows):")
+    codes = list(REASON_BITS)
+    print(f"  {'policy':32s} " + " ".join(f"{c[:14]:>14s}" for c in codes) + f" {'(none)':>8s}")
+    for r in results:
+        print(f"  {r['label']:32s} " + " ".join(f"{r['reasons'][c]:14.2%}" for c in codes) + f" {r['none']:8.2%}")
+
+    print(f"\n Scored {scorer.n_scored} distinct (row, price) candidates for {scorer.n_requested} requested "
+          f"across {len(results)} policies")
+
+
+if __name__ == "__main__":
+    main()